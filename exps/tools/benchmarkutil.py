@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+#
+# The time-to-best computation and the report of the search benchmarks
+# (ordering-benchmark.py and metaheuristic-benchmark.py). Each of their runs
+# is a dict with the "best_cost", "evaluations" and "elapsed" of the run and
+# its "improvements" as a list of (seconds since the start, cost).
+#
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import os, sys
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+# mongodb-d4
+from search import bbsearch
+
+def computeTimeToBest(results, ratio=bbsearch.NEAR_BEST_RATIO):
+    """
+        Compare every run against the best cost that was found for this workload.
+        Sets the "time_to_best" of each run to the number of seconds that it took
+        to get within the given ratio of that cost (None if it never did).
+        Returns the best cost
+    """
+    best = min([r["best_cost"] for r in results])
+    for r in results:
+        r["time_to_best"] = None
+        for elapsed, cost in r["improvements"]:
+            if cost <= best + abs(best) * ratio:
+                r["time_to_best"] = max(0.0, elapsed)
+                break
+        ## FOR
+    ## FOR
+    return best
+## DEF
+
+def printResults(path, best, results, key, groups):
+    """
+        Print a row for every run and then a summary for every group. The group
+        of a run is its value for the given key (e.g., "strategy")
+    """
+    print "%s [best cost: %f]" % (os.path.basename(path), best)
+    print "%-10s %12s %14s %12s %12s" % (key.upper(), "BEST COST", "TIME TO BEST", "EVALS", "ELAPSED")
+    for r in results:
+        time_to_best = ("%.2f" % r["time_to_best"]) if not r["time_to_best"] is None else "-"
+        print "%-10s %12.6f %14s %12d %12.2f" % (r[key], r["best_cost"], time_to_best, \
+                                                r["evaluations"], r["elapsed"])
+    ## FOR
+    for group in groups:
+        costs = [r["best_cost"] for r in results if r[key] == group]
+        times = [r["time_to_best"] for r in results if r[key] == group]
+        reached = [t for t in times if not t is None]
+        print "%-10s avg best cost %f, reached the best cost in %d/%d runs%s" % \
+              (group, sum(costs) / len(costs), len(reached), len(times), \
+               (" [avg %.2f sec]" % (sum(reached) / len(reached))) if reached else "")
+    ## FOR
+    print
+## DEF
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+#
+# Measure how many designs per second the cost model can evaluate on a
+# workload snapshot. The cost model does not need numpy, scipy, mongokit
+# or pymongo when it is loaded from a snapshot, so this can be run under
+# PyPy as well as CPython:
+#
+#   # Create the snapshot from the MongoDB catalog (CPython only)
+#   ./costmodel-benchmark.py --config d4.config --snapshot tpcc.snapshot --export
+#
+#   # Compare the interpreters on the same snapshot
+#   ./costmodel-benchmark.py --snapshot tpcc.snapshot --interpreters python,pypy
+#
+# NOTE: Python's string hash() is used to map sharding key values to nodes,
+# so the costs can differ slightly between interpreters. The sequence of
+# designs that are evaluated is the same for a given seed.
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import logging
+import platform
+import random
+import subprocess
+import time
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../libs"))
+
+# mongodb-d4
+import workload
+from costmodel import CostModel
+from search import Design
+from util import configutil
+
+logging.basicConfig(level = logging.INFO,
+                    format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                    datefmt="%m-%d-%Y %H:%M:%S",
+                    stream = sys.stdout)
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## EXPORT SNAPSHOT
+## ==============================================
+def exportSnapshot(config, path):
+    """Load the catalog and the workload from MongoDB and write them to a snapshot"""
+    import mongokit
+    import catalog
+    from search.designer import Designer
+
+    conn = mongokit.Connection(host=config.get(configutil.SECT_MONGODB, 'host'), \
+                               port=config.getint(configutil.SECT_MONGODB, 'port'))
+    conn.register([ catalog.Collection, workload.Session ])
+    metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
+    dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
+
+    designer = Designer(config, metadata_db, dataset_db)
+    collections = designer.loadCollections()
+    workload.exportSnapshot(path, collections, designer.loadWorkload(collections))
+## DEF
+
+## ==============================================
+## DESIGN GENERATOR
+## ==============================================
+def generateDesigns(collections, num_designs, seed):
+    """
+        Generate a deterministic sequence of designs where each design only
+        changes the shard key and index of one collection from the previous one.
+        This is the same access pattern that the cost model sees in BBSearch.
+    """
+    rng = random.Random(seed)
+    col_fields = { }
+    for col_name, col_info in collections.iteritems():
+        fields = col_info.get('interesting', None) or \
+                 [f for f in col_info['fields'].iterkeys() if not f.startswith("_")]
+        col_fields[col_name] = sorted(fields)
+    ## FOR
+
+    design = Design()
+    for col_name in sorted(col_fields.iterkeys()):
+        design.addCollection(col_name)
+        if col_fields[col_name]:
+            design.addShardKey(col_name, col_fields[col_name][:1])
+            design.addIndex(col_name, col_fields[col_name][:1])
+    ## FOR
+
+    col_names = sorted([c for c in col_fields.iterkeys() if col_fields[c]])
+    for i in xrange(num_designs):
+        design = design.copy()
+        col_name = rng.choice(col_names)
+        fields = col_fields[col_name]
+        design.recover(col_name)
+        design.addShardKey(col_name, [rng.choice(fields)])
+        design.addIndex(col_name, rng.sample(fields, rng.randint(1, min(2, len(fields)))))
+        yield design
+    ## FOR
+## DEF
+
+## ==============================================
+## BENCHMARK
+## ==============================================
+def runBenchmark(config, args):
+    start = time.time()
+    collections, sessions = workload.loadSnapshot(args['snapshot'])
+    cm = CostModel(collections, sessions, configutil.getCostModelConfig(config))
+    load_time = time.time() - start
+
+    costs = [ ]
+    start = time.time()
+    for design in generateDesigns(collections, args['designs'], args['seed']):
+        costs.append(cm.overallCost(design))
+    elapsed = time.time() - start
+
+    return {
+        "interpreter":         platform.python_implementation(),
+        "version":             platform.python_version(),
+        "load_time":           load_time,
+        "evaluations":         len(costs),
+        "elapsed":             elapsed,
+        "evaluations_per_sec": len(costs) / elapsed if elapsed > 0 else 0.0,
+        "best_cost":           min(costs) if costs else None,
+        "stats":               cm.getStats().toDICT(elapsed),
+    }
+## DEF
+
+def compareInterpreters(args):
+    """Run this script under every interpreter on the same snapshot and compare the results"""
+    results = [ ]
+    for interpreter in args['interpreters'].split(","):
+        cmd = [ interpreter, os.path.realpath(__file__), \
+                "--snapshot", args['snapshot'], \
+                "--designs", str(args['designs']), \
+                "--seed", str(args['seed']), \
+                "--json" ]
+        if args['config']:
+            cmd += [ "--config", os.path.realpath(args['config'].name) ]
+        LOG.info("Running benchmark with %s", interpreter)
+        output = subprocess.check_output(cmd)
+        result = json.loads(output.strip().split("\n")[-1])
+        result["executable"] = interpreter
+        results.append(result)
+    ## FOR
+
+    baseline = results[0]["evaluations_per_sec"]
+    print "%-20s %-12s %12s %12s %10s %10s" % ("EXECUTABLE", "INTERPRETER", "EVALS/SEC", "ELAPSED", "SPEEDUP", "LOAD")
+    for r in results:
+        print "%-20s %-12s %12.2f %12.2f %9.2fx %10.2f" % (r["executable"], r["interpreter"], \
+                                                         r["evaluations_per_sec"], r["elapsed"], \
+                                                         (r["evaluations_per_sec"] / baseline) if baseline else 0.0, \
+                                                         r["load_time"])
+    ## FOR
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Cost Model Evaluation Benchmark")
+    aparser.add_argument('--config', type=file,
+                         help='Path to %s configuration file' % os.path.basename(sys.argv[0]))
+    aparser.add_argument('--snapshot', type=str, required=True,
+                         help='Path of the workload snapshot file')
+    aparser.add_argument('--export', action='store_true',
+                         help='Create the snapshot from the MongoDB catalog before running the benchmark')
+    aparser.add_argument('--designs', type=int, default=1000,
+                         help='Number of designs to evaluate')
+    aparser.add_argument('--seed', type=int, default=0,
+                         help='Random seed for the generated designs')
+    aparser.add_argument('--interpreters', type=str,
+                         help='Comma-separated list of Python executables to compare (e.g., "python,pypy")')
+    aparser.add_argument('--json', action='store_true',
+                         help='Print the results as JSON')
+    aparser.add_argument('--debug', action='store_true',
+                         help='Enable debug log messages')
+    args = vars(aparser.parse_args())
+    if args['debug']: LOG.setLevel(logging.DEBUG)
+
+    config = RawConfigParser()
+    configutil.setDefaultValues(config)
+    if args['config']:
+        config.read(os.path.realpath(args['config'].name))
+
+    if args['export']:
+        exportSnapshot(config, args['snapshot'])
+
+    if args['interpreters']:
+        compareInterpreters(args)
+    else:
+        # The cost model logs every evaluation at INFO level
+        if not args['debug']: logging.getLogger().setLevel(logging.WARN)
+        result = runBenchmark(config, args)
+        if args['json']:
+            print json.dumps(result)
+        else:
+            print json.dumps(result, sort_keys=True, indent=4)
+## MAIN
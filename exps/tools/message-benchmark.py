@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# Measure the overhead of the progress messages that a worker sends to the
+# coordinator. A synthetic search evaluates the given number of designs and
+# finds a better one every --improve-every evaluations, which changes the
+# shard key of one collection. We compare:
+#
+#   per-design: one MSG_EVALUATED_ONE_DESIGN per evaluation and the whole
+#               pickled Design in every MSG_FOUND_BEST_COST
+#   batched:    the ProgressCounter reports and the DesignCodec deltas
+#
+# The messages go through a real execnet channel to a process that only
+# counts them (or to an in-process channel with --local):
+#
+#   ./message-benchmark.py --evaluations 100000 --collections 20
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import logging
+import time
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+sys.path.append(os.path.join(basedir, "../../libs"))
+
+# mongodb-d4
+import execnet
+from search import Design
+from message import *
+
+logging.basicConfig(level = logging.INFO,
+                    format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                    datefmt="%m-%d-%Y %H:%M:%S",
+                    stream = sys.stdout)
+
+LOG = logging.getLogger(__name__)
+
+# Runs on the other end of the execnet channel. It counts the messages and
+# their bytes until it gets None
+REMOTE_COUNTER = """
+messages = 0
+size = 0
+while True:
+    item = channel.receive()
+    if item is None: break
+    messages += 1
+    size += len(item)
+channel.send((messages, size))
+"""
+
+class LocalChannel(object):
+    """In-process channel that only counts the messages (no IPC)"""
+    def __init__(self):
+        self.messages = 0
+        self.size = 0
+    def send(self, item):
+        if item is None: return
+        self.messages += 1
+        self.size += len(item)
+    def receive(self):
+        return (self.messages, self.size)
+## CLASS
+
+## ==============================================
+## BENCHMARK
+## ==============================================
+def createDesign(num_collections, num_indexes):
+    d = Design()
+    for i in xrange(num_collections):
+        col_name = "collection%02d" % i
+        d.addCollection(col_name)
+        d.addShardKey(col_name, ("field00",))
+        for j in xrange(num_indexes):
+            d.addIndex(col_name, ("field%02d" % j, "field%02d" % (j + 1)))
+    ## FOR
+    return d
+## DEF
+
+def runSearch(mode, channel, args):
+    """Send the messages of the synthetic search through the channel"""
+    design = createDesign(args['collections'], args['indexes'])
+    collections = sorted(design.getCollections())
+    progress = ProgressCounter(channel, args['interval'])
+    bestCost = float(args['evaluations'])
+    for i in xrange(args['evaluations']):
+        cost = bestCost + 1
+        if i % args['improve_every'] == 0:
+            col_name = collections[(i // args['improve_every']) % len(collections)]
+            design.addShardKey(col_name, ("field%02d" % (i % 7),))
+            cost = bestCost = bestCost - 1
+        if mode == "per-design":
+            sendMessage(MSG_EVALUATED_ONE_DESIGN, (bestCost, cost), channel)
+        else:
+            progress.add(bestCost, cost)
+        if cost == bestCost:
+            if mode == "per-design":
+                sendMessage(MSG_FOUND_BEST_COST, (bestCost, design), channel)
+            else:
+                sendDesign(MSG_FOUND_BEST_COST, bestCost, design, channel)
+        ## IF
+    ## FOR
+    progress.flush()
+## DEF
+
+def runBenchmark(args):
+    results = [ ]
+    for mode in ["per-design", "batched"]:
+        if args['local']:
+            gw = None
+            channel = LocalChannel()
+        else:
+            gw = execnet.makegateway("popen")
+            channel = gw.remote_exec(REMOTE_COUNTER)
+        try:
+            # Include the time until the other end got everything
+            start = time.time()
+            runSearch(mode, channel, args)
+            channel.send(None)
+            messages, size = channel.receive()
+            elapsed = time.time() - start
+        finally:
+            if not gw is None: gw.exit()
+        results.append({
+            "mode":            mode,
+            "messages":        messages,
+            "bytes":           size,
+            "elapsed":         elapsed,
+            "messages_per_sec":    messages / elapsed if elapsed else 0.0,
+            "evaluations_per_sec": args['evaluations'] / elapsed if elapsed else 0.0,
+        })
+    ## FOR
+    return results
+## DEF
+
+def printResults(args, results):
+    print "%d evaluations, a better design every %d, %d collections [%s]" % \
+          (args['evaluations'], args['improve_every'], args['collections'], "local" if args['local'] else "execnet")
+    print "%-12s %12s %14s %12s %14s %14s" % ("MODE", "MESSAGES", "BYTES", "SECONDS", "MESSAGES/SEC", "EVALS/SEC")
+    for r in results:
+        print "%-12s %12d %14d %12.3f %14.1f %14.1f" % (r["mode"], r["messages"], r["bytes"], r["elapsed"], \
+                                                       r["messages_per_sec"], r["evaluations_per_sec"])
+    ## FOR
+    perDesign, batched = results
+    if batched["elapsed"] and batched["bytes"]:
+        print "Batched messages are %.1fx faster to send and %.1fx smaller" % \
+              (perDesign["elapsed"] / batched["elapsed"], perDesign["bytes"] / batched["bytes"])
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Worker Message Rate Benchmark")
+    aparser.add_argument('--evaluations', type=int, default=100000,
+                         help='Number of designs that the synthetic search evaluates')
+    aparser.add_argument('--improve-every', type=int, default=100,
+                         help='The search finds a better design every this many evaluations')
+    aparser.add_argument('--collections', type=int, default=20,
+                         help='Number of collections in the design')
+    aparser.add_argument('--indexes', type=int, default=2,
+                         help='Number of indexes of each collection')
+    aparser.add_argument('--interval', type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                         help='Seconds between the batched progress reports')
+    aparser.add_argument('--local', action='store_true',
+                         help='Only serialize the messages instead of sending them to another process')
+    aparser.add_argument('--json', action='store_true',
+                         help='Print the results as JSON')
+    args = vars(aparser.parse_args())
+
+    results = runBenchmark(args)
+    if args['json']:
+        print json.dumps(results)
+    else:
+        printResults(args, results)
+## MAIN
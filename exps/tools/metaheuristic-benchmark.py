@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# Compare the search strategies (LNS, simulated annealing and the genetic
+# algorithm) when each one gets the same wall-clock budget. Every run starts
+# from the same initial design, and we report the best cost that each run
+# found and how long it took to get within 1% of the best cost of any run:
+#
+#   ./metaheuristic-benchmark.py --snapshot tpcc.snapshot --time 300 \
+#                                --runs 3 --processes 8
+#
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import logging
+import threading
+import time
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../libs"))
+
+# mongodb-d4
+import workload
+from costmodel import CostModel
+from search import InitialDesigner
+from search.designer import Designer, SEARCH_STRATEGIES
+from util import configutil
+import benchmarkutil
+
+logging.basicConfig(level = logging.INFO,
+                    format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                    datefmt="%m-%d-%Y %H:%M:%S",
+                    stream = sys.stdout)
+
+LOG = logging.getLogger(__name__)
+
+STRATEGIES = [ "lns", "annealing", "genetic" ]
+
+class NullChannel(object):
+    """The designers report every evaluated design through the channel"""
+    def send(self, data):
+        pass
+## CLASS
+
+## ==============================================
+## BENCHMARK
+## ==============================================
+def runStrategy(config, args, collections, sessions, strategy):
+    # Every strategy gets the whole budget, and it does not give up early
+    config.set(configutil.SECT_MULTI_SEARCH, 'time_for_lnssearch', args['time'])
+    config.set(configutil.SECT_MULTI_SEARCH, 'patient_time', args['time'])
+    config.set(configutil.SECT_MULTI_SEARCH, 'init_bbsearch_time', args['time'])
+    config.set(configutil.SECT_DESIGNER, 'eval_processes', args['processes'])
+
+    cm = CostModel(collections, sessions, configutil.getCostModelConfig(config))
+    designer = Designer(config, None, None)
+    dc = designer.generateDesignCandidates(collections, \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_sharding'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_indexes'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_denormalization'), \
+            workload=sessions if configutil.getBoolean(config, configutil.SECT_DESIGNER, 'prune_index_candidates') else None)
+
+    initialDesign = InitialDesigner(collections, sessions, config).generate()
+    initialCost = cm.overallCost(initialDesign)
+
+    search = SEARCH_STRATEGIES[strategy](collections, dc, sessions, config, cm, initialDesign, initialCost, \
+                                         NullChannel(), threading.Lock())
+    if strategy == "lns":
+        # LNS does a single exhaustive BBSearch without a time limit on small
+        # workloads, so the first BBSearch always gets the budget here
+        search.init_bbsearch_time = args['time']
+    start = time.time()
+    search.run()
+    elapsed = time.time() - start
+
+    stats = search.getStats()
+    bestCost = min([cost for timestamp, cost in search.improvements])
+    return {
+        "strategy":     strategy,
+        "initial_cost": initialCost,
+        "best_cost":    bestCost,
+        "elapsed":      elapsed,
+        "evaluations":  stats.get("evaluations"),
+        "improvements": [(timestamp - start, cost) for timestamp, cost in search.improvements],
+    }
+## DEF
+
+def runBenchmark(config, args, path):
+    collections, sessions = workload.loadSnapshot(path)
+    results = [ ]
+    for run in xrange(args['runs']):
+        for strategy in args['strategy']:
+            LOG.info("%s: run #%d with the %s strategy", os.path.basename(path), run, strategy)
+            results.append(runStrategy(config, args, collections, sessions, strategy))
+    ## FOR
+    return benchmarkutil.computeTimeToBest(results), results
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Search Strategy Benchmark")
+    aparser.add_argument('--config', type=file,
+                         help='Path to %s configuration file' % os.path.basename(sys.argv[0]))
+    aparser.add_argument('--snapshot', type=str, action='append', required=True,
+                         help='Path of a workload snapshot file (can be given more than once)')
+    aparser.add_argument('--time', type=int, default=60,
+                         help='Number of seconds that each strategy runs for')
+    aparser.add_argument('--runs', type=int, default=3,
+                         help='Number of runs per strategy')
+    aparser.add_argument('--strategy', type=str, action='append', choices=STRATEGIES,
+                         help='Strategy to run (can be given more than once, default is all of them)')
+    aparser.add_argument('--processes', type=int, default=0,
+                         help='Number of processes that evaluate the populations of the annealing and genetic strategies (0 means one per CPU)')
+    aparser.add_argument('--json', action='store_true',
+                         help='Print the results as JSON')
+    aparser.add_argument('--debug', action='store_true',
+                         help='Enable debug log messages')
+    args = vars(aparser.parse_args())
+    if args['debug']: LOG.setLevel(logging.DEBUG)
+    if not args['strategy']: args['strategy'] = STRATEGIES
+
+    config = RawConfigParser()
+    configutil.setDefaultValues(config)
+    if args['config']:
+        config.read(os.path.realpath(args['config'].name))
+
+    # The cost model logs every evaluation at INFO level
+    if not args['debug']: logging.getLogger().setLevel(logging.WARN)
+    for path in args['snapshot']:
+        best, results = runBenchmark(config, args, path)
+        if args['json']:
+            print json.dumps({"snapshot": path, "best_cost": best, "runs": results})
+        else:
+            benchmarkutil.printResults(path, best, results, "strategy", args['strategy'])
+    ## FOR
+## MAIN
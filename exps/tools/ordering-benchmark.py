@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+#
+# Compare how quickly BBSearch finds good designs when it expands the
+# collections and key candidates in random order versus in the order
+# of the workload-driven heuristic (child_ordering = workload).
+# Each snapshot is searched from the initial design with all of its
+# collections relaxed, and we report how long each run took to reach a
+# cost within 1% of the best cost that any run found for that workload:
+#
+#   ./ordering-benchmark.py --snapshot tpcc.snapshot --snapshot blog.snapshot \
+#                           --timeout 300 --runs 5
+#
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import logging
+import threading
+import time
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../libs"))
+
+# mongodb-d4
+import workload
+from costmodel import CostModel
+from search import InitialDesigner, bbsearch
+from search.bestfirstsearch import BestFirstSearch
+from search.childordering import WorkloadOrdering
+from search.designer import Designer
+from util import configutil
+import benchmarkutil
+
+logging.basicConfig(level = logging.INFO,
+                    format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                    datefmt="%m-%d-%Y %H:%M:%S",
+                    stream = sys.stdout)
+
+LOG = logging.getLogger(__name__)
+
+ORDERINGS = [ "random", "workload" ]
+
+class NullChannel(object):
+    """The search engines report every evaluated design through the channel"""
+    def send(self, data):
+        pass
+## CLASS
+
+## ==============================================
+## BENCHMARK
+## ==============================================
+def runSearch(config, args, collections, sessions, ordering):
+    cm = CostModel(collections, sessions, configutil.getCostModelConfig(config))
+    designer = Designer(config, None, None)
+    dc = designer.generateDesignCandidates(collections, \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_sharding'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_indexes'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_denormalization'), \
+            workload=sessions if configutil.getBoolean(config, configutil.SECT_DESIGNER, 'prune_index_candidates') else None)
+
+    initialDesign = InitialDesigner(collections, sessions, config).generate()
+    initialCost = cm.overallCost(initialDesign)
+    relaxedDesign = initialDesign.copy()
+    for col_name in collections.iterkeys():
+        relaxedDesign.reset(col_name)
+
+    workloadOrdering = None
+    if ordering == "workload":
+        workloadOrdering = WorkloadOrdering(collections, sessions)
+        dc = workloadOrdering.apply(dc)
+
+    if args['engine'] == "bestfirst":
+        bb = BestFirstSearch(dc, cm, relaxedDesign, initialCost, args['timeout'], \
+                             NullChannel(), threading.Lock(), args['beam_width'])
+    else:
+        bb = bbsearch.BBSearch(dc, cm, relaxedDesign, initialCost, args['timeout'], \
+                               NullChannel(), threading.Lock())
+    if not workloadOrdering is None:
+        bb.collectionOrder = workloadOrdering.getCollectionOrder(dc)
+        bb.indexKeyFilter = workloadOrdering.isUsefulIndex
+    bb.solve()
+
+    return {
+        "ordering":     ordering,
+        "status":       bb.status,
+        "initial_cost": initialCost,
+        "best_cost":    bb.bestCost,
+        "elapsed":      bb.usedTime,
+        "evaluations":  cm.getStats().get("evaluations"),
+        "improvements": [(0.0, initialCost)] + \
+                        [(timestamp - bb.startTime, cost) for timestamp, cost in bb.improvements],
+    }
+## DEF
+
+def runBenchmark(config, args, path):
+    collections, sessions = workload.loadSnapshot(path)
+    results = [ ]
+    for run in xrange(args['runs']):
+        for ordering in ORDERINGS:
+            LOG.info("%s: run #%d with %s ordering", os.path.basename(path), run, ordering)
+            results.append(runSearch(config, args, collections, sessions, ordering))
+    ## FOR
+    return benchmarkutil.computeTimeToBest(results), results
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Search Child Ordering Benchmark")
+    aparser.add_argument('--config', type=file,
+                         help='Path to %s configuration file' % os.path.basename(sys.argv[0]))
+    aparser.add_argument('--snapshot', type=str, action='append', required=True,
+                         help='Path of a workload snapshot file (can be given more than once)')
+    aparser.add_argument('--timeout', type=int, default=60,
+                         help='Number of seconds that each search runs for')
+    aparser.add_argument('--runs', type=int, default=3,
+                         help='Number of runs per ordering')
+    aparser.add_argument('--engine', type=str, default="bbsearch", choices=["bbsearch", "bestfirst"],
+                         help='Search engine to use')
+    aparser.add_argument('--beam-width', type=int, default=0,
+                         help='Beam width for the bestfirst search engine')
+    aparser.add_argument('--json', action='store_true',
+                         help='Print the results as JSON')
+    aparser.add_argument('--debug', action='store_true',
+                         help='Enable debug log messages')
+    args = vars(aparser.parse_args())
+    if args['debug']: LOG.setLevel(logging.DEBUG)
+
+    config = RawConfigParser()
+    configutil.setDefaultValues(config)
+    if args['config']:
+        config.read(os.path.realpath(args['config'].name))
+
+    # The cost model logs every evaluation at INFO level
+    if not args['debug']: logging.getLogger().setLevel(logging.WARN)
+    for path in args['snapshot']:
+        best, results = runBenchmark(config, args, path)
+        if args['json']:
+            print json.dumps({"snapshot": path, "best_cost": best, "runs": results})
+        else:
+            benchmarkutil.printResults(path, best, results, "ordering", ORDERINGS)
+    ## FOR
+## MAIN
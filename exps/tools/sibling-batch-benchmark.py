@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# Compare the evaluation throughput of BBSearch when the sibling nodes are
+# evaluated in batches by a local process pool (designer.sibling_batch_size)
+# against the one-worker-per-core model of the execnet search, where every core
+# runs its own serial BBSearch. Both get the same number of processes and the
+# same wall-clock budget for a search over the completely relaxed design:
+#
+#   ./sibling-batch-benchmark.py --snapshot tpcc.snapshot --time 60 \
+#                                --processes 8 --batch-size 8
+#
+# The serial searches do not know about each other, so we also report how
+# many distinct designs each model evaluated.
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../libs"))
+
+# mongodb-d4
+import workload
+from costmodel import CostModel
+from search import InitialDesigner, bbsearch
+from search.designer import Designer
+from search.evaluator import PopulationEvaluator
+from util import configutil
+
+logging.basicConfig(level = logging.INFO,
+                    format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
+                    datefmt="%m-%d-%Y %H:%M:%S",
+                    stream = sys.stdout)
+
+LOG = logging.getLogger(__name__)
+
+class NullChannel(object):
+    """BBSearch reports every evaluated design through the channel"""
+    def send(self, data):
+        pass
+## CLASS
+
+# The search that the serial worker processes run. They are forked after it is
+# set, so they share the loaded workload just like the pool processes do
+_search = None
+
+## ==============================================
+## BENCHMARK
+## ==============================================
+def loadSearch(config, path):
+    """Return the cost model, the design candidates, the relaxed design and the initial cost for the snapshot"""
+    collections, sessions = workload.loadSnapshot(path)
+    cm = CostModel(collections, sessions, configutil.getCostModelConfig(config))
+    designer = Designer(config, None, None)
+    dc = designer.generateDesignCandidates(collections, \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_sharding'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_indexes'), \
+            configutil.getBoolean(config, configutil.SECT_DESIGNER, 'enable_denormalization'), \
+            workload=sessions if configutil.getBoolean(config, configutil.SECT_DESIGNER, 'prune_index_candidates') else None)
+
+    initialDesign = InitialDesigner(collections, sessions, config).generate()
+    initialCost = cm.overallCost(initialDesign)
+    relaxedDesign = initialDesign.copy()
+    for col_name in collections:
+        relaxedDesign.reset(col_name)
+    return cm, dc, relaxedDesign, initialCost
+## DEF
+
+def runSearch(cm, dc, relaxedDesign, initialCost, seconds, evaluator=None, batchSize=0):
+    """Run one BBSearch for the given number of seconds and return its counters"""
+    cm.design_memo.clear()
+    evaluations = cm.stats.get("evaluations")
+    bb = bbsearch.BBSearch(dc, cm, relaxedDesign, initialCost, seconds, NullChannel(), threading.Lock())
+    bb.evaluator = evaluator
+    bb.batchSize = batchSize
+    bb.solve()
+    return {
+        "evaluations": cm.stats.get("evaluations") - evaluations + bb.poolEvaluations,
+        "nodes":       bb.totalNodes,
+        "best_cost":   bb.bestCost,
+        "elapsed":     bb.usedTime,
+        "designs":     set(cm.design_memo.iterkeys()),
+    }
+## DEF
+
+def runSerialSearch(seconds):
+    cm, dc, relaxedDesign, initialCost = _search
+    return runSearch(cm, dc, relaxedDesign, initialCost, seconds)
+## DEF
+
+def runBenchmark(config, args, path):
+    global _search
+    _search = loadSearch(config, path)
+    cm, dc, relaxedDesign, initialCost = _search
+    processes = args['processes'] or multiprocessing.cpu_count()
+
+    # One serial BBSearch per process
+    LOG.info("%s: %d serial searches for %d seconds", os.path.basename(path), processes, args['time'])
+    pool = multiprocessing.Pool(processes)
+    try:
+        serial = pool.map(runSerialSearch, [ args['time'] ] * processes)
+    finally:
+        pool.terminate()
+    designs = set()
+    for r in serial:
+        designs |= r.pop("designs")
+    perCore = {
+        "model":       "per-core",
+        "evaluations": sum([r["evaluations"] for r in serial]),
+        "designs":     len(designs),
+        "nodes":       sum([r["nodes"] for r in serial]),
+        "best_cost":   min([r["best_cost"] for r in serial]),
+        "elapsed":     max([r["elapsed"] for r in serial]),
+    }
+
+    # One BBSearch that evaluates the siblings with a pool of the same size
+    LOG.info("%s: one batched search with %d processes for %d seconds", os.path.basename(path), processes, args['time'])
+    evaluator = PopulationEvaluator(cm, processes)
+    try:
+        batched = runSearch(cm, dc, relaxedDesign, initialCost, args['time'], evaluator, args['batch_size'])
+    finally:
+        evaluator.close()
+    batched["designs"] = len(batched["designs"])
+    batched["model"] = "batched"
+
+    results = [ perCore, batched ]
+    for r in results:
+        r["evaluations_per_sec"] = r["evaluations"] / r["elapsed"] if r["elapsed"] else 0.0
+        r["designs_per_sec"] = r["designs"] / r["elapsed"] if r["elapsed"] else 0.0
+    return processes, results
+## DEF
+
+def printResults(path, processes, results):
+    print "%s [%d processes]" % (os.path.basename(path), processes)
+    print "%-10s %12s %12s %12s %12s %12s" % ("MODEL", "EVALS", "EVALS/SEC", "DESIGNS", "DESIGNS/SEC", "BEST COST")
+    for r in results:
+        print "%-10s %12d %12.2f %12d %12.2f %12.6f" % (r["model"], r["evaluations"], r["evaluations_per_sec"], \
+                                                      r["designs"], r["designs_per_sec"], r["best_cost"])
+    ## FOR
+    perCore, batched = results
+    if perCore["designs_per_sec"]:
+        print "Batched search evaluated %.2fx as many distinct designs per second as the per-core searches" % \
+              (batched["designs_per_sec"] / perCore["designs_per_sec"])
+    print
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Sibling Batch Evaluation Benchmark")
+    aparser.add_argument('--config', type=file,
+                         help='Path to %s configuration file' % os.path.basename(sys.argv[0]))
+    aparser.add_argument('--snapshot', type=str, action='append', required=True,
+                         help='Path of a workload snapshot file (can be given more than once)')
+    aparser.add_argument('--time', type=int, default=60,
+                         help='Number of seconds that each search runs for')
+    aparser.add_argument('--processes', type=int, default=0,
+                         help='Number of processes for each model (0 means one per CPU)')
+    aparser.add_argument('--batch-size', type=int, default=8,
+                         help='Number of sibling nodes that the batched search evaluates together')
+    aparser.add_argument('--json', action='store_true',
+                         help='Print the results as JSON')
+    aparser.add_argument('--debug', action='store_true',
+                         help='Enable debug log messages')
+    args = vars(aparser.parse_args())
+    if args['debug']: LOG.setLevel(logging.DEBUG)
+
+    config = RawConfigParser()
+    configutil.setDefaultValues(config)
+    if args['config']:
+        config.read(os.path.realpath(args['config'].name))
+
+    # The cost model logs every evaluation at INFO level
+    if not args['debug']: logging.getLogger().setLevel(logging.WARN)
+    for path in args['snapshot']:
+        processes, results = runBenchmark(config, args, path)
+        if args['json']:
+            print json.dumps({"snapshot": path, "processes": processes, "results": results})
+        else:
+            printResults(path, processes, results)
+    ## FOR
+## MAIN
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# Show the JSON-lines telemetry that the search coordinator writes when
+# multithread.telemetry (or d4.py --telemetry) is set. It prints a line for
+# every better design and LNS round, and a summary with the longest stretch
+# without a better design (a stall). With --plot, it draws the convergence
+# curves: the best cost, the evaluations of every worker and the relax
+# ratio and time limit of the LNS rounds (needs matplotlib; without it the
+# best cost is drawn as text).
+#
+#   ./telemetry-viewer.py search.jsonl --plot convergence.png
+#   ./telemetry-viewer.py search.jsonl --follow
+#   ./telemetry-viewer.py --listen unix:/tmp/d4.sock
+#
+# With --listen, start the viewer before the search and point the search
+# at the same socket.
+# -----------------------------------------------------------------------
+from __future__ import division
+from __future__ import with_statement
+
+import os, sys
+import argparse
+import json
+import socket
+import time
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+# mongodb-d4
+from telemetry import UNIX_PREFIX, TCP_PREFIX
+
+# Size of the text chart without matplotlib
+TEXT_CHART_WIDTH = 60
+TEXT_CHART_HEIGHT = 15
+
+def readLines(fd, follow=False):
+    """Return the lines of the file. If follow is True, then wait for more lines until the 'end' record"""
+    while True:
+        line = fd.readline()
+        if line:
+            yield line
+        elif follow:
+            time.sleep(0.5)
+        else:
+            return
+    ## WHILE
+## DEF
+
+def listen(target):
+    """Wait for the coordinator to connect to the given socket and return the file of the connection"""
+    if target.startswith(UNIX_PREFIX):
+        path = target[len(UNIX_PREFIX):]
+        if os.path.exists(path): os.remove(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+    elif target.startswith(TCP_PREFIX):
+        host, port = target[len(TCP_PREFIX):].rsplit(":", 1)
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, int(port)))
+    else:
+        raise Exception("Invalid socket '%s'. Expected '%s<path>' or '%s<host>:<port>'" % (target, UNIX_PREFIX, TCP_PREFIX))
+    server.listen(1)
+    print "Waiting for the search on %s" % target
+    conn, addr = server.accept()
+    server.close()
+    return conn.makefile("r")
+## DEF
+
+def formatCost(cost):
+    return "-" if cost is None else "%.6f" % cost
+## DEF
+
+def printRecord(record):
+    """Print the records that are interesting to watch while the search is running"""
+    event = record["event"]
+    prefix = "[%8.2fs] %-5s" % (record["elapsed"], event)
+    if event == "best":
+        components = record.get("components", None) or { }
+        print "%s worker #%s  cost=%s  %s" % (prefix, record["worker"], formatCost(record["best_cost"]), \
+              "  ".join(["%s=%.4f" % (name, components[name]) for name in sorted(components)]))
+    elif event == "round":
+        ratio = "-" if record.get("relax_ratio", None) is None else "%.2f" % record["relax_ratio"]
+        print "%s worker #%s  relax_ratio=%s  timeout=%s  relaxed=%d" % \
+              (prefix, record["worker"], ratio, record["timeout"], record["relaxed"])
+    elif event in ("start", "end"):
+        print "%s cost=%s  evaluations=%d" % (prefix, formatCost(record["best_cost"]), record["evaluations"])
+## DEF
+
+def summarize(records):
+    """Return the summary lines of the search"""
+    improvements = [(r["elapsed"], r["best_cost"]) for r in records if r["event"] in ("start", "best")]
+    if not improvements:
+        return [ "No designs" ]
+    last = records[-1]
+    ret = [
+        "Best cost:        %s" % formatCost(improvements[-1][1]),
+        "Better designs:   %d" % (len(improvements) - 1),
+        "Time to best:     %.2fs" % improvements[-1][0],
+        "Elapsed:          %.2fs" % last["elapsed"],
+        "Evaluations:      %d [%.1f/sec]" % (last["evaluations"], (last["evaluations"] / last["elapsed"]) if last["elapsed"] else 0.0),
+    ]
+    # The longest time without a better design, including the time after the last one
+    times = [x[0] for x in improvements] + [ last["elapsed"] ]
+    stall = max([(times[i+1] - times[i], times[i]) for i in xrange(len(times) - 1)])
+    ret.append("Longest stall:    %.2fs after %.2fs" % stall)
+
+    progress = [r for r in records if r["event"] == "progress"]
+    if progress:
+        for worker_id, w in sorted(progress[-1]["workers"].iteritems(), key=lambda x: int(x[0])):
+            rate = "-" if w["prune_rate"] is None else "%.1f%%" % (w["prune_rate"] * 100)
+            ret.append("Worker #%-3s      %d evaluations, prune rate %s" % (worker_id, w["evaluations"], rate))
+    ## IF
+    return ret
+## DEF
+
+def textChart(records):
+    """Return the lines of a text chart of the best cost over time"""
+    points = [(r["elapsed"], r["best_cost"]) for r in records if not r["best_cost"] is None]
+    if not points:
+        return [ ]
+    end = max(points[-1][0], 1e-9)
+    low = min([p[1] for p in points])
+    high = max([p[1] for p in points])
+    # The best cost at the start of every column
+    columns = [ ]
+    for col in xrange(TEXT_CHART_WIDTH):
+        t = end * col / (TEXT_CHART_WIDTH - 1)
+        columns.append([p[1] for p in points if p[0] <= t][-1:] or [ None ])
+    ## FOR
+    # The row of the best cost in every column
+    rows = [ ]
+    for c in columns:
+        if c[0] is None:
+            rows.append(None)
+        else:
+            rows.append(int(round((high - c[0]) / (high - low) * (TEXT_CHART_HEIGHT - 1))) if high > low else 0)
+    ## FOR
+    lines = [ ]
+    for row in xrange(TEXT_CHART_HEIGHT):
+        level = high - (high - low) * row / (TEXT_CHART_HEIGHT - 1)
+        line = "".join([("*" if r == row else " ") for r in rows])
+        lines.append("%12s |%s" % (formatCost(level) if row in (0, TEXT_CHART_HEIGHT - 1) else "", line))
+    ## FOR
+    lines.append("%12s +%s" % ("", "-" * TEXT_CHART_WIDTH))
+    lines.append("%12s  0s%s%.1fs" % ("", " " * (TEXT_CHART_WIDTH - 8), end))
+    return lines
+## DEF
+
+def plot(records, path):
+    """Draw the convergence curves into the given image file"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(3, 1, sharex=True, figsize=(10, 10))
+    best = [r for r in records if not r["best_cost"] is None]
+    axes[0].step([r["elapsed"] for r in best], [r["best_cost"] for r in best], where="post")
+    axes[0].set_ylabel("best cost")
+
+    progress = [r for r in records if r["event"] == "progress"]
+    workers = sorted(set([w for r in progress for w in r["workers"]]), key=int)
+    for worker_id in workers:
+        points = [(r["elapsed"], r["workers"][worker_id]["evaluations"]) for r in progress if worker_id in r["workers"]]
+        axes[1].plot([p[0] for p in points], [p[1] for p in points], label="worker #%s" % worker_id)
+    axes[1].set_ylabel("evaluations")
+    if workers: axes[1].legend(loc="upper left")
+
+    rounds = [r for r in records if r["event"] == "round" and not r.get("relax_ratio", None) is None]
+    axes[2].plot([r["elapsed"] for r in rounds], [r["relax_ratio"] for r in rounds], "o", label="relax ratio")
+    axes[2].set_ylabel("relax ratio")
+    timeouts = axes[2].twinx()
+    timeouts.plot([r["elapsed"] for r in rounds], [r["timeout"] for r in rounds], "x", color="red", label="time limit")
+    timeouts.set_ylabel("time limit")
+    axes[2].set_xlabel("elapsed seconds")
+
+    fig.savefig(path)
+## DEF
+
+## ==============================================
+## main
+## ==============================================
+if __name__ == '__main__':
+    aparser = argparse.ArgumentParser(description="Search Telemetry Viewer")
+    aparser.add_argument('file', nargs='?',
+                         help='The JSON-lines telemetry file of the search')
+    aparser.add_argument('--listen', type=str, metavar='SOCKET',
+                         help="Read the telemetry from the search on this 'unix:PATH' or 'tcp:HOST:PORT' socket")
+    aparser.add_argument('--follow', action='store_true',
+                         help='Keep reading the file until the search ends')
+    aparser.add_argument('--plot', type=str, metavar='FILE',
+                         help='Draw the convergence curves into this image file (needs matplotlib)')
+    aparser.add_argument('--quiet', action='store_true',
+                         help='Only print the summary')
+    args = vars(aparser.parse_args())
+    if not args['file'] and not args['listen']:
+        aparser.error("Either a telemetry file or --listen is required")
+
+    if args['listen']:
+        fd = listen(args['listen'])
+    else:
+        fd = open(args['file'], "r")
+    records = [ ]
+    for line in readLines(fd, args['follow'] and not args['listen']):
+        if not line.strip(): continue
+        record = json.loads(line)
+        records.append(record)
+        if not args['quiet']: printRecord(record)
+        if record["event"] == "end": break
+    ## FOR
+    fd.close()
+
+    print
+    for line in summarize(records):
+        print line
+    if args['plot']:
+        try:
+            plot(records, args['plot'])
+            print "Wrote the convergence curves to '%s'" % args['plot']
+        except ImportError:
+            print "matplotlib is not installed. Best cost over time:"
+            print "\n".join(textChart(records))
+    ## IF
+## MAIN
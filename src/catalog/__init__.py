@@ -8,5 +8,11 @@ sys.path.append(os.path.join(basedir, "../../libs"))
 from utilmethods import *
 del utilmethods
 
-from collection import Collection
-del collection
\ No newline at end of file
+# Mongokit Objects
+# These are only needed when we are talking to MongoDB. The cost model and
+# the search can run without mongokit/pymongo (e.g., under PyPy from a snapshot)
+try:
+    from collection import Collection
+    del collection
+except ImportError:
+    Collection = None
\ No newline at end of file
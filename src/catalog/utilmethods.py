@@ -5,10 +5,10 @@ import logging
 import re
 import types
 import math
+import zlib
 from datetime import datetime
 from pprint import pformat
 
-from collection import Collection
 from util import constants
 
 #logging.basicConfig(level = logging.DEBUG,
@@ -141,6 +141,28 @@ def getFieldValues(fieldNames, fields):
     return tuple(values)
 ## DEF
 
+# The hash() of these types only depends on the value
+STABLE_HASH_TYPES = (str, unicode, int, long, float, bool)
+
+def hashFieldValues(values):
+    """
+        Return a hash of the given tuple of field values that is the same in every process.
+        The hash() of None and of objects without their own __hash__ is based on
+        the object's address, so if the tuple contains anything other than
+        strings and numbers we hash its repr() instead.
+        Raises a TypeError if the values are not hashable.
+    """
+    h = hash(values)
+    def _isStable(v):
+        if isinstance(v, tuple):
+            return all(_isStable(x) for x in v)
+        return isinstance(v, STABLE_HASH_TYPES)
+    ## DEF
+    if _isStable(values):
+        return h
+    return zlib.crc32(repr(values)) & 0xffffffff
+## DEF
+
 
 def getFieldValue(fieldName, fields):
     """
@@ -8,4 +8,6 @@ sys.path.append(os.path.join(basedir, "../.."))
 
 from abstractcostcomponent import AbstractCostComponent
 from costmodel import CostModel
-from nodeestimator import NodeEstimator
\ No newline at end of file
+from nodeestimator import NodeEstimator
+from explain import CostExplanation
+from migration import MigrationCost
\ No newline at end of file
@@ -33,11 +33,13 @@ import workload
 from nodeestimator import NodeEstimator
 from util import constants
 from util import Histogram
+from util import SearchStats
 import catalog
 import disk
 import skew
 import network
 from state import State
+from explain import CostExplanation
 from abstractcostcomponent import AbstractCostComponent
 from workload.workloadcombiner import WorkloadCombiner
 
@@ -69,6 +71,7 @@ class CostModel(object):
     def __init__(self, collections, workload, config):
         self.last_design = None
         self.last_cost = None
+        self.last_components = { }
         self.new_design = None
         self.state = State(collections, workload, config)
 
@@ -89,18 +92,64 @@ class CostModel(object):
         
         self.debug = False
         
-        self.design_set = set()
+        # Design Key -> Cost
+        # The costs of the designs that we have already evaluated
+        self.design_memo = { }
+        self.design_memo_size = config.get('design_memo_size', 0)
+        # Design Key -> Component -> Cost
+        # The components of the costs in the design_memo (see getComponents())
+        self.design_memo_components = { }
+
+        # Always-on profiling counters
+        self.stats = SearchStats()
+
+        # The MigrationCost from the deployed design (None if we are not re-optimizing one)
+        self.migration = None
+    ## DEF
+
+    def setMigration(self, migration):
+        """Add the cost of migrating from the deployed design to the cost of every design"""
+        self.migration = migration
+        self.design_memo.clear()
+        self.design_memo_components.clear()
     ## DEF
 
     def overallCost(self, design):
         # TODO: We should reset any cache entries for only those collections
         #       that were changed in this new design from the last design
+        memo_key = None
+        if self.design_memo_size and self.state.explain is None:
+            memo_key = design.getKey()
+            cost = self.design_memo.get(memo_key, None)
+            if not cost is None:
+                self.stats.incr("memo_hits")
+                return cost
+            self.stats.incr("memo_misses")
+        ## IF
+
+        # Don't bother computing the cost of a design that we cannot deploy
+        if not self.migration is None and self.migration.isOverBudget(design):
+            self.stats.incr("over_change_budget")
+            return float("inf")
+
+        cost = self.__computeCost__(design)
+        if not memo_key is None and len(self.design_memo) < self.design_memo_size:
+            self.design_memo[memo_key] = cost
+            self.design_memo_components[memo_key] = self.last_components
+        return cost
+    ## DEF
+
+    def __computeCost__(self, design):
+        """Compute the cost of the given design with the cost components"""
         self.new_design = design
+        self.stats.incr("evaluations")
         
+        start = time.time()
         combiner = WorkloadCombiner(self.col_names, self.workload)
         combinedWorkload = combiner.process(design)
         if combinedWorkload:
             self.state.updateWorkload(combinedWorkload)
+        self.stats.addTime("combiner", time.time() - start)
 
         # This is meant to apply to all components
         # but it only works with network component
@@ -115,16 +164,29 @@ class CostModel(object):
             self.state.cache_miss_ctr.clear()
         
         cost = 0.0
+        components = { }
         start = time.time()
         if self.state.weight_disk > 0:
-            cost += self.state.weight_disk * self.diskComponent.getCost(design)
+            components["disk"] = self.diskComponent.getCost(design)
+            cost += self.state.weight_disk * components["disk"]
+        lap = time.time()
+        self.stats.addTime("disk", lap - start)
         if self.state.weight_network > 0:
-            cost += self.state.weight_network * self.networkComponent.getCost(design)
+            components["network"] = self.networkComponent.getCost(design)
+            cost += self.state.weight_network * components["network"]
+        stop = time.time()
+        self.stats.addTime("network", stop - lap)
+        lap = stop
         if self.state.weight_skew > 0:
-            cost += self.state.weight_skew * self.skewComponent.getCost(design)
+            components["skew"] = self.skewComponent.getCost(design)
+            cost += self.state.weight_skew * components["skew"]
         stop = time.time()
-            
+        self.stats.addTime("skew", stop - lap)
         self.last_cost = cost / self.weights_sum
+        if not self.migration is None:
+            components["migration"] = self.migration.getCost(design)
+            self.last_cost += components["migration"]
+        self.last_components = components
         self.last_design = design
 
         # Calculate cache hit/miss ratio
@@ -134,10 +196,86 @@ class CostModel(object):
         self.finish()
         if combinedWorkload:
             self.state.restoreOriginalWorkload()
-
         return self.last_cost
     ## DEF
 
+    def getCostShares(self, design):
+        """
+            Split the cost of the given design between the collections in proportion
+            to their page hits (disk), messages (network) and operations (skew).
+            Unlike explainCost(), this keeps all of the caches, so the search can
+            use it. Returns a dict of CollectionName -> Fraction of the cost
+        """
+        if self.last_design is None or self.last_design.getKey() != design.getKey():
+            self.__computeCost__(design)
+        measures = {
+            "disk":     self.diskComponent.colPageHits,
+            "network":  dict([(col_name, counts[1]) for col_name, counts in self.networkComponent.cache.iteritems()]),
+            "skew":     self.diskComponent.colOps,
+        }
+        shares = dict([(col_name, 0.0) for col_name in self.col_names])
+        for component, cost in self.last_components.iteritems():
+            measure = measures.get(component, None)
+            if not measure or not cost: continue
+            total = float(sum(measure.itervalues()))
+            if not total: continue
+            weight = getattr(self.state, "weight_" + component)
+            for col_name, value in measure.iteritems():
+                if col_name in shares:
+                    shares[col_name] += weight * cost * value / total
+        ## FOR
+        total = sum(shares.itervalues())
+        if total > 0:
+            for col_name in shares.iterkeys():
+                shares[col_name] /= total
+        return shares
+    ## DEF
+
+    def getComponents(self, design):
+        """
+            Return the cost of each of the components (disk, network, skew and
+            migration) of the given design if it is the last design that we
+            computed the cost of or if it is in the design memo. Otherwise
+            return None
+        """
+        key = design.getKey()
+        if self.last_design is None or self.last_design.getKey() != key:
+            components = self.design_memo_components.get(key, None)
+            return None if components is None else dict(components)
+        return dict(self.last_components)
+    ## DEF
+
+    def explainCost(self, design):
+        """
+            Compute the cost of the given design and return a CostExplanation
+            that attributes that cost to the query classes in the workload.
+            This throws away all of the cached state so that every operation
+            is re-estimated, so it should not be used inside of the search.
+        """
+        explanation = CostExplanation(self.state.num_nodes)
+        self.reset()
+        self.last_design = None
+        self.state.explain = explanation
+        try:
+            cost = self.overallCost(design)
+        finally:
+            self.state.explain = None
+        explanation.finish(cost, self.last_components)
+        return cost, explanation
+    ## DEF
+
+    def getStats(self):
+        """Return the profiling counters with the latest cache and buffer counts from the State"""
+        counters = self.stats.counters
+        counters["cache_op_nodeIds_hits"] = self.state.op_nodeIds_hits
+        counters["cache_op_nodeIds_misses"] = self.state.op_nodeIds_misses
+        counters["cache_best_index_hits"] = self.state.best_index_hits
+        counters["cache_best_index_misses"] = self.state.best_index_misses
+        counters["lru_hits"] = self.state.lru_hits
+        counters["lru_misses"] = self.state.lru_misses
+        return self.stats
+    ## DEF
+
     def invalidateCache(self, col_name):
         self.state.invalidateCache(col_name)
         for c in self.allComponents:
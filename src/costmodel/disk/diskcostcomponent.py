@@ -37,7 +37,6 @@ import catalog
 from costmodel import AbstractCostComponent
 from fastlrubuffer import FastLRUBuffer
 from fastlrubufferusingwindow import FastLRUBufferWithWindow
-from workload import Session
 from util import Histogram, constants
 from search.utilmethods import getIndexSize
 
@@ -72,6 +71,11 @@ class DiskCostComponent(AbstractCostComponent):
         # index key insertion penalty: index -> largest key value
         self.index_key_insertion_penalty_map = { }
         self.total_index_insertion_penalty = 0 # This is only used for test
+
+        # CollectionName -> Page hits / Number of operations of the last design
+        # (see CostModel.getCostShares())
+        self.colPageHits = { }
+        self.colOps = { }
         
         self.no_index_size_estimation = True
         self.no_index_insertion_penalty = False
@@ -279,6 +283,9 @@ class DiskCostComponent(AbstractCostComponent):
         sess_ctr = 0
         total_index_penalty = 0
         total_worst_index_penalty = 0
+        explain = self.state.explain
+        colPageHits = { }
+        colOps = { }
         
         for sess in self.state.workload:
             for op in sess['operations']:
@@ -298,12 +305,14 @@ class DiskCostComponent(AbstractCostComponent):
                 # Check whether we have a cache index selection based on query_hashes
                 indexKeys, covering, index_size, slot_size = cache.best_index.get(op["query_hash"], (None, None, None, None))
                 if indexKeys is None:
+                    self.state.best_index_misses += 1
                     indexKeys, covering, index_size, slot_size = self.guess_op_info(design, op)
                     if self.state.cache_enable:
                         if self.debug: self.state.cache_miss_ctr.put("best_index")
                         cache.best_index[op["query_hash"]] = (indexKeys, covering, index_size, slot_size)
-                elif self.debug:
-                    self.state.cache_hit_ctr.put("best_index")
+                else:
+                    self.state.best_index_hits += 1
+                    if self.debug: self.state.cache_hit_ctr.put("best_index")
                 pageHits = 0
                 maxHits = 0
                 indexKeyInsertionPenalty = 0
@@ -345,14 +354,14 @@ class DiskCostComponent(AbstractCostComponent):
                             if documentId is None:
                                 values = catalog.getFieldValues(indexKeys, content)
                                 try:
-                                    documentId = hash(values)
+                                    documentId = catalog.hashFieldValues(values)
                                 except:
                                     if self.debug: LOG.error("Failed to compute index documentIds for op #%d - %s\n%s",\
                                         op['query_id'], values, pformat(op))
                                     self.err_ctr += 1
                                     break
                                 
-                                if self.state.cache_enable:
+                                if self.state.op_cache_enable:
                                     if self.debug: self.state.cache_miss_ctr.put("index_docIds")
                                     cache.index_docIds[op['query_id']] = documentId
                             elif self.debug:
@@ -381,14 +390,14 @@ class DiskCostComponent(AbstractCostComponent):
                             if documentId is None:
                                 values = catalog.getAllValues(content)
                                 try:
-                                    documentId = hash(values)
+                                    documentId = catalog.hashFieldValues(values)
                                 except:
                                     if self.debug: LOG.error("Failed to compute collection documentIds for op #%d - %s\n%s",\
                                         op['query_id'], values, pformat(op))
                                     self.err_ctr += 1
                                     break
                                     
-                                if self.state.cache_enable:
+                                if self.state.op_cache_enable:
                                     if self.debug: self.state.cache_miss_ctr.put("collection_docIds")
                                     cache.collection_docIds[op['query_id']] = documentId
                             elif self.debug:
@@ -413,8 +422,12 @@ class DiskCostComponent(AbstractCostComponent):
                 ## FOR (content)
                 totalCost += pageHits
                 totalWorst += maxHits
+                colPageHits[op['collection']] = colPageHits.get(op['collection'], 0) + pageHits
+                colOps[op['collection']] = colOps.get(op['collection'], 0) + 1
                 total_index_penalty += indexKeyInsertionPenalty
                 total_worst_index_penalty += worst_index_penalty
+                if not explain is None:
+                    explain.addDisk(op, pageHits, maxHits, indexKeyInsertionPenalty, indexKeys, covering)
                 
                 if self.debug:
                     LOG.debug("Op #%d on '%s' -> [pageHits:%d / worst:%d]",\
@@ -428,6 +441,8 @@ class DiskCostComponent(AbstractCostComponent):
             ## FOR (sess)
 
         self.total_index_insertion_penalty = total_index_penalty
+        self.colPageHits = colPageHits
+        self.colOps = colOps
         
         # Add index insertion penalty to the total cost
         if not self.no_index_insertion_penalty:
@@ -455,6 +470,11 @@ class DiskCostComponent(AbstractCostComponent):
 
         map(FastLRUBufferWithWindow.validate, self.buffers)
 
+        for lru in self.buffers:
+            self.state.lru_hits += lru.refreshed
+            self.state.lru_misses += lru.misses
+        ## FOR
+
         if self.debug:
             cache_success = sum([ x for x in self.state.cache_hit_ctr.itervalues() ])
             cache_miss = sum([ x for x in self.state.cache_miss_ctr.itervalues() ])
@@ -44,6 +44,7 @@ class FastLRUBufferWithWindow:
         self.free_slots = window_size
         self.evicted = 0
         self.refreshed = 0
+        self.misses = 0
 
         # self.address_size = constants.DEFAULT_ADDRESS_SIZE # FIXME
         ## DEF
@@ -56,6 +57,7 @@ class FastLRUBufferWithWindow:
         self.buffer = { }
         self.evicted = 0
         self.refreshed = 0
+        self.misses = 0
         self.head = None
         self.tail = None
     ## DEF
@@ -107,6 +109,7 @@ class FastLRUBufferWithWindow:
         else:
 #            assert not buffer_tuple in self.buffer, "Duplicate entry '%s'" % buffer_tuple
 #            assert size < self.buffer_size
+            self.misses += 1
             if self.debug:
                 self.__print_buffer__()
             return self.__push__(buffer_tuple, slot_size)
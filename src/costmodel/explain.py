@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import json
+import logging
+
+LOG = logging.getLogger(__name__)
+
+# The numeric attributes of an entry that the report can be sorted on
+SORT_KEYS = [
+    "page_hits",
+    "worst_pages",
+    "index_penalty",
+    "op_count",
+    "nodes_touched",
+    "broadcast_ops",
+    "targeted_ops",
+    "skew_contribution",
+]
+DEFAULT_SORT_KEY = "page_hits"
+
+# The attribute of an entry that each cost component is attributed by
+COMPONENT_MEASURES = {
+    "disk":    "page_hits",
+    "network": "nodes_touched",
+    "skew":    "skew_contribution",
+}
+
+## ==============================================
+## CostExplanation
+## ==============================================
+class CostExplanation(object):
+    """
+        Break down the cost of a single design by query class (query_hash).
+        The cost components will feed this object while they are computing
+        the cost of the design if it is attached to the cost model's State.
+        When it is not attached, the components only pay for a None check.
+    """
+
+    def __init__(self, num_nodes):
+        self.num_nodes = num_nodes
+
+        # QueryHash -> Entry Dict
+        self.entries = { }
+
+        # QueryId -> Broadcast Flag
+        # We only need this so that we don't count the same op twice when
+        # the cost components ask for its touched nodes
+        self.routed = { }
+
+        # Segment -> QueryHash -> NodeId -> Count
+        self.skew_accesses = { }
+
+        # ComponentName -> Cost
+        self.components = { }
+        self.total_cost = None
+    ## DEF
+
+    def getEntry(self, op):
+        entry = self.entries.get(op["query_hash"], None)
+        if entry is None:
+            entry = {
+                "query_hash":        op["query_hash"],
+                "collection":        op["collection"],
+                "type":              op["type"],
+                "op_count":          0,
+                "page_hits":         0,
+                "worst_pages":       0,
+                "index_penalty":     0,
+                "index":             None,
+                "covering":          False,
+                "nodes_touched":     0,
+                "broadcast_ops":     0,
+                "targeted_ops":      0,
+                "skew_contribution": 0.0,
+            }
+            self.entries[op["query_hash"]] = entry
+        return entry
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## COLLECTION CALLBACKS
+    ## -----------------------------------------------------------------------
+
+    def addDisk(self, op, pageHits, worstPages, indexPenalty, indexKeys, covering):
+        """Record the disk estimate of a single operation"""
+        entry = self.getEntry(op)
+        entry["op_count"] += 1
+        entry["page_hits"] += pageHits
+        entry["worst_pages"] += worstPages
+        entry["index_penalty"] += indexPenalty
+        entry["index"] = tuple(indexKeys) if indexKeys else None
+        entry["covering"] = covering
+    ## DEF
+
+    def addRouting(self, op, broadcast, node_ids):
+        """Record whether the NodeEstimator sent this op to every node or targeted it"""
+        if op["query_id"] in self.routed:
+            return
+        self.routed[op["query_id"]] = broadcast
+        entry = self.getEntry(op)
+        entry["nodes_touched"] += len(node_ids)
+        if broadcast:
+            entry["broadcast_ops"] += 1
+        else:
+            entry["targeted_ops"] += 1
+    ## DEF
+
+    def addSkew(self, segment, op, node_ids):
+        """Record which nodes an operation touched in the given workload segment"""
+        h = self.skew_accesses.setdefault(segment, { }).setdefault(op["query_hash"], { })
+        for node_id in node_ids:
+            h[node_id] = h.get(node_id, 0) + 1
+        self.getEntry(op)
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## FINALIZATION
+    ## -----------------------------------------------------------------------
+
+    def finish(self, total_cost, components):
+        """
+            Compute the derived values once the design has been fully evaluated.
+            The skew cost is divided up between the query classes based on how much
+            each one contributes to the accesses on nodes that are above the
+            perfectly uniform load in each segment.
+        """
+        self.total_cost = total_cost
+        self.components = dict(components)
+
+        skew_cost = self.components.get("skew", 0.0)
+        excess_by_hash = { }
+        total_excess = 0.0
+        for segment, hashes in self.skew_accesses.iteritems():
+            node_totals = { }
+            for counts in hashes.itervalues():
+                for node_id, cnt in counts.iteritems():
+                    node_totals[node_id] = node_totals.get(node_id, 0) + cnt
+            ## FOR
+            total = sum(node_totals.itervalues())
+            if not total: continue
+            uniform = total / float(self.num_nodes)
+            for node_id, node_total in node_totals.iteritems():
+                excess = node_total - uniform
+                if excess <= 0: continue
+                total_excess += excess
+                for query_hash, counts in hashes.iteritems():
+                    cnt = counts.get(node_id, 0)
+                    if not cnt: continue
+                    share = excess * (cnt / float(node_total))
+                    excess_by_hash[query_hash] = excess_by_hash.get(query_hash, 0.0) + share
+            ## FOR
+        ## FOR
+        for query_hash, entry in self.entries.iteritems():
+            if total_excess > 0:
+                entry["skew_contribution"] = skew_cost * excess_by_hash.get(query_hash, 0.0) / total_excess
+            else:
+                entry["skew_contribution"] = 0.0
+        ## FOR
+    ## DEF
+
+    ## -----------------------------------------------------------------------
+    ## REPORTING
+    ## -----------------------------------------------------------------------
+
+    def getEntries(self, sortKey=DEFAULT_SORT_KEY, reverse=True):
+        """Return the list of per-query-class entries ordered by the given attribute"""
+        assert sortKey in SORT_KEYS, "Invalid sort key '%s'" % sortKey
+        return sorted(self.entries.itervalues(), key=lambda e: (e[sortKey], e["query_hash"]), reverse=reverse)
+    ## DEF
+
+    def getCollections(self):
+        """Aggregate the per-query-class entries by collection"""
+        ret = { }
+        for entry in self.entries.itervalues():
+            col = ret.get(entry["collection"], None)
+            if col is None:
+                col = dict([(k, 0) for k in SORT_KEYS])
+                col["collection"] = entry["collection"]
+                col["query_classes"] = 0
+                ret[entry["collection"]] = col
+            col["query_classes"] += 1
+            for k in SORT_KEYS:
+                col[k] += entry[k]
+        ## FOR
+        return ret
+    ## DEF
+
+    def getCostShares(self, weights=None):
+        """
+            Split the total cost of the design between the collections. The cost of
+            each component is divided in proportion to the page hits (disk), the
+            nodes touched (network) and the skew contributions (skew) of the
+            collections. The optional weights are the cost model's component weights.
+            Returns a dict of CollectionName -> Fraction of the cost
+        """
+        collections = self.getCollections()
+        shares = dict([(col_name, 0.0) for col_name in collections.iterkeys()])
+        for component, cost in self.components.iteritems():
+            measure = COMPONENT_MEASURES.get(component, None)
+            if measure is None or not cost: continue
+            total = sum([col[measure] for col in collections.itervalues()])
+            if not total: continue
+            weight = weights.get(component, 1.0) if weights else 1.0
+            for col_name, col in collections.iteritems():
+                shares[col_name] += weight * cost * col[measure] / total
+        ## FOR
+        total = sum(shares.itervalues())
+        if total > 0:
+            for col_name in shares.iterkeys():
+                shares[col_name] /= total
+        return shares
+    ## DEF
+
+    def toDICT(self, sortKey=DEFAULT_SORT_KEY):
+        return {
+            "cost":        self.total_cost,
+            "components":  self.components,
+            "queries":     self.getEntries(sortKey),
+            "collections": sorted(self.getCollections().itervalues(), key=lambda c: c[sortKey], reverse=True),
+        }
+    ## DEF
+
+    def toJSON(self, sortKey=DEFAULT_SORT_KEY):
+        return json.dumps(self.toDICT(sortKey), sort_keys=True, indent=4)
+    ## DEF
+
+    def toText(self, sortKey=DEFAULT_SORT_KEY):
+        ret = "Overall Cost: %s\n" % self.total_cost
+        for name in sorted(self.components.iterkeys()):
+            ret += "  %-10s %s\n" % (name+":", self.components[name])
+
+        header = ("QUERY_HASH", "COLLECTION", "TYPE", "OPS", "PAGES", "WORST", "PENALTY", \
+                  "NODES", "BCAST", "TARGET", "SKEW", "INDEX")
+        f = "%-22s %-20s %-8s %8s %10s %10s %8s %8s %6s %6s %8s %s\n"
+        ret += "\n" + f % header
+        for e in self.getEntries(sortKey):
+            index = "-"
+            if e["index"]:
+                index = ",".join(e["index"]) + (" [covering]" if e["covering"] else "")
+            ret += f % (e["query_hash"], e["collection"][:20], e["type"], \
+                        e["op_count"], e["page_hits"], e["worst_pages"], e["index_penalty"], \
+                        e["nodes_touched"], e["broadcast_ops"], e["targeted_ops"], \
+                        "%.4f" % e["skew_contribution"], index)
+        ## FOR
+        return ret
+    ## DEF
+
+    def __str__(self):
+        return self.toText()
+    ## DEF
+## CLASS
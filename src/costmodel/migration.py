@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+from __future__ import division
+
+import logging
+
+LOG = logging.getLogger(__name__)
+
+# The kinds of migration steps in the order that they are applied in a plan.
+# We embed the collections first so that the other steps operate on the new
+# documents, and we build the new indexes before the collections are
+# resharded and before the old indexes are dropped so that the queries can
+# always use an index while the data is moving.
+MIGRATION_ACTIONS = [
+    "denormalize",
+    "add_index",
+    "reshard",
+    "drop_index",
+]
+
+## ==============================================
+## MigrationCost
+## ==============================================
+class MigrationCost(object):
+    """
+        Estimates how expensive it is to move from the deployed design to a new
+        one. Every shard key change, added or dropped index and denormalization
+        change is a migration step whose cost is the penalty of its kind times
+        the fraction of the database (doc_count * avg_doc_size) that it has to
+        rewrite. The cost model adds this to the cost of the design, so the
+        search only proposes changes that pay for themselves.
+
+        We only keep the sizes of the collections so that this can be sent to
+        the coordinator along with the initial design.
+    """
+
+    def __init__(self, collections, deployedDesign, config):
+        self.deployedDesign = deployedDesign
+        self.penalties = {
+            "reshard":     config.get('migration_shard_key', 0.0),
+            "add_index":   config.get('migration_add_index', 0.0),
+            "drop_index":  config.get('migration_drop_index', 0.0),
+            "denormalize": config.get('migration_denormalization', 0.0),
+        }
+        # The maximum number of migration steps (negative if there is no limit)
+        self.changeBudget = config.get('change_budget', -1)
+
+        self.collectionBytes = { }
+        for col_name, col_info in collections.iteritems():
+            self.collectionBytes[col_name] = (col_info['doc_count'] or 0) * (col_info['avg_doc_size'] or 0)
+        self.totalBytes = max(1, sum(self.collectionBytes.itervalues()))
+    ## DEF
+
+    def getSteps(self, design):
+        """
+            Return the list of (action, col_name, key, bytes) migration steps
+            that are needed to go from the deployed design to the given design.
+            The relaxed collections of a partial design are skipped, so adding
+            collections to it never removes a step.
+        """
+        steps = [ ]
+        deployed = self.deployedDesign
+        for col_name in design.getCollections():
+            if design.isRelaxed(col_name): continue
+            if not deployed.hasCollection(col_name) or deployed.isRelaxed(col_name): continue
+            col_bytes = self.collectionBytes.get(col_name, 0)
+
+            parent = design.getDenormalizationParent(col_name)
+            oldParent = deployed.getDenormalizationParent(col_name)
+            if parent != oldParent:
+                # The documents are rewritten along with the ones that they are
+                # moved into or taken out of
+                moved = col_bytes
+                for p in (parent, oldParent):
+                    if not p is None: moved += self.collectionBytes.get(p, 0)
+                steps.append(("denormalize", col_name, parent, moved))
+            ## IF
+
+            oldIndexes = set([tuple(i) for i in deployed.getIndexes(col_name)])
+            newIndexes = set([tuple(i) for i in design.getIndexes(col_name)])
+            for indexKeys in sorted(newIndexes - oldIndexes):
+                steps.append(("add_index", col_name, indexKeys, col_bytes))
+            for indexKeys in sorted(oldIndexes - newIndexes):
+                steps.append(("drop_index", col_name, indexKeys, col_bytes))
+
+            shardKeys = tuple(design.getShardKeys(col_name) or ())
+            if shardKeys != tuple(deployed.getShardKeys(col_name) or ()):
+                steps.append(("reshard", col_name, shardKeys, col_bytes))
+        ## FOR
+        return steps
+    ## DEF
+
+    def getStepCost(self, step):
+        return self.penalties[step[0]] * step[3] / self.totalBytes
+    ## DEF
+
+    def isOverBudget(self, design):
+        return self.changeBudget >= 0 and len(self.getSteps(design)) > self.changeBudget
+    ## DEF
+
+    def getCost(self, design):
+        """Return the migration cost of the given design (infinite if it is over the change budget)"""
+        steps = self.getSteps(design)
+        if self.changeBudget >= 0 and len(steps) > self.changeBudget:
+            return float("inf")
+        return sum(map(self.getStepCost, steps))
+    ## DEF
+
+    def getPlan(self, design):
+        """
+            Return the ordered list of migration steps to deploy the given design.
+            The steps are applied in the order of MIGRATION_ACTIONS, and the
+            smaller collections go first for every kind of step.
+        """
+        plan = [ ]
+        steps = sorted(self.getSteps(design), \
+                       key=lambda s: (MIGRATION_ACTIONS.index(s[0]), s[3], s[1], s[2]))
+        for action, col_name, key, size in steps:
+            plan.append({
+                "action": action,
+                "collection": col_name,
+                "key": list(key) if isinstance(key, tuple) else key,
+                "bytes": size,
+                "cost": self.getStepCost((action, col_name, key, size)),
+            })
+        ## FOR
+        return plan
+    ## DEF
+
+    def formatPlan(self, plan):
+        """Return a human-readable version of the given migration plan"""
+        if not plan:
+            return "No changes to the deployed design"
+        lines = [ ]
+        for i, step in enumerate(plan):
+            lines.append("[%02d] %-11s %-20s %-30s %12d bytes  cost=%.6f" % \
+                         (i, step["action"], step["collection"], step["key"], step["bytes"], step["cost"]))
+        return "\n".join(lines)
+    ## DEF
+## CLASS
@@ -31,7 +31,6 @@ basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, ".."))
 
 from costmodel import AbstractCostComponent
-from workload import Session
 from util import Histogram, constants
 
 from pprint import pformat
@@ -74,6 +73,7 @@ class NetworkCostComponent(AbstractCostComponent):
         total_op_count = 0
         total_msg_count = 0
         total_err = 0
+        pending = [ ]
         for col_name in self.state.col_names:
             # Collection is not in design.. don't include the op
             if not design.hasCollection(col_name):
@@ -87,29 +87,38 @@ class NetworkCostComponent(AbstractCostComponent):
                 total_op_count += self.cache[col_name][0]
                 total_msg_count += self.cache[col_name][1]
             else:
-                # TODO: The operations should come from the state handle, which
-                #       will have already combined things for us based on the design
-                op_count = 0
-                msg_count = 0
-                for op in self.state.col_op_xref[col_name]:
-                    # Process this op!
-                    cache = self.state.getCacheHandleByName(col_info = self.state.collections[col_name])
-                    op_count += 1
-                    try:
-                        msgs = self.state.__getNodeIds__(cache, design, op)
-                        assert len(msgs) <= self.state.num_nodes, \
-                            "%s -- NumMsgs[%d] <= NumNodes[%d]" % (msgs, len(msgs), self.state.num_nodes)
-                        msg_count += len(msgs)
-                        # if self.debug: LOG.debug("%s -> Messages %s", op, msgs)
-                    except:
-                        #LOG.warn("Failed to estimate touched nodes for op\n%s" % pformat(op))
-                        total_err += 1
-                        continue
+                pending.append(col_name)
+        ## FOR
+
+        if pending:
+            # COL_NAME -> [OP_COUNT, MSG_COUNT]
+            counts = dict([(col_name, [0, 0]) for col_name in pending])
+            # TODO: The operations should come from the state handle, which
+            #       will have already combined things for us based on the design
+            for op in self.__iterOps__(pending):
+                # Process this op!
+                col_counts = counts[op["collection"]]
+                cache = self.state.getCacheHandleByName(col_info = self.state.collections[op["collection"]])
+                col_counts[0] += 1
+                try:
+                    msgs = self.state.__getNodeIds__(cache, design, op)
+                    assert len(msgs) <= self.state.num_nodes, \
+                        "%s -- NumMsgs[%d] <= NumNodes[%d]" % (msgs, len(msgs), self.state.num_nodes)
+                    col_counts[1] += len(msgs)
+                    # if self.debug: LOG.debug("%s -> Messages %s", op, msgs)
+                except:
+                    #LOG.warn("Failed to estimate touched nodes for op\n%s" % pformat(op))
+                    total_err += 1
+                    continue
+            ## FOR
+            for col_name, (op_count, msg_count) in counts.iteritems():
                 # Store it in our cache so that we can reuse it
                 self.cache[col_name] = (op_count, msg_count)
 
                 total_op_count += op_count
                 total_msg_count += msg_count
+            ## FOR
+        ## IF
 
         if total_op_count > 0:
             cost = total_msg_count / float(self.state.orig_op_count * self.state.num_nodes)
@@ -119,4 +128,25 @@ class NetworkCostComponent(AbstractCostComponent):
                       cost, total_msg_count, total_op_count)
         return cost
     ## DEF
+
+    def __iterOps__(self, col_names):
+        """
+            Generator for all of the operations on the given collections.
+            If the workload is streamed, then we have to make a single pass over
+            it because we do not have the cross references from the State.
+        """
+        if self.state.streaming:
+            col_names = set(col_names)
+            for sess in self.state.workload:
+                for op in sess["operations"]:
+                    if op["collection"] in col_names:
+                        yield op
+                ## FOR
+            ## FOR
+        else:
+            for col_name in col_names:
+                for op in self.state.col_op_xref[col_name]:
+                    yield op
+            ## FOR
+    ## DEF
 ## CLASS
\ No newline at end of file
@@ -44,6 +44,9 @@ class NodeEstimator(object):
         # Keep track of how many times that we accessed each node
         self.nodeCounts = Histogram()
         self.op_count = 0
+
+        # Whether the last estimated operation was sent to every node
+        self.lastBroadcast = None
     ## DEF
 
     def reset(self):
@@ -152,6 +155,7 @@ class NodeEstimator(object):
 
         map(self.nodeCounts.put, results)
         self.op_count += 1
+        self.lastBroadcast = broadcast
         return results
     ## DEF
 
@@ -161,7 +165,7 @@ class NodeEstimator(object):
             This is just a simple (hash % N), where N is the number of nodes in the cluster
         """
         assert isinstance(values, tuple)
-        return hash(values) % self.num_nodes
+        return catalog.hashFieldValues(values) % self.num_nodes
     ## DEF
 
     def guessNodes(self, design, colName, fieldName):
@@ -25,6 +25,8 @@ import os
 import sys
 import logging
 import math
+from array import array
+from itertools import izip
 
 # mongodb-d4
 basedir = os.path.realpath(os.path.dirname(__file__))
@@ -49,6 +51,9 @@ class SkewCostComponent(AbstractCostComponent):
         # Keep track of how many times that we accessed each node
         self.nodeCounts = Histogram()
         self.workload_segments = [ ]
+        # If the workload is streamed, then we only keep the
+        # segment offset of each session instead of the sessions
+        self.session_segments = None
 
         # Pre-split the workload into separate intervals
         self.splitWorkload()
@@ -62,20 +67,30 @@ class SkewCostComponent(AbstractCostComponent):
             LOG.info("Computed Skew Cost: %f", 0.0)
             return 0.0
 
-        self.nodeCounts
         op_counts = [ 0 ] *  self.state.skew_segments
         segment_skew = [ 0 ] *  self.state.skew_segments
-        for i in range(0, len(self.workload_segments)):
-            # TODO: We should cache this so that we don't have to call it twice
-            segment_skew[i], op_counts[i] = self.calculateSkew(design, self.workload_segments[i])
-
-        weighted_skew = sum([segment_skew[i] * op_counts[i] for i in xrange(len(self.workload_segments))])
+        if self.state.streaming:
+            # Make a single pass over the workload and keep a separate
+            # histogram of the touched nodes for each segment
+            num_segments = self.state.skew_segments
+            nodeCounts = [ Histogram() for i in xrange(num_segments) ]
+            for sess, i in izip(self.state.originalWorload, self.session_segments):
+                op_counts[i] += self.__countNodes__(design, sess, nodeCounts[i], i)[0]
+            for i in xrange(num_segments):
+                segment_skew[i] = self.__computeSkew__(nodeCounts[i])
+        else:
+            num_segments = len(self.workload_segments)
+            for i in range(0, num_segments):
+                # TODO: We should cache this so that we don't have to call it twice
+                segment_skew[i], op_counts[i] = self.calculateSkew(design, self.workload_segments[i], i)
+
+        weighted_skew = sum([segment_skew[i] * op_counts[i] for i in xrange(num_segments)])
         cost = weighted_skew / float(sum(op_counts))
         LOG.info("Computed Skew Cost: %f", cost)
         return cost
     ## DEF
 
-    def calculateSkew(self, design, segment):
+    def calculateSkew(self, design, segment, segment_idx=None):
         """
             Calculate the cluster skew factor for the given workload segment
             See Alg.#3 from Pavlo et al. 2012:
@@ -92,45 +107,66 @@ class SkewCostComponent(AbstractCostComponent):
         num_ops = 0
         err_ops = 0
         for sess in segment:
-            for op in sess['operations']:
-                # Skip anything that doesn't have a design configuration
-                if not design.hasCollection(op['collection']):
-                    if self.debug: LOG.debug("Not in design: SKIP - %s Op #%d on %s", op['type'], op['query_id'], op['collection'])
-                    continue
-                if design.isRelaxed(op['collection']):
-                    if self.debug: LOG.debug("Relaxed: SKIP - %s Op #%d on %s", op['type'], op['query_id'], op['collection'])
-                    continue
-                col_info = self.state.collections[op['collection']]
-                cache = self.state.getCacheHandle(col_info)
-
-                #  This just returns an estimate of which nodes  we expect
-                #  the op to touch. We don't know exactly which ones they will
-                #  be because auto-sharding could put shards anywhere...
-                try: 
-                    node_ids = self.state.__getNodeIds__(cache, design, op)
-                    map(self.nodeCounts.put, node_ids)
-                    num_ops += 1
-                except:
-                    if self.debug:
-                        LOG.warn("Failed to estimate touched nodes for op\n%s" % pformat(op))
-                    err_ops += 1
-                    continue
-            ## FOR (op)
+            sess_ops, sess_errs = self.__countNodes__(design, sess, self.nodeCounts, segment_idx)
+            num_ops += sess_ops
+            err_ops += sess_errs
         ## FOR (sess)
         if self.debug: LOG.info("Total ops %s, errors %s", num_ops, err_ops)
         if self.debug: LOG.debug("Node Count Histogram:\n%s", self.nodeCounts)
-        total = self.nodeCounts.getSampleCount()
+        return self.__computeSkew__(self.nodeCounts), num_ops
+    ## DEF
+
+    def __countNodes__(self, design, sess, nodeCounts, segment_idx):
+        """
+            Add the nodes that each operation in the given session touches to the
+            nodeCounts histogram. Returns a tuple of (num_ops, err_ops)
+        """
+        num_ops = 0
+        err_ops = 0
+        explain = self.state.explain
+        for op in sess['operations']:
+            # Skip anything that doesn't have a design configuration
+            if not design.hasCollection(op['collection']):
+                if self.debug: LOG.debug("Not in design: SKIP - %s Op #%d on %s", op['type'], op['query_id'], op['collection'])
+                continue
+            if design.isRelaxed(op['collection']):
+                if self.debug: LOG.debug("Relaxed: SKIP - %s Op #%d on %s", op['type'], op['query_id'], op['collection'])
+                continue
+            col_info = self.state.collections[op['collection']]
+            cache = self.state.getCacheHandle(col_info)
+
+            #  This just returns an estimate of which nodes  we expect
+            #  the op to touch. We don't know exactly which ones they will
+            #  be because auto-sharding could put shards anywhere...
+            try: 
+                node_ids = self.state.__getNodeIds__(cache, design, op)
+                map(nodeCounts.put, node_ids)
+                num_ops += 1
+                if not explain is None:
+                    explain.addSkew(segment_idx, op, node_ids)
+            except:
+                if self.debug:
+                    LOG.warn("Failed to estimate touched nodes for op\n%s" % pformat(op))
+                err_ops += 1
+                continue
+        ## FOR (op)
+        return num_ops, err_ops
+    ## DEF
+
+    def __computeSkew__(self, nodeCounts):
+        """Compute the skew factor from the histogram of the number of times each node was touched"""
+        total = nodeCounts.getSampleCount()
         if not total:
-            return (0.0, num_ops)
+            return 0.0
 
         best = 1 / float(self.state.num_nodes)
         skew = 0.0
         for i in xrange(self.state.num_nodes):
-            ratio = self.nodeCounts.get(i, 0) / float(total)
+            ratio = nodeCounts.get(i, 0) / float(total)
             if ratio < best:
                 ratio = best + ((1 - ratio/best) * (1 - best))
             skew += math.log(ratio / best)
-        return skew / (math.log(1 / best) * self.state.num_nodes), num_ops
+        return skew / (math.log(1 / best) * self.state.num_nodes)
     ## DEF
 
     ## -----------------------------------------------------------------------
@@ -140,6 +176,10 @@ class SkewCostComponent(AbstractCostComponent):
     def splitWorkload(self):
         """Divide the workload up into segments for skew analysis"""
 
+        if self.state.streaming:
+            self.splitStreamingWorkload()
+            return
+
         start_time = None
         end_time = None
         for i in xrange(len(self.state.workload)):
@@ -166,6 +206,27 @@ class SkewCostComponent(AbstractCostComponent):
         ## FOR
     ## DEF
 
+    def splitStreamingWorkload(self):
+        """Compute the segment offset of each session in a streamed workload"""
+        workload = self.state.workload
+        start_time = workload.start_time
+        end_time = workload.end_time
+        assert not start_time is None,\
+            "Failed to find start time in %d sessions" % len(workload)
+        assert not end_time is None,\
+            "Failed to find end time in %d sessions" % len(workload)
+
+        if self.debug:
+            LOG.debug("Workload Segments - START:%d / END:%d", start_time, end_time)
+        self.session_segments = array('H')
+        for sess in workload:
+            idx = self.getSessionSegment(sess, start_time, end_time)
+            assert idx >= 0 and idx < self.state.skew_segments,\
+                "Invalid workload segment '%d' for Session #%d" % (idx, sess['session_id'])
+            self.session_segments.append(idx)
+        ## FOR
+    ## DEF
+
     def getSessionSegment(self, sess, start_time, end_time):
         """Return the segment offset that the given Session should be assigned to"""
         timestamp = sess['start_time']
@@ -109,6 +109,12 @@ class State():
         self.col_names = [col_name for col_name in collections.iterkeys()]
         self.workload = None # working workload
         self.originalWorload = workload # points to the original workload
+
+        # If the workload is streamed from disk (see workload.SnapshotStream),
+        # then we cannot keep references to its sessions or operations. We will
+        # not build the cross references and the cost components will make a
+        # pass over the workload instead
+        self.streaming = getattr(workload, "isStreaming", False)
         
         self.weight_network = config.get('weight_network', 1.0)
         self.weight_disk = config.get('weight_disk', 1.0)
@@ -131,20 +137,40 @@ class State():
         
         # We need to know the number of operations in the original workload
         # so that all of our calculations are based on that
-        self.orig_op_count = 0
-        for sess in self.originalWorload:
-            self.orig_op_count += len(sess["operations"])
-        ## FOR
+        if self.streaming:
+            self.orig_op_count = workload.num_ops
+        else:
+            self.orig_op_count = 0
+            for sess in self.originalWorload:
+                self.orig_op_count += len(sess["operations"])
+            ## FOR
 
         ## ----------------------------------------------
         ## CACHING
         ## ----------------------------------------------
         self.cache_enable = True
+        # The caches that are keyed by query_id grow with the size of the
+        # workload, so we have to turn them off when streaming
+        self.op_cache_enable = self.cache_enable and not self.streaming
         self.cache_miss_ctr = Histogram()
         self.cache_hit_ctr = Histogram()
 
         # ColName -> CacheHandle
         self.cache_handles = { }
+
+        # Always-on counters for the look-up caches and the LRU buffers.
+        # These are never reset so that CostModel.getStats() can report
+        # them for the entire run
+        self.op_nodeIds_hits = 0
+        self.op_nodeIds_misses = 0
+        self.best_index_hits = 0
+        self.best_index_misses = 0
+        self.lru_hits = 0
+        self.lru_misses = 0
+
+        # Optional CostExplanation that the cost components will feed
+        # with per-query-class information. See CostModel.explainCost()
+        self.explain = None
     ## DEF
 
     def init_xref(self, workload):
@@ -153,7 +179,8 @@ class State():
         '''
         self.col_sess_xref = dict([(col_name, []) for col_name in self.col_names])
         self.col_op_xref = dict([(col_name, []) for col_name in self.col_names])
-        self.__buildCrossReference__(workload)
+        if not self.streaming:
+            self.__buildCrossReference__(workload)
     ## DEF
     
     def updateWorkload(self, workload):
@@ -228,19 +255,23 @@ class State():
     def __getNodeIds__(self, cache, design, op):
         node_ids = cache.op_nodeIds.get(op['query_id'], None)
         if node_ids is None:
+            self.op_nodeIds_misses += 1
             try:
                 node_ids = self.estimator.estimateNodes(design, op)
             except:
                 if self.debug:
                     LOG.error("Failed to estimate touched nodes for op #%d\n%s", op['query_id'], pformat(op))
                 raise
-            if self.cache_enable:
+            if self.op_cache_enable:
                 if self.debug: self.cache_miss_ctr.put("op_nodeIds")
                 cache.op_nodeIds[op['query_id']] = node_ids
+            if not self.explain is None:
+                self.explain.addRouting(op, self.estimator.lastBroadcast, node_ids)
             if self.debug:
                 LOG.debug("Estimated Touched Nodes for Op #%d: %d", op['query_id'], len(node_ids))
-        elif self.debug:
-            self.cache_hit_ctr.put("op_nodeIds")
+        else:
+            self.op_nodeIds_hits += 1
+            if self.debug: self.cache_hit_ctr.put("op_nodeIds")
         return node_ids
     ## DEF
 
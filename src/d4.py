@@ -43,7 +43,6 @@ sys.path.append(os.path.join(basedir, "../libs"))
 sys.path.append(os.path.join(basedir, "../exps/tools"))
 
 import argparse
-import mongokit
 
 # mongodb-d4
 import catalog
@@ -52,6 +51,7 @@ from search.designer import Designer
 from util import configutil
 from util import constants
 from util import termcolor
+from costmodel import explain
 from multithreaded.multi_search import MultiClientDesigner
 from multithreaded.messageprocessor import MessageProcessor
 
@@ -93,6 +93,24 @@ if __name__ == '__main__':
                         help='Limit the number of sessions to process from the sample workload.')
     agroup.add_argument('--op-limit', type=int, metavar='N', default=None,
                         help='Limit the number of operations to process from the sample workload.')
+    agroup.add_argument('--export-snapshot', type=str, metavar='FILE',
+                        help='Write the collection catalog and the workload from the metadata ' +
+                             'database into a snapshot file and then exit.')
+    agroup.add_argument('--snapshot', type=str, metavar='FILE',
+                        help='Load the collection catalog and the workload from a snapshot file ' +
+                             'created with --export-snapshot. No MongoDB connection is needed.')
+    agroup.add_argument('--resume', action='store_true',
+                        help='Continue the search from the checkpoint file in the configuration ' +
+                             '(multithread.checkpoint_file) instead of starting over. ' +
+                             'The workload is not processed again.')
+    agroup.add_argument('--seed', type=int, metavar='N',
+                        help='Make the search deterministic. Every worker derives its own ' +
+                             'random seed from this value (multithread.seed). Use it together ' +
+                             'with multithread.search_budget=evaluations to get the same design ' +
+                             'for the same inputs.')
+    agroup.add_argument('--telemetry', type=str, metavar='TARGET',
+                        help='Write the progress of the search as JSON lines to this file or ' +
+                             "'unix:PATH' / 'tcp:HOST:PORT' socket (multithread.telemetry).")
 
     # MongoDB Trace Processing Options
     agroup = aparser.add_argument_group(termcolor.bold('MongoDB Workload Processing Options'))
@@ -148,6 +166,26 @@ if __name__ == '__main__':
                         
     aparser.add_argument('--init-design', action='store_true',
                         help='Get the initial design for current workload')
+    aparser.add_argument('--deployed-design', type=str, metavar='FILE',
+                        help='Re-optimize the design that is currently deployed, which is given in this ' +
+                             'design file. The search starts from it, and the cost of every design includes ' +
+                             'the cost of migrating to it (costmodel.migration_*).')
+    aparser.add_argument('--change-budget', type=int, metavar='N',
+                        help='The maximum number of migration steps from the --deployed-design ' +
+                             '(costmodel.change_budget).')
+    aparser.add_argument('--migration-plan', type=str, metavar='FILE',
+                        help='Write the ordered steps that migrate the --deployed-design to the ' +
+                             'final design into this file.')
+
+    aparser.add_argument('--explain', action='store_true',
+                        help='Print a breakdown of the cost of the design given with --input-design ' +
+                             'for each query class and collection in the workload.')
+    aparser.add_argument('--explain-sort', type=str, default=explain.DEFAULT_SORT_KEY, choices=explain.SORT_KEYS,
+                        help='The attribute used to sort the --explain report.')
+    aparser.add_argument('--explain-format', type=str, default='text', choices=['text', 'json'],
+                        help='The output format of the --explain report.')
+    aparser.add_argument('--explain-output', type=str, metavar='FILE',
+                        help='Write the --explain report to this file instead of standard out.')
                         
     args = vars(aparser.parse_args())
 
@@ -166,57 +204,89 @@ if __name__ == '__main__':
     config = RawConfigParser()
     configutil.setDefaultValues(config)
     config.read(os.path.realpath(args['config'].name))
+
+    if not args['change_budget'] is None:
+        config.set(configutil.SECT_COSTMODEL, 'change_budget', str(args['change_budget']))
+    if args['deployed_design']:
+        # The workers might not have the same working directory
+        args['deployed_design'] = os.path.realpath(args['deployed_design'])
+    if not args['seed'] is None:
+        config.set(configutil.SECT_MULTI_SEARCH, 'seed', str(args['seed']))
+    if args['telemetry']:
+        config.set(configutil.SECT_MULTI_SEARCH, 'telemetry', args['telemetry'])
+    if args['resume']:
+        checkpoint_file = config.get(configutil.SECT_MULTI_SEARCH, 'checkpoint_file')
+        if not checkpoint_file or not os.path.exists(checkpoint_file):
+            LOG.error("Cannot resume without an existing checkpoint file (%s.checkpoint_file)", configutil.SECT_MULTI_SEARCH)
+            sys.exit(1)
+        # The workers might not have the same working directory
+        config.set(configutil.SECT_MULTI_SEARCH, 'checkpoint_file', os.path.realpath(checkpoint_file))
     
     ## ----------------------------------------------
     ## Connect to MongoDB
     ## ----------------------------------------------
-    hostname = config.get(configutil.SECT_MONGODB, 'host')
-    port = config.getint(configutil.SECT_MONGODB, 'port')
-    assert hostname
-    assert port
-    try:
-        conn = mongokit.Connection(host=hostname, port=port)
-    except:
-        LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
-        raise
-    ## Register our objects with MongoKit
-    conn.register([ catalog.Collection, workload.Session ])
+    if args['snapshot']:
+        # Everything that the designer needs is in the snapshot file
+        # The workers might not have the same working directory
+        args['snapshot'] = os.path.realpath(args['snapshot'])
+        LOG.info("Loading the catalog and the workload from snapshot '%s'", args['snapshot'])
+        metadata_db = None
+        dataset_db = None
+    else:
+        # Only needed when we talk to MongoDB
+        import mongokit
+        hostname = config.get(configutil.SECT_MONGODB, 'host')
+        port = config.getint(configutil.SECT_MONGODB, 'port')
+        assert hostname
+        assert port
+        try:
+            conn = mongokit.Connection(host=hostname, port=port)
+        except:
+            LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
+            raise
+        ## Register our objects with MongoKit
+        conn.register([ catalog.Collection, workload.Session ])
 
-    ## Make sure that the databases that we need are there
-    db_names = conn.database_names()
-    for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
-        if not config.has_option(configutil.SECT_MONGODB, key):
-            raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-        elif not config.get(configutil.SECT_MONGODB, key):
-            raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-    ## FOR
+        ## Make sure that the databases that we need are there
+        db_names = conn.database_names()
+        for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
+            if not config.has_option(configutil.SECT_MONGODB, key):
+                raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+            elif not config.get(configutil.SECT_MONGODB, key):
+                raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+        ## FOR
 
-    ## ----------------------------------------------
-    ## MONGODB DATABASE RESET
-    ## ----------------------------------------------
-    metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
-    dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
+        ## ----------------------------------------------
+        ## MONGODB DATABASE RESET
+        ## ----------------------------------------------
+        metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
+        dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
 
-    if args['reset']:
-        LOG.warn("Dropping collections from %s and %s databases" % (metadata_db.name, dataset_db.name))
-        for col_name in [metadata_db.Session.collection.name, metadata_db.Collection.collection.name]:
-            if LOG.isEnabledFor(logging.DEBUG):
-                LOG.warn("Dropping %s.%s", metadata_db.name, col_name)
-            metadata_db.drop_collection(col_name)
-        ## FOR
+        if args['reset']:
+            LOG.warn("Dropping collections from %s and %s databases" % (metadata_db.name, dataset_db.name))
+            for col_name in [metadata_db.Session.collection.name, metadata_db.Collection.collection.name]:
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.warn("Dropping %s.%s", metadata_db.name, col_name)
+                metadata_db.drop_collection(col_name)
+            ## FOR
 
-        for col_name in dataset_db.collection_names():
-            if col_name.startswith("system"): continue
-            if LOG.isEnabledFor(logging.DEBUG):
-                LOG.warn("Dropping %s.%s" % (dataset_db.name, col_name))
-            dataset_db.drop_collection(col_name)
-        ## FOR
+            for col_name in dataset_db.collection_names():
+                if col_name.startswith("system"): continue
+                if LOG.isEnabledFor(logging.DEBUG):
+                    LOG.warn("Dropping %s.%s" % (dataset_db.name, col_name))
+                dataset_db.drop_collection(col_name)
+            ## FOR
+        ## IF
     ## IF
     
     # This designer is only used for input processing
     designer = Designer(config, metadata_db, dataset_db)
     designer.setOptionsFromArguments(args)
     
+    if args['export_snapshot']:
+        designer.exportSnapshot(args['export_snapshot'])
+        exit("Snapshot export done")
+    ## IF
     if args['init_design']:
         designer.load(False, None, True)
         exit("Initial Design done")
@@ -236,7 +306,7 @@ if __name__ == '__main__':
         ## ----------------------------------------------
         ## STEP 1: INPUT PROCESSING
         ## ----------------------------------------------
-        if not (args['no_load'] or args['no_post_process']):
+        if not (args['no_load'] or args['no_post_process'] or args['snapshot'] or args['resume']):
             if not args['mysql']:
                 # If the user passed in '-', then we'll read from stdin
                 inputFile = args['mongo']
@@ -269,9 +339,18 @@ if __name__ == '__main__':
         ## ----------------------------------------------
         #import pycallgraph
         #pycallgraph.start_trace()
+        # Load the workload once here and let the workers load it from a
+        # snapshot file instead of having each of them query MongoDB
+        shared_snapshot = None
+        if not args['snapshot'] and configutil.getBoolean(config, configutil.SECT_MULTI_SEARCH, 'share_workload'):
+            shared_snapshot = designer.exportSharedSnapshot(config.get(configutil.SECT_MULTI_SEARCH, 'snapshot_dir'))
+            args['snapshot'] = shared_snapshot
         # Bombs away!!! Quote from the previous contributors 
-        mcd = MultiClientDesigner(config, args)
-        mcd.runSearch()
+        try:
+            mcd = MultiClientDesigner(config, args)
+            mcd.runSearch()
+        finally:
+            if shared_snapshot: os.remove(shared_snapshot)
         #try:
             #finalSolution = designer.search()
         #finally:
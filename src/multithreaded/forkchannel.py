@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import os
+import sys
+import socket
+import logging
+import threading
+import Queue
+import execnet
+from multiprocessing import Pipe
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## ForkChannel
+## ==============================================
+class ForkChannel(object):
+    """
+        One end of a pipe between the coordinator and a worker process that we
+        forked from it. It has the parts of the execnet channel interface that
+        the coordinator and the workers use, so they can talk over it with the
+        same messages as over an execnet gateway.
+    """
+
+    def __init__(self, conn, pid=None):
+        self.conn = conn
+        # The pid of the worker process on the other end (only on the coordinator's end)
+        self.pid = pid
+        # There is no gateway, so the messages are sent directly
+        self.gateway = None
+        # The search threads of a worker send messages at the same time
+        self.lock = threading.Lock()
+    ## DEF
+
+    def send(self, item):
+        with self.lock:
+            self.conn.send_bytes(item)
+    ## DEF
+
+    def receive(self, timeout=None):
+        if not timeout is None and not self.conn.poll(timeout):
+            raise execnet.TimeoutError("no item after %s seconds" % timeout)
+        return self.conn.recv_bytes()
+    ## DEF
+
+    def __iter__(self):
+        """Return the items until the other end is closed"""
+        while True:
+            try:
+                yield self.conn.recv_bytes()
+            except (EOFError, IOError):
+                return
+        ## WHILE
+    ## DEF
+
+    def close(self):
+        self.conn.close()
+    ## DEF
+
+    def shutdown(self):
+        """
+            Tell the other end that we are done. Unlike close(), this also wakes up
+            the threads of this process that are waiting for an item from it
+        """
+        sock = socket.fromfd(self.conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        finally:
+            sock.close()
+        self.close()
+    ## DEF
+
+    def __repr__(self):
+        return "<ForkChannel pid=%s>" % self.pid
+    ## DEF
+## CLASS
+
+def forkWorkers(num_workers, target):
+    """
+        Fork num_workers processes that each call target(channel, worker_idx)
+        with their end of a ForkChannel and then exit. The workers get a
+        copy-on-write copy of everything that this process already loaded.
+        Returns the coordinator's end of the channel of every worker.
+    """
+    channels = [ ]
+    for worker_idx in xrange(num_workers):
+        parent_conn, child_conn = Pipe()
+        pid = os.fork()
+        if pid == 0:
+            # The workers only see EOF when all of the copies of the
+            # coordinator's end of their channel are closed
+            parent_conn.close()
+            for ch in channels: ch.close()
+            status = 0
+            try:
+                target(ForkChannel(child_conn), worker_idx)
+            except:
+                LOG.exception("Worker #%d failed", worker_idx)
+                status = 1
+            finally:
+                logging.shutdown()
+                sys.stdout.flush()
+                sys.stderr.flush()
+                # Don't run the coordinator's exit handlers
+                os._exit(status)
+        ## IF
+        child_conn.close()
+        channels.append(ForkChannel(parent_conn, pid))
+        LOG.debug("Forked worker #%d [pid=%d]", worker_idx, pid)
+    ## FOR
+    return channels
+## DEF
+
+def joinWorkers(channels):
+    """Close the channels to the forked workers and wait for them to exit"""
+    for ch in channels:
+        ch.shutdown()
+    for ch in channels:
+        pid, status = os.waitpid(ch.pid, 0)
+        if status != 0:
+            LOG.warn("Worker process %d exited with status %d", pid, status)
+    ## FOR
+## DEF
+
+def makeReceiveQueue(channels):
+    """
+        Return a queue of the (channel, item) from all of the given channels
+        like execnet.MultiChannel.make_receive_queue()
+    """
+    if not [ch for ch in channels if isinstance(ch, ForkChannel)]:
+        return execnet.MultiChannel(channels).make_receive_queue()
+    queue = Queue.Queue()
+    def receiveAll(ch):
+        for item in ch:
+            queue.put((ch, item))
+    ## DEF
+    for ch in channels:
+        t = threading.Thread(target=receiveAll, args=(ch,))
+        t.daemon = True
+        t.start()
+    ## FOR
+    return queue
+## DEF
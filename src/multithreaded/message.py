@@ -22,6 +22,8 @@
 # ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
+import os
+import sys
 import time
 import execnet
 import random
@@ -32,6 +34,11 @@ try:
 except:
    import pickle
 
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, ".."))
+
+from search.design import Design
+
 LOG = logging.getLogger(__name__)
    
 # All of the strings in this list will become
@@ -53,9 +60,19 @@ MSG_STATUS_CODES = [
     "EVALUATED_ONE_DESIGN",
     "FINISHED_UPDATE",
     "SEARCH_INFO",
-    "OTHER_MESSAGE"
+    "SEARCH_STATS",
+    "OTHER_MESSAGE",
+    "CHECKPOINT",
+    "CMD_ASSIGN_WORK",
+    "CMD_STEAL_WORK",
+    "REQUEST_WORK",
+    "STOLEN_WORK",
+    "EVALUATED_DESIGNS",
 ]
 
+# Default number of seconds between the MSG_EVALUATED_DESIGNS reports
+DEFAULT_PROGRESS_INTERVAL = 1.0
+
 MSG_NAME_MAPPING = { }
 for code in xrange(0, len(MSG_STATUS_CODES)):
     name = "MSG_%s" % MSG_STATUS_CODES[code]
@@ -148,3 +165,108 @@ class Message:
         self.header = header
         self.data = data
 ## CLASS
+
+## ==============================================
+## DesignCodec
+## ==============================================
+class DesignCodec(object):
+    """
+        Encodes the designs that are sent through a channel as the Design.getKey()
+        entries of the collections that changed since the last design that was
+        sent in the same direction. The search usually only changes a few
+        collections at a time, so this is a lot smaller than a pickled Design.
+        The messages have to be decoded in the order that they were sent.
+    """
+
+    def __init__(self):
+        # CollectionName -> Design.getKey() entry
+        self.lastSent = { }
+        self.lastReceived = { }
+    ## DEF
+
+    def encode(self, design):
+        """Return the (changed entries, removed collections) of the design since the last one that we encoded"""
+        entries = design.getKey()
+        changed = tuple([e for e in entries if self.lastSent.get(e[0], None) != e])
+        names = set([e[0] for e in entries])
+        removed = tuple([col_name for col_name in self.lastSent if not col_name in names])
+        self.lastSent = dict([(e[0], e) for e in entries])
+        return (changed, removed)
+    ## DEF
+
+    def decode(self, delta):
+        """Return the design from the given encode() value"""
+        changed, removed = delta
+        for col_name in removed:
+            self.lastReceived.pop(col_name, None)
+        for entry in changed:
+            self.lastReceived[entry[0]] = entry
+        return Design.fromKey([self.lastReceived[col_name] for col_name in sorted(self.lastReceived)])
+    ## DEF
+## CLASS
+
+# Channel -> DesignCodec
+DESIGN_CODECS = { }
+
+def getDesignCodec(channel):
+    '''Return the DesignCodec for the designs that are sent and received through the channel'''
+    codec = DESIGN_CODECS.get(channel, None)
+    if codec is None:
+        codec = DesignCodec()
+        DESIGN_CODECS[channel] = codec
+    return codec
+
+def sendDesign(msg, cost, design, channel, components=None):
+    '''
+        Send the cost and the changes of the design since the last one that we sent
+        through the channel. The optional components are the cost of each of the
+        cost model components of the design (see CostModel.getComponents())
+    '''
+    sendMessage(msg, (cost, getDesignCodec(channel).encode(design), components), channel)
+
+def receiveDesign(data, channel):
+    '''Return the (cost, design) of a message that was sent with sendDesign()'''
+    return data[0], getDesignCodec(channel).decode(data[1])
+
+## ==============================================
+## ProgressCounter
+## ==============================================
+class ProgressCounter(object):
+    """
+        Counts the designs that a worker evaluated and reports them to the
+        coordinator in one MSG_EVALUATED_DESIGNS message at most every interval
+        seconds instead of sending a message for every design.
+    """
+
+    def __init__(self, channel, interval=DEFAULT_PROGRESS_INTERVAL):
+        self.channel = channel
+        self.interval = interval
+        self.lastFlush = time.time()
+        # The designs since the last report
+        self.count = 0
+        self.bestCost = None
+        self.minCost = None
+        # The number of reports that we sent
+        self.sent = 0
+    ## DEF
+
+    def add(self, bestCost, cost):
+        self.count += 1
+        self.bestCost = bestCost
+        if self.minCost is None or cost < self.minCost:
+            self.minCost = cost
+        if time.time() - self.lastFlush >= self.interval:
+            self.flush()
+    ## DEF
+
+    def flush(self):
+        """Report the designs that were evaluated since the last report"""
+        self.lastFlush = time.time()
+        if not self.count:
+            return
+        sendMessage(MSG_EVALUATED_DESIGNS, (self.count, self.bestCost, self.minCost), self.channel)
+        self.count = 0
+        self.minCost = None
+        self.sent += 1
+    ## DEF
+## CLASS
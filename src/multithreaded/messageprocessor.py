@@ -39,8 +39,10 @@ LOG = logging.getLogger(__name__)
 
 class MessageProcessor:
     ''' Message Processor'''
-    def __init__(self, channel):
+    def __init__(self, channel, preloaded=None):
         self.channel = channel
+        # Passed on to the Worker if this process was forked from the coordinator
+        self.preloaded = preloaded
         self.worker = None
         self.config = None
         self.benchmark = None
@@ -53,7 +55,7 @@ class MessageProcessor:
 
             # MSG_CMD_INIT
             if msg.header == MSG_CMD_INIT:
-                self.worker = Worker(msg.data[0],  msg.data[1], self.channel, msg.data[2])
+                self.worker = Worker(msg.data[0],  msg.data[1], self.channel, msg.data[2], self.preloaded)
             
             elif msg.header == MSG_CMD_LOAD_DB:
                 self.worker.load()
@@ -62,12 +64,22 @@ class MessageProcessor:
             # This will only occur once all of the threads complete the
             # EXECUTE_INIT phase.
             elif msg.header == MSG_CMD_EXECUTE:
-                self.worker.execute(msg.data[0], msg.data[1])
+                self.worker.execute(*msg.data)
             
             # MSG_CMD_UPDATE_BEST_COST
             # update the best cost of the current client
             elif msg.header == MSG_CMD_UPDATE_BEST_COST:
                 self.worker.update(msg.data)
+
+            # MSG_CMD_ASSIGN_WORK
+            # More partitions of the search space for this worker
+            elif msg.header == MSG_CMD_ASSIGN_WORK:
+                self.worker.assignWork(msg.data)
+
+            # MSG_CMD_STEAL_WORK
+            # Give some of our partitions to the idle worker with this id
+            elif msg.header == MSG_CMD_STEAL_WORK:
+                self.worker.stealWork(msg.data)
                 
             # MSG_CMD_STOP
             # Tells the worker thread to halt the benchmark
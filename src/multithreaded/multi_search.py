@@ -1,6 +1,7 @@
 
 import os
 import sys
+import time
 import logging
 import execnet
 
@@ -12,10 +13,90 @@ sys.path.append(os.path.join(basedir, "../search"))
 
 from search.designer import Designer
 from multi_search_coordinator import Coordinator
+from multi_search_worker import preloadDesigner
+from messageprocessor import MessageProcessor
+from forkchannel import forkWorkers, joinWorkers
 from util import configutil
 
 LOG = logging.getLogger(__name__)
 
+# The host name of the workers that run on this machine without ssh. Every
+# 'popen' entry in the host list is treated like a separate remote host, so
+# the workload is shipped to it and it gets its own copy (for testing)
+POPEN_HOST = "popen"
+
+# The arguments that are the paths of the input files that the workers read.
+# These are copied to every host once before the workers are started
+WORKER_INPUT_FILES = [ "snapshot", "deployed_design" ]
+
+# Size of the pieces that the input files are sent to the hosts in
+SHIP_CHUNK_SIZE = 1024 * 1024
+
+# How the workers on this machine are started (multithread.channel_mode)
+CHANNEL_EXECNET = "execnet"
+CHANNEL_FORK = "fork"
+CHANNEL_MODES = [ CHANNEL_EXECNET, CHANNEL_FORK ]
+
+# Runs on the other end of a gateway. It writes the pieces that it gets into
+# a temporary file until it gets None, and then sends back the path of the file
+RECEIVE_FILE = """
+import os, tempfile
+fd, path = tempfile.mkstemp(prefix="d4-", suffix=channel.receive())
+f = os.fdopen(fd, "wb")
+while True:
+    data = channel.receive()
+    if data is None: break
+    f.write(data)
+f.close()
+channel.send(path)
+"""
+
+REMOVE_FILES = """
+import os
+for path in channel.receive():
+    if os.path.exists(path): os.remove(path)
+channel.send(None)
+"""
+
+def parseHosts(value, default_count=1):
+    """
+        Return the list of (host, num_workers) from the given comma-separated
+        list of host[:num_workers] entries. The hosts without a count get
+        default_count workers.
+    """
+    hosts = [ ]
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry: continue
+        host, sep, count = entry.rpartition(":")
+        if not sep:
+            host, count = entry, default_count
+        try:
+            count = int(count)
+        except ValueError:
+            raise Exception("Invalid number of workers in the host entry '%s'" % entry)
+        assert host and count > 0, "Invalid host entry '%s'" % entry
+        hosts.append((host, count))
+    ## FOR
+    return hosts
+## DEF
+
+def shipFile(gw, path):
+    """Copy the given file to the host of the gateway and return the path of the copy there"""
+    ch = gw.remote_exec(RECEIVE_FILE)
+    ch.send(os.path.splitext(path)[1])
+    with open(path, "rb") as fd:
+        while True:
+            data = fd.read(SHIP_CHUNK_SIZE)
+            if not data: break
+            ch.send(data)
+        ## WHILE
+    ## WITH
+    ch.send(None)
+    return ch.receive()
+## DEF
+
+
 class MultiClientDesigner:
     """
         This is the multithreaded version of LNS search
@@ -25,21 +106,43 @@ class MultiClientDesigner:
         self.args = args # ONLY USED FOR Designer.setOptionsFromArguments: Comment: this is a weired method
         self.coordinator = Coordinator()
         self.channels = None
+        # The arguments for the worker of each channel. The paths of the input
+        # files are different on every host
+        self.workerArgs = None
+        # Gateway -> the paths of the input files that we copied to its host
+        self.shippedFiles = { }
+        # The channels of the workers that we forked from this process
+        self.forkedChannels = None
     ## DEF
             
     def runSearch(self):
-        self.channels = self.createChannels()
-        
-        # Step 1: Initialize all of the Workers on the client nodes
-        self.coordinator.init(self.config, self.channels, self.args)
+        try:
+            self.channels = self.createChannels()
             
-        # Step 2: Execute search 
-        self.coordinator.execute()
+            # Step 1: Initialize all of the Workers on the client nodes
+            self.coordinator.init(self.config, self.channels, self.args, self.workerArgs)
+                
+            # Step 2: Execute search 
+            self.coordinator.execute()
+        finally:
+            self.removeShippedFiles()
+            if self.forkedChannels:
+                joinWorkers(self.forkedChannels)
+                self.forkedChannels = None
     ## DEF
     
     def createChannels(self):
         '''Create a list of channels used for communication between coordinator and worker'''
         num_clients = self.config.getint(configutil.SECT_MULTI_SEARCH, 'num_clients')
+        hosts = self.config.get(configutil.SECT_MULTI_SEARCH, 'hosts')
+        if hosts.strip():
+            return self.createHostChannels(parseHosts(hosts, num_clients))
+        mode = self.config.get(configutil.SECT_MULTI_SEARCH, 'channel_mode')
+        assert mode in CHANNEL_MODES, "Invalid channel mode '%s'. Expected one of %s" % (mode, CHANNEL_MODES)
+        if mode == CHANNEL_FORK and hasattr(os, "fork"):
+            return self.createForkChannels(num_clients)
+        elif mode == CHANNEL_FORK:
+            LOG.warn("Cannot fork the workers on this platform. Starting them with execnet")
         LOG.info("Starting LNS search on %d clients" % num_clients)
 
         import d4
@@ -52,9 +155,93 @@ class MultiClientDesigner:
             ch = gw.remote_exec(remoteCall)
             channels.append(ch)
         ## FOR (hosts)
+        self.workerArgs = [ self.args ] * len(channels)
         
         LOG.debug(channels)
         return channels
     ## DEF
+
+    def createForkChannels(self, num_clients):
+        '''
+            Load the designer and the initial design in this process and then fork
+            the workers from it. They share the workload copy-on-write instead of
+            each starting a new interpreter and loading it again.
+        '''
+        start = time.time()
+        preloaded = preloadDesigner(self.config, self.args)
+        LOG.info("Loaded the workload in %.2f seconds. Forking %d clients", time.time() - start, num_clients)
+
+        def runWorker(channel, worker_idx):
+            MessageProcessor(channel, preloaded).processMessage()
+        ## DEF
+        self.forkedChannels = forkWorkers(num_clients, runWorker)
+        self.workerArgs = [ self.args ] * num_clients
+
+        LOG.debug(self.forkedChannels)
+        return list(self.forkedChannels)
+    ## DEF
+
+    def createHostChannels(self, hosts):
+        '''
+            Create the channels to the given list of (host, num_workers). The input
+            files of the workers are copied to each host once, and the workers on
+            that host are told to read them from there.
+        '''
+        LOG.info("Starting LNS search on %d clients on %d hosts" % (sum([x[1] for x in hosts]), len(hosts)))
+        remote_path = self.config.get(configutil.SECT_MULTI_SEARCH, 'remote_path') or os.getcwd()
+        remote_python = self.config.get(configutil.SECT_MULTI_SEARCH, 'remote_python')
+
+        import d4
+        remoteCall = d4
+        channels = [ ]
+        self.workerArgs = [ ]
+        for host_idx, (host, num_workers) in enumerate(hosts):
+            if host == POPEN_HOST:
+                spec = "popen"
+            else:
+                spec = "ssh=%s//chdir=%s" % (host, remote_path)
+                if remote_python: spec += "//python=%s" % remote_python
+            args = None
+            for i in xrange(num_workers):
+                gw = execnet.makegateway("%s//id=host%d-sub%d" % (spec, host_idx, i))
+                # Use the first gateway on every host to copy the input files
+                if args is None:
+                    args = self.shipInputFiles(gw, host)
+                ch = gw.remote_exec(remoteCall)
+                channels.append(ch)
+                self.workerArgs.append(args)
+            ## FOR
+        ## FOR (hosts)
+
+        LOG.debug(channels)
+        return channels
+    ## DEF
+
+    def shipInputFiles(self, gw, host):
+        '''Copy the input files of the workers to the host of the gateway and return the worker arguments for that host'''
+        args = dict(self.args)
+        for key in WORKER_INPUT_FILES:
+            if not args.get(key, None): continue
+            start = time.time()
+            args[key] = shipFile(gw, args[key])
+            self.shippedFiles.setdefault(gw, [ ]).append(args[key])
+            LOG.info("Copied '%s' [%.1fMB] to %s:%s in %.2f seconds", self.args[key], \
+                     os.path.getsize(self.args[key]) / (1024.0 * 1024.0), host, args[key], time.time() - start)
+        ## FOR
+        return args
+    ## DEF
+
+    def removeShippedFiles(self):
+        '''Remove the input files that we copied to the hosts'''
+        for gw, paths in self.shippedFiles.iteritems():
+            try:
+                ch = gw.remote_exec(REMOVE_FILES)
+                ch.send(paths)
+                ch.receive()
+            except Exception, ex:
+                LOG.warn("Failed to remove %s from the host of %s: %s", paths, gw, ex)
+        ## FOR
+        self.shippedFiles.clear()
+    ## DEF
     
 ## CLASS
\ No newline at end of file
@@ -1,9 +1,16 @@
 
 from message import *
+from forkchannel import makeReceiveQueue
+from telemetry import TelemetrySink, jsonCost, getPruneRate
 import sys
+import json
 import time
 import Queue
 
+from util import configutil
+from util import SearchStats
+from util import checkpoint
+
 import logging
 LOG = logging.getLogger(__name__)
 
@@ -13,24 +20,77 @@ class Coordinator:
         self.bestCost = sys.maxint
         self.config = None
         self.bestDesign = None
+
+        # WorkerId -> Latest SearchStats dict from that worker
+        self.worker_stats = { }
+        self.stats_file = None
+        self.stats_interval = None
+        self.last_stats_dump = None
+        self.search_start = None
+
+        # WorkerId -> Latest search state from that worker
+        self.worker_checkpoints = { }
+        self.checkpoint_file = None
+        self.checkpoint_interval = None
+        self.last_checkpoint = None
+        # Number of seconds that the search ran before we resumed it
+        self.previous_elapsed = 0.0
+
+        # The partitions of the search space from the workers (None if the
+        # search space is not partitioned), and WorkerId -> the number of
+        # partitions that we think that worker has not started yet
+        self.partitions = None
+        self.partitions_left = { }
+        self.num_steals = 0
+
+        # If the search is seeded, then the workers search on their own so that
+        # their searches do not depend on when they get each other's messages
+        self.seeded = False
+
+        # The MigrationCost from the deployed design if we are re-optimizing one
+        self.migration = None
+
+        # The optional TelemetrySink that gets the progress of the search as JSON lines
+        self.telemetry = None
+        self.telemetry_interval = None
+        self.last_telemetry = None
+        # Channel -> WorkerId
+        self.worker_ids = { }
+        # WorkerId -> Number of designs that it evaluated so far
+        self.worker_evaluations = { }
         
         self.debug = False
     ## DEF
     
-    def init(self, config, channels, args):
+    def init(self, config, channels, args, workerArgs=None):
+        """
+            Start the workers on the given channels. The optional workerArgs are
+            the arguments for the worker of each channel (e.g., if the paths of
+            the input files are different on their hosts)
+        """
         self.channels = channels
         self.config = config
         self.args = args
+        self.stats_file = config.get(configutil.SECT_MULTI_SEARCH, 'stats_file')
+        self.stats_interval = config.getint(configutil.SECT_MULTI_SEARCH, 'stats_interval')
+        self.checkpoint_file = config.get(configutil.SECT_MULTI_SEARCH, 'checkpoint_file')
+        self.checkpoint_interval = config.getint(configutil.SECT_MULTI_SEARCH, 'checkpoint_interval')
+        self.seeded = config.get(configutil.SECT_MULTI_SEARCH, 'seed').strip() != ""
+        self.worker_ids = dict([(channel, worker_id) for worker_id, channel in enumerate(self.channels)])
+        telemetry = config.get(configutil.SECT_MULTI_SEARCH, 'telemetry')
+        if telemetry:
+            self.telemetry = TelemetrySink(telemetry)
+            self.telemetry_interval = config.getfloat(configutil.SECT_MULTI_SEARCH, 'telemetry_interval')
+            LOG.info("Writing the search telemetry to '%s'", telemetry)
         
         start = time.time()
         
-        mch = execnet.MultiChannel(self.channels)
-        self.queue = mch.make_receive_queue()
+        self.queue = makeReceiveQueue(self.channels)
     
         # Tell every client to start
         worker_id = 0
         for channel in self.channels:
-            sendMessage(MSG_CMD_INIT, (config, args, worker_id), channel)
+            sendMessage(MSG_CMD_INIT, (config, workerArgs[worker_id] if workerArgs else args, worker_id), channel)
             worker_id += 1
         ## FOR
         
@@ -67,11 +127,20 @@ class Coordinator:
                 if msg.header == MSG_INITIAL_DESIGN:
                     num_of_response += 1
                     LOG.info("Got one initial design from worker #%s", msg.data[2])
-                    if msg.data[0] < bestInitCost:
+                    # Every worker splits up the search space in the same way
+                    if self.partitions is None and len(msg.data) > 3:
+                        self.partitions = msg.data[3]
+                    if self.migration is None and len(msg.data) > 4:
+                        self.migration = msg.data[4]
+                    # The workers don't compute an initial design when we resume
+                    if not msg.data[0] is None and msg.data[0] < bestInitCost:
                         bestInitCost = msg.data[0]
                         bestInitDesign = msg.data[1].copy()
                     ## IF
-                    if num_of_response == len(self.channels):
+                    if num_of_response == len(self.channels) and self.worker_checkpoints:
+                        LOG.info("Got all responses. Resuming the search from the checkpoint with cost %s", self.bestCost)
+                        break
+                    elif num_of_response == len(self.channels):
                         LOG.info("Got all responses and found the best initial design. Distribute it to all clients")
                         LOG.info("Initial cost: %s", bestInitCost)
                         LOG.info("Initial design: \n%s", bestInitDesign)
@@ -85,6 +154,8 @@ class Coordinator:
                 LOG.info("Got [%d] responses, missing [%d]", num_of_response, len(self.channels) - num_of_response)
         ## WHILE
         
+        if self.worker_checkpoints:
+            return self.bestCost, self.bestDesign
         assert bestInitCost != sys.maxint
         assert bestInitDesign
         
@@ -95,7 +166,22 @@ class Coordinator:
     ## DEF
     
     def sendExecuteCommand(self, bestInitCost, bestInitDesign):
-        self.send2All(MSG_CMD_EXECUTE, (bestInitCost, bestInitDesign))
+        if not self.partitions is None:
+            LOG.info("Distributing %d partitions of the search space to %d workers", len(self.partitions), len(self.channels))
+        worker_id = 0
+        for channel in self.channels:
+            partitions = None
+            if not self.partitions is None:
+                partitions = self.partitions[worker_id::len(self.channels)]
+                self.partitions_left[worker_id] = len(partitions)
+            # The worker gets its whole design memo back, but we don't keep it
+            state = self.worker_checkpoints.get(worker_id, None)
+            if not state is None:
+                state = dict(state)
+                state["memo"] = checkpoint.loadMemo(self.checkpoint_file, worker_id)
+            sendMessage(MSG_CMD_EXECUTE, (bestInitCost, bestInitDesign, state, partitions), channel)
+            worker_id += 1
+        ## FOR
         
         running_clients = len(self.channels)
         started_searching_process = 0
@@ -103,6 +189,10 @@ class Coordinator:
         finished_update = 0
         num_bestDesign = 0
         start = time.time()
+        self.search_start = start
+        self.last_stats_dump = start
+        self.last_telemetry = start
+        self.writeTelemetry("start")
         
         while True:
             try:
@@ -110,27 +200,42 @@ class Coordinator:
                 msg = getMessage(res)
                 
                 if msg.header == MSG_EXECUTE_COMPLETED:
+                    self.partitions_left[msg.data] = 0
                     running_clients -= 1
                     LOG.info("worker #%s has terminated, [%d] workers left.", msg.data, running_clients)
                     if running_clients == 0:
                         break
                 ## IF
-                elif msg.header == MSG_EVALUATED_ONE_DESIGN:
-                    evaluated_design += 1
+                elif msg.header == MSG_EVALUATED_DESIGNS:
+                    count = msg.data[0]
+                    evaluated_design += count
+                    worker_id = self.worker_ids[chan]
+                    self.worker_evaluations[worker_id] = self.worker_evaluations.get(worker_id, 0) + count
+                    if not self.telemetry is None and time.time() - self.last_telemetry > self.telemetry_interval:
+                        self.writeProgress()
                     if self.debug:
-                        LOG.info("Best cost: %s", msg.data[0])
-                        LOG.info("Evaluated cost: %s", msg.data[1])
+                        LOG.info("Best cost: %s", msg.data[1])
+                        LOG.info("Lowest evaluated cost: %s", msg.data[2])
                         
-                    # Output current status every 1000 evaluation
-                    if evaluated_design % 500 == 0:
+                    # Output current status every 500 evaluations
+                    if evaluated_design // 500 != (evaluated_design - count) // 500:
                         raise Queue.Empty
                     
                 ## ELIF
                 elif msg.header == MSG_FOUND_BEST_COST:
-                    bestCost = msg.data[0]
-                    bestDesign = msg.data[1]
+                    # Every design has to be decoded so that we can decode the next one from this worker
+                    bestCost, bestDesign = receiveDesign(msg.data, chan)
+                    components = msg.data[2] if len(msg.data) > 2 else None
                     
-                    if bestCost < self.bestCost:
+                    if self.seeded:
+                        # Ties are broken by the design so that the result
+                        # does not depend on which worker reported first
+                        if (bestCost, bestDesign.getKey()) < (self.bestCost, self.bestDesign.getKey()):
+                            self.bestCost = bestCost
+                            self.bestDesign = bestDesign.copy()
+                            num_bestDesign += 1
+                            self.writeTelemetry("best", worker=self.worker_ids[chan], components=components)
+                    elif bestCost < self.bestCost:
                         LOG.info("Got a new best design. Distribute it!")
                         LOG.info("Best cost is updated from %s to %s", self.bestCost, bestCost)
                         LOG.info("Time eplased: %s",time.time() - start)
@@ -139,16 +244,27 @@ class Coordinator:
                         
                         self.bestCost = bestCost
                         self.bestDesign = bestDesign.copy()
+                        self.writeTelemetry("best", worker=self.worker_ids[chan], components=components)
                         finished_update = 0
-                        self.send2All(MSG_CMD_UPDATE_BEST_COST, (bestCost, bestDesign))
+                        for channel in self.channels:
+                            sendDesign(MSG_CMD_UPDATE_BEST_COST, bestCost, bestDesign, channel)
                     ## IF
                 ## ELIF
                 elif msg.header == MSG_SEARCH_INFO:
                     #LOG.info("%s","*"*40)
                     LOG.info("worker #%s starts a new BBsearch, time limit: [%s], patient time used: [%s], worker run time: [%s]", msg.data[5], msg.data[1], msg.data[4], msg.data[3])
+                    self.writeTelemetry("round", worker=msg.data[5], relaxed=len(msg.data[0]), timeout=msg.data[1], \
+                                        relax_ratio=msg.data[6] if len(msg.data) > 6 else None)
                     #LOG.info("Relaxed collections: %s", msg.data[0])
                     #LOG.info("Relaxed Design:\n%s", msg.data[2])
                 ## ELIF
+                elif msg.header == MSG_SEARCH_STATS:
+                    self.worker_stats[msg.data[0]] = msg.data[1]
+                    if time.time() - self.last_stats_dump > self.stats_interval:
+                        self.dumpStats()
+                    if not self.telemetry is None:
+                        self.writeProgress()
+                ## ELIF
                 elif msg.header == MSG_START_SEARCHING:
                     LOG.info("worker #%s started searching", msg.data)
                     started_searching_process += 1
@@ -160,12 +276,41 @@ class Coordinator:
                     finished_update += 1
                     if finished_update == len(self.channels):
                         LOG.info("Perfect! All the processes have finished update")
+                ## ELIF
+                elif msg.header == MSG_REQUEST_WORK:
+                    self.partitions_left[msg.data] = 0
+                    self.stealWork(msg.data)
+                ## ELIF
+                elif msg.header == MSG_STOLEN_WORK:
+                    victim_id, thief_id, partitions, remaining = msg.data
+                    self.partitions_left[victim_id] = remaining
+                    if partitions:
+                        LOG.info("Moving %d partitions from worker #%s to worker #%s", len(partitions), victim_id, thief_id)
+                        self.num_steals += 1
+                        self.partitions_left[thief_id] = len(partitions)
+                        sendMessage(MSG_CMD_ASSIGN_WORK, partitions, self.channels[thief_id])
+                    else:
+                        # Try somebody else
+                        self.stealWork(thief_id)
+                ## ELIF
+                elif msg.header == MSG_CHECKPOINT:
+                    worker_id, state = msg.data
+                    # The memo only has the designs that are new since the
+                    # worker's last checkpoint (see util/checkpoint.py)
+                    memo = state.pop("memo")
+                    if self.checkpoint_file and memo:
+                        checkpoint.appendMemo(self.checkpoint_file, worker_id, memo)
+                    self.worker_checkpoints[worker_id] = state
+                    if time.time() - self.last_checkpoint > self.checkpoint_interval:
+                        self.writeCheckpoint()
+                ## ELIF
                 else:
                     LOG.info("Got invalid command: %s", msg.header)
                     LOG.info("invalid data:\n%s", msg.data)
                     exit("CUPCAKE")
                     
             except Queue.Empty:
+                self.writeProgress()
                 LOG.info("WAITING, clients left: %s", running_clients)
                 LOG.info("Number of evaluated design: %d", evaluated_design)
                 LOG.info("Found %s better designs so far", num_bestDesign)
@@ -180,6 +325,20 @@ class Coordinator:
             update the local best cost and distribute the new values to every channel
         """ 
         start = time.time()
+        self.last_checkpoint = start
+        if self.args.get("resume", False):
+            data = checkpoint.loadCheckpoint(self.checkpoint_file)
+            self.bestCost = data["best_cost"]
+            self.bestDesign = data["best_design"]
+            self.worker_checkpoints = data["workers"]
+            self.previous_elapsed = data["elapsed"]
+            if len(self.worker_checkpoints) != len(self.channels):
+                LOG.warn("The checkpoint has the state of %d workers but there are %d workers now", \
+                         len(self.worker_checkpoints), len(self.channels))
+        elif self.checkpoint_file:
+            checkpoint.removeMemos(self.checkpoint_file)
+        ## IF
+
         # STEP 0. Tell the clients to load the database from mongodb and generate their own initial design
         bestInitCost, bestInitDesign = self.sendLoadDBCommand()
         
@@ -191,12 +350,135 @@ class Coordinator:
         LOG.info("Best cost: %s", self.bestCost)
         LOG.info("Best design: \n%s", self.bestDesign)
         LOG.info("Time elapsed: %s", end - start)
+        if not self.partitions is None:
+            LOG.info("Split up the search space into %d partitions. Moved partitions between workers %d times", \
+                     len(self.partitions), self.num_steals)
+        self.dumpStats()
+        self.writeCheckpoint()
+        self.writeProgress()
+        self.writeTelemetry("end")
+        if not self.telemetry is None:
+            self.telemetry.close()
         
         outputfile = self.args.get("output_design", None)
         if outputfile:
             LOG.info("Writing final best design into files")
+            self.writeDesign(outputfile)
+        if not self.migration is None:
+            self.writeMigrationPlan(self.args.get("migration_plan", None))
+    ## DEF
+
+    def writeMigrationPlan(self, outputfile):
+        """Log the steps that move the deployed design to the best design and write them to the given file"""
+        plan = self.migration.getPlan(self.bestDesign)
+        LOG.info("Migration plan with %d steps [cost=%f]:\n%s", len(plan), \
+                 sum([step["cost"] for step in plan]), self.migration.formatPlan(plan))
+        if outputfile:
             f = open(outputfile, 'w')
-            f.write(self.bestDesign.toJSON())
+            f.write(json.dumps(plan, indent=4))
+            f.close()
+    ## DEF
+
+    def writeDesign(self, outputfile):
+        f = open(outputfile, 'w')
+        f.write(self.bestDesign.toJSON())
+        f.close()
+    ## DEF
+
+    def writeCheckpoint(self):
+        """
+            Write the best design and the latest state of every worker into the
+            checkpoint file if there is one. We also write out the best design so far
+            so that it is not lost if the search does not finish.
+        """
+        self.last_checkpoint = time.time()
+        if not self.checkpoint_file or not self.worker_checkpoints:
+            return
+        elapsed = self.previous_elapsed
+        if self.search_start:
+            elapsed += time.time() - self.search_start
+        checkpoint.writeCheckpoint(self.checkpoint_file, self.bestCost, self.bestDesign, self.worker_checkpoints, elapsed)
+        outputfile = self.args.get("output_design", None)
+        if outputfile:
+            self.writeDesign(outputfile)
+    ## DEF
+    
+    def writeTelemetry(self, event, **fields):
+        """Write a record with the given fields and the current state of the search to the telemetry sink"""
+        if self.telemetry is None:
+            return
+        now = time.time()
+        record = {
+            "event":        event,
+            "timestamp":    now,
+            "elapsed":      self.previous_elapsed + ((now - self.search_start) if self.search_start else 0.0),
+            "best_cost":    jsonCost(self.bestCost) if not self.bestDesign is None else None,
+            "evaluations":  sum(self.worker_evaluations.itervalues()),
+        }
+        record.update(fields)
+        self.telemetry.write(record)
+    ## DEF
+
+    def writeProgress(self):
+        """Write the evaluations and the prune rate of every worker to the telemetry sink"""
+        if self.telemetry is None:
+            return
+        self.last_telemetry = time.time()
+        workers = { }
+        for worker_id in xrange(len(self.channels)):
+            stats = self.worker_stats.get(worker_id, { })
+            workers[str(worker_id)] = {
+                "evaluations":  self.worker_evaluations.get(worker_id, 0),
+                "prune_rate":   getPruneRate(stats),
+            }
+        ## FOR
+        self.writeTelemetry("progress", workers=workers)
+    ## DEF
+
+    def stealWork(self, thief_id):
+        """
+            Ask the worker with the most partitions left to give some of them to the
+            given idle worker. If there aren't any left, then the idle worker gets
+            an empty list and it will stop. The partitions of a seeded search are
+            never moved between workers.
+        """
+        victims = [worker_id for worker_id, left in self.partitions_left.iteritems() if left > 0 and worker_id != thief_id]
+        if not victims or self.seeded:
+            LOG.info("No partitions left for worker #%s", thief_id)
+            sendMessage(MSG_CMD_ASSIGN_WORK, [ ], self.channels[thief_id])
+            return
+        victim_id = max(victims, key=lambda worker_id: self.partitions_left[worker_id])
+        sendMessage(MSG_CMD_STEAL_WORK, thief_id, self.channels[victim_id])
+    ## DEF
+
+    def getStats(self):
+        """Aggregate the latest profiling counters from all of the workers"""
+        total = SearchStats()
+        for stats in self.worker_stats.itervalues():
+            total.merge(stats)
+        elapsed = (time.time() - self.search_start) if self.search_start else None
+        ret = total.toDICT(elapsed)
+        ret["workers"] = self.worker_stats
+        return ret
+    ## DEF
+
+    def dumpStats(self):
+        """Log the aggregated profiling counters and write them to the stats file if there is one"""
+        self.last_stats_dump = time.time()
+        if not self.worker_stats:
+            return
+        stats = self.getStats()
+        LOG.info("Evaluations: %d [%.2f/sec]", stats["counters"].get("evaluations", 0), stats["evaluations_per_sec"])
+        LOG.info("Cache hit rates: %s", stats["hit_rates"])
+        LOG.info("Cost model time split: %s", stats["time_split"])
+        LOG.info("Better designs from other workers: %d absorbed, %d restarts, %d wasted evaluations", \
+                 stats["counters"].get("lns_incumbent_updates", 0), stats["counters"].get("lns_restarts", 0), \
+                 stats["counters"].get("lns_wasted_evaluations", 0))
+        if not stats["gauges"].get("time_to_near_best", None) is None:
+            LOG.info("Time to reach a cost within 1%% of the best: %.2f sec", stats["gauges"]["time_to_near_best"])
+        if self.stats_file:
+            f = open(self.stats_file, 'w')
+            f.write(json.dumps(stats, sort_keys=True, indent=4))
             f.close()
     ## DEF
     
@@ -11,17 +11,74 @@ from message import *
 
 import catalog
 import workload
-import mongokit
 
 import logging
 LOG = logging.getLogger(__name__)
 
+def establishConnection(config, args, channel=None):
+    """Return a new Designer for the given configuration and command-line arguments"""
+    if args.get('snapshot', None):
+        # The designer will load the catalog and the workload from the
+        # snapshot file, so we don't need to talk to MongoDB at all
+        designer = Designer(config, None, None, channel)
+        designer.setOptionsFromArguments(args)
+        return designer
+    ## IF
+    
+    ## ----------------------------------------------
+    ## Connect to MongoDB
+    ## ----------------------------------------------
+    # Only needed when we talk to MongoDB
+    import mongokit
+    hostname = config.get(configutil.SECT_MONGODB, 'host')
+    port = config.getint(configutil.SECT_MONGODB, 'port')
+    assert hostname
+    assert port
+    try:
+        conn = mongokit.Connection(host=hostname, port=port)
+    except:
+        LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
+        raise
+    ## Register our objects with MongoKit
+    conn.register([ catalog.Collection, workload.Session ])
+
+    ## Make sure that the databases that we need are there
+    db_names = conn.database_names()
+    for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
+        if not config.has_option(configutil.SECT_MONGODB, key):
+            raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+        elif not config.get(configutil.SECT_MONGODB, key):
+            raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
+    ## FOR
+    
+    metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
+    dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
+    
+    designer = Designer(config, metadata_db, dataset_db, channel)
+    designer.setOptionsFromArguments(args)
+    
+    return designer
+## DEF
+
+def preloadDesigner(config, args):
+    """
+        Load the designer and compute the initial design before the workers are
+        forked from this process (see Worker). Returns (designer, initialCost, initialDesign)
+    """
+    designer = establishConnection(config, args)
+    initialCost, initialDesign = designer.load(resume=args.get('resume', False))
+    return designer, initialCost, initialDesign
+## DEF
+
 class Worker:
-    def __init__(self, config, args, channel, worker_id):
+    def __init__(self, config, args, channel, worker_id, preloaded=None):
         self.config = config
         self.channel = channel
         self.args = args
         self.designer = None
+        # The (designer, initialCost, initialDesign) from preloadDesigner() if
+        # this worker was forked from the process that already loaded them
+        self.preloaded = preloaded
         self.bestLock = None
         self.worker_id = worker_id
         
@@ -32,59 +89,45 @@ class Worker:
         """
             Load data from mongodb
         """
-        self.designer = self.establishConnection(self.config, self.args, self.channel)
-        initialCost, initialDesign = self.designer.load()
-        sendMessage(MSG_INITIAL_DESIGN, (initialCost, initialDesign, self.worker_id), self.channel)
+        if self.preloaded:
+            self.designer, initialCost, initialDesign = self.preloaded
+            self.designer.channel = self.channel
+        else:
+            self.designer = self.establishConnection(self.config, self.args, self.channel)
+            initialCost, initialDesign = self.designer.load(resume=self.args.get('resume', False))
+        partitions = self.designer.getSearchPartitions()
+        # The coordinator needs the migration cost to write out the migration plan
+        sendMessage(MSG_INITIAL_DESIGN, (initialCost, initialDesign, self.worker_id, partitions, self.designer.cm.migration), self.channel)
     ## DEF
     
-    def execute(self, initialCost, initialDesign):
+    def execute(self, initialCost, initialDesign, checkpoint=None, partitions=None):
         """
             Run LNS/BB search and inform the coordinator once getting a new best design
         """
         sendMessage(MSG_START_SEARCHING, self.worker_id, self.channel)
-        self.designer.search(initialCost, initialDesign, self.worker_id)
+        self.designer.search(initialCost, initialDesign, self.worker_id, checkpoint, partitions)
+    ## DEF
+
+    def assignWork(self, partitions):
+        """Add partitions of the search space that the coordinator took from another worker"""
+        self.designer.search_method.addPartitions(partitions)
+    ## DEF
+
+    def stealWork(self, thief_id):
+        """Give up some of our partitions of the search space to an idle worker"""
+        partitions, remaining = self.designer.search_method.stealPartitions()
+        sendMessage(MSG_STOLEN_WORK, (self.worker_id, thief_id, partitions, remaining), self.channel)
     ## DEF
     
     def update(self, data):
-        bestCost = data[0]
-        bestDesign = data[1]
+        bestCost, bestDesign = receiveDesign(data, self.channel)
         
-        self.designer.search_method.bbsearch_method.updateBest(bestCost, bestDesign)
+        self.designer.search_method.updateBest(bestCost, bestDesign)
         sendMessage(MSG_FINISHED_UPDATE, self.worker_id, self.channel)
     ## DEF
     
     def establishConnection(self, config, args, channel):
-        ## ----------------------------------------------
-        ## Connect to MongoDB
-        ## ----------------------------------------------
-        hostname = config.get(configutil.SECT_MONGODB, 'host')
-        port = config.getint(configutil.SECT_MONGODB, 'port')
-        assert hostname
-        assert port
-        try:
-            conn = mongokit.Connection(host=hostname, port=port)
-        except:
-            LOG.error("Failed to connect to MongoDB at %s:%s" % (hostname, port))
-            raise
-        ## Register our objects with MongoKit
-        conn.register([ catalog.Collection, workload.Session ])
-
-        ## Make sure that the databases that we need are there
-        db_names = conn.database_names()
-        for key in [ 'dataset_db', ]: # FIXME 'workload_db' ]:
-            if not config.has_option(configutil.SECT_MONGODB, key):
-                raise Exception("Missing the configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-            elif not config.get(configutil.SECT_MONGODB, key):
-                raise Exception("Empty configuration option '%s.%s'" % (configutil.SECT_MONGODB, key))
-        ## FOR
-        
-        metadata_db = conn[config.get(configutil.SECT_MONGODB, 'metadata_db')]
-        dataset_db = conn[config.get(configutil.SECT_MONGODB, 'dataset_db')]
-        
-        designer = Designer(config, metadata_db, dataset_db, channel)
-        designer.setOptionsFromArguments(args)
-        
-        return designer
+        return establishConnection(config, args, channel)
     ## DEF
     
 ## CLASS
\ No newline at end of file
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import sys
+import json
+import math
+import socket
+import logging
+
+LOG = logging.getLogger(__name__)
+
+# The kinds of records that the coordinator writes to the telemetry sink
+#   start:    the workers start searching from the best initial design
+#   best:     a worker found a better design (its cost components, if the worker had them)
+#   round:    a worker started a new LNS round (relax ratio and time limit)
+#   progress: the evaluations and the prune rate of every worker so far
+#   end:      all of the workers finished
+TELEMETRY_EVENTS = [ "start", "best", "round", "progress", "end" ]
+
+# Prefixes of the sink targets that are sockets instead of files
+UNIX_PREFIX = "unix:"
+TCP_PREFIX = "tcp:"
+
+def jsonCost(cost):
+    """Return the cost as a value that JSON can represent (None if it is not finite or not known)"""
+    if cost is None or cost == sys.maxint or math.isinf(cost) or math.isnan(cost):
+        return None
+    return cost
+## DEF
+
+def getPruneRate(stats):
+    """Return the fraction of the BBSearch nodes that were pruned from the given SearchStats dict"""
+    counters = stats.get("counters", { })
+    pruned = counters.get("bb_nodes_pruned", 0)
+    total = pruned + counters.get("bb_nodes_expanded", 0)
+    return (pruned / float(total)) if total else None
+## DEF
+
+## ==============================================
+## TelemetrySink
+## ==============================================
+class TelemetrySink(object):
+    """
+        Writes the telemetry records of the search as JSON lines to a file, to a
+        unix socket ('unix:PATH') or to a TCP socket ('tcp:HOST:PORT'). Whatever
+        is listening on a socket has to be started before the search. If the
+        sink fails, then we stop writing to it instead of stopping the search.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.sock = None
+        if target.startswith(UNIX_PREFIX):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(target[len(UNIX_PREFIX):])
+            self.fd = self.sock.makefile("w")
+        elif target.startswith(TCP_PREFIX):
+            host, port = target[len(TCP_PREFIX):].rsplit(":", 1)
+            self.sock = socket.create_connection((host, int(port)))
+            self.fd = self.sock.makefile("w")
+        else:
+            self.fd = open(target, "w")
+        ## IF
+        # The number of records that we wrote
+        self.written = 0
+    ## DEF
+
+    def write(self, record):
+        if self.fd is None:
+            return
+        try:
+            self.fd.write(json.dumps(record, sort_keys=True) + "\n")
+            self.fd.flush()
+            self.written += 1
+        except (IOError, socket.error), ex:
+            LOG.warn("Stopped writing the search telemetry to '%s': %s", self.target, ex)
+            self.close()
+    ## DEF
+
+    def close(self):
+        if self.fd is None:
+            return
+        try:
+            self.fd.close()
+            if not self.sock is None: self.sock.close()
+        except (IOError, socket.error):
+            pass
+        self.fd = None
+    ## DEF
+## CLASS
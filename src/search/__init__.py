@@ -12,5 +12,7 @@ from utilmethods import *
 
 # Designer Algorithms
 from initialdesigner import InitialDesigner
+from knapsackdesigner import KnapsackDesigner
 from randomdesigner import RandomDesigner
 from lnsdesigner import LNSDesigner
+from metaheuristic import SimulatedAnnealingDesigner, GeneticDesigner
@@ -5,10 +5,12 @@ import sys
 import os
 import design
 import itertools
+import functools
 import signal
 from util import constants
 import logging
 import random
+from searchclock import WallClock
 
 logging.basicConfig(level = logging.INFO,
 format="%(asctime)s [%(filename)s:%(lineno)03d] %(levelname)-5s: %(message)s",
@@ -26,6 +28,22 @@ CONSTANTS & CONFIG
 '''
 INDEX_KEY_MAX_COMPOUND_COUNT = -1 # index key may consist of any combination of possible indexes
 SHARD_KEY_MAX_COMPOUND_COUNT = 3 # composite shard keys may consist at most of 3 keys
+NEAR_BEST_RATIO = 0.01 # we report how long it took to get within 1% of the best cost
+
+def timeToNearBest(improvements, ratio=NEAR_BEST_RATIO):
+    """
+        Return the timestamp of the first entry in the given list of (timestamp, cost)
+        improvements whose cost is within the ratio of the final (i.e., last) cost
+    """
+    if not improvements:
+        return None
+    best = improvements[-1][1]
+    for timestamp, cost in improvements:
+        if cost <= best + abs(best) * ratio:
+            return timestamp
+    ## FOR
+    return improvements[-1][0]
+## DEF
 
 ## ==============================================
 ## Branch and Bound search
@@ -60,7 +78,7 @@ class BBSearch ():
             * instance of CostModel
             * initialDesign (instance of Design)
             * bestCost (float; cost of initialDesign, upper bound)
-            * timeout (in sec)
+            * timeout (in sec, or in the units of the clock)
         """
 
         # all nodes have a pointer to the bbsearch object
@@ -76,22 +94,75 @@ class BBSearch ():
         self.timeout = timeout
         self.status = "initialized"
         self.usedTime = 0 # track how much time it runs
+        # The timeout and the usedTime are measured with this clock
+        self.clock = WallClock()
+        # The nodes shuffle the collections with this generator
+        self.rng = random.Random()
+
+        # Profiling counters that are always collected
+        self.nodesExpanded = 0
+        self.nodesPruned = 0
+        # List of (timestamp, cost) for every new best design that we found
+        self.initialCost = bestCost
+        self.improvements = [ ]
+        # The number of better designs from other workers that lowered our bound
+        self.incumbentUpdates = 0
+        # If True, then we stop searching once we get a better design from
+        # another worker instead of continuing with the lower bound
+        self.restartOnUpdate = False
+
+        # Optional PopulationEvaluator. If batchSize is greater than one, then
+        # each node evaluates its children in batches of that many siblings with
+        # it and explores each batch in the order of their costs
+        self.evaluator = None
+        self.batchSize = 0
+        self.batches = 0
+        # The number of designs that the evaluator's process pool computed
+        # These are not counted by our cost model
+        self.poolEvaluations = 0
+
+        # Optional list of collection names in the order that they should be
+        # assigned. If it is None, then each node picks them in random order
+        self.collectionOrder = None
+        # Optional function that takes a collection name and an index key and
+        # returns False if that index key is useless for the workload
+        self.indexKeyFilter = None
+
+        # Optional function that is invoked at most once every progressInterval
+        # seconds while the search is running (e.g., to report statistics)
+        self.progressCallback = None
+        self.progressInterval = 60
+        self.lastProgress = None
+
+        # Optional function that returns the cost components of the design that
+        # was evaluated last (e.g., CostModel.getComponents). They are sent to
+        # the coordinator together with every better design
+        self.componentsCallback = None
 
         self.channel = channel
         self.bestLock = lock
+        # Reports the evaluated designs to the coordinator in batches
+        self.progress = ProgressCounter(channel)
         
         self.debug = LOG.isEnabledFor(logging.DEBUG)
         return
 
     
     def updateBest(self, bestCost, bestDesign):
+        """
+            Called when another worker found a better design. The nodes that we
+            evaluate from now on are pruned against its cost, but we keep exploring
+            the current neighborhood. The caller gets the new design as our best
+            design once we are finished.
+        """
         self.bestLock.acquire()
         if bestCost < self.bestCost:
             self.bestCost = bestCost
             self.bestDesign = bestDesign.copy()
-            # If we update the current best design, we want to restart the search process
-            self.status = "updated_design"
-            self.terminated = True
+            self.incumbentUpdates += 1
+            if self.restartOnUpdate:
+                self.status = "updated_design"
+                self.terminated = True
         ## IF
         self.bestLock.release()
     ## DEF
@@ -110,6 +181,9 @@ class BBSearch ():
             LOG.debug("===BBSearch Solve===")
             LOG.debug(" timeout: %d", self.timeout)
         self.startTime = time.time()
+        self.clockStart = self.clock.time()
+        self.lastProgress = self.startTime
+        self.improvements = [ ]
 
         # set initial bound to infinity
         self.rootNode.solve()
@@ -118,8 +192,25 @@ class BBSearch ():
             self.status = "solved"
 
         self.onTerminate()
+        self.progress.flush()
+
+        self.usedTime = self.clock.time() - self.clockStart
+    ## DEF
 
-        self.usedTime = time.time() - self.startTime
+    def evaluateBatch(self, designs):
+        """Return the costs of the given designs from our evaluator"""
+        costs = self.evaluator.evaluate(designs)
+        self.batches += 1
+        if not self.evaluator.pool is None:
+            self.poolEvaluations += self.evaluator.lastEvaluated
+            self.clock.addEvaluations(len(designs))
+        return costs
+    ## DEF
+
+    def getTimeToNearBest(self, ratio=NEAR_BEST_RATIO):
+        """Return the number of seconds that it took to find a design within the ratio of our best cost"""
+        timestamp = timeToNearBest([(self.startTime, self.initialCost)] + self.improvements, ratio)
+        return timestamp - self.startTime
     ## DEF
 
     def listAllNodes(self):
@@ -142,9 +233,13 @@ class BBSearch ():
     '''
     
     def checkTimeout(self):
-        if time.time() - self.startTime > self.timeout:
+        now = time.time()
+        if self.clock.time() - self.clockStart > self.timeout:
             self.status = "timed_out"
             self.terminated = True
+        elif self.progressCallback is not None and now - self.lastProgress > self.progressInterval:
+            self.lastProgress = now
+            self.progressCallback()
     
     '''
     Events
@@ -172,6 +267,8 @@ class BBSearch ():
             LOG.debug("  total backtracks: %d", self.totalBacktracks)
             LOG.debug("  total nodes: %d", self.totalNodes)
             LOG.debug("  leaf nodes: %d", self.leafNodes)
+            LOG.debug("  expanded nodes: %d", self.nodesExpanded)
+            LOG.debug("  pruned nodes: %d", self.nodesPruned)
             LOG.debug("BEST SOLUTION:\n%s", self.bestDesign)
             LOG.debug("------------------\n")
 ## CLASS
@@ -223,34 +320,40 @@ class SimpleKeyIterator:
         self.keys = keys
         self.current = -1
        
+# returns a single key. This is used for the collections whose shard key
+# was fixed in the DesignCandidates
+class FixedKeyIterator:
+    def next(self):
+        if self.done:
+            raise StopIteration
+        self.done = True
+        return self.key
+
+    def rewind(self):
+        self.done = False
+
+    def getLastValue(self):
+        return self.key
+
+    def __iter__(self):
+        return self
+
+    def __init__(self, key):
+        self.key = key
+        self.done = False
+
 # this one is a bit more complicated:
 # we have to enumerate all combinations of all sizes from the list of index keys
 class CompoundKeyIterator: 
     def next(self):
-        if self.currentSize > self.maxCompoundCount:
-            raise StopIteration
-        else:
-            result = None
-            if self.currentSize == 0:
-                self.currentSize = 1
-                result = []
-            else:
-                if self.currentIterator is None:
-                    self.currentIterator = itertools.combinations(self.keys, self.currentSize)
-                try:
-                    result = self.currentIterator.next()
-                    if result in self.invalidCombinations:
-                        return None
-                except:
-                    self.currentSize += 1
-                    self.currentIterator = None
-                    result = self.next()
-            self.lastValue = result
-            return result
+        if self.currentIterator is None:
+            self.currentIterator = self.__generate__()
+        result = self.currentIterator.next()
+        self.lastValue = result
+        return result
     
     def rewind(self):
         self.lastValue = None
-        self.currentSize = 0
         self.currentIterator = None
     
     def getLastValue(self):
@@ -263,64 +366,92 @@ class CompoundKeyIterator:
     
     def __iter__(self):
         return self
-    
-    def __generate_invalid_combinations__(self, keys, maxCompoundCount):
+
+    def __generate__(self):
+        """
+            Generate the empty key and then every valid combination of the keys,
+            one size at a time. The combinations of each size are built with a
+            depth-first walk over the positions in the keys list, so we only
+            keep the positions of the current prefix in memory. If a key cannot
+            be added to the current prefix, then we skip it together with
+            all of the combinations that would extend that prefix with it.
+        """
+        yield []
+        num_keys = len(self.keys)
+        for size in xrange(1, min(self.maxCompoundCount, num_keys) + 1):
+            # Positions of the keys in the current prefix
+            stack = [ ]
+            i = 0
+            while True:
+                # Only go down this path if there are enough keys left to fill it
+                if i < num_keys and num_keys - i >= size - len(stack):
+                    if self.__canExtend__(stack, i):
+                        stack.append(i)
+                        if len(stack) == size:
+                            yield tuple([self.keys[j] for j in stack])
+                            stack.pop()
+                    i += 1
+                    continue
+                # Backtrack
+                if not stack:
+                    break
+                i = stack.pop() + 1
+            ## WHILE
+        ## FOR
+    ## DEF
+
+    def __canExtend__(self, stack, i):
+        """Return True if the key at position i can be added to the keys at the positions in the stack"""
+        key = self.keys[i]
+        if not self.isUseful is None and not self.isUseful(key):
+            return False
+        for j in stack:
+            if self.__hasSamePrefix__(self.keys[j], key):
+                return False
+        return True
+    ## DEF
+
+    def __hasSamePrefix__(self, keys0, keys1):
         """
             We don't want to evaluate combinations like ((f0), (f0, f1)) or ((f0, f1), (f0, f1, f2))
             But we want to evalute them seperately
         """
-        invalid_combination = set()
-        marker = None
-        for i in xrange(2, maxCompoundCount + 1):
-            if i > constants.MAX_INDEX_SIZE: break
-            iterator = itertools.combinations(keys, i)
-            try:
-                while True:
-                    result = iterator.next()
-                    for keys0 in result:
-                        for keys1 in result:
-                            marker = True
-                            if keys1 != keys0:
-                                counter = 0
-                                while counter < min(len(keys0), len(keys1)):
-                                    if keys0[counter] != keys1[counter]:
-                                        marker = False
-                                        break
-                                    counter += 1
-                                    ## IF
-                                ## WHILE
-                                if marker:
-                                    invalid_combination.add(result)
-                                    break
-                           ## IF
-                        if marker:
-                            break
-                       ## IF
-                    ## FOR
-                ## WHILE
-            except StopIteration:
-                pass
+        # Shard key candidates are single field names
+        if isinstance(keys0, basestring): keys0 = (keys0,)
+        if isinstance(keys1, basestring): keys1 = (keys1,)
+        for counter in xrange(min(len(keys0), len(keys1))):
+            if keys0[counter] != keys1[counter]:
+                return False
+        return True
+    ## DEF
+
+    def isInvalidCombination(self, combination):
+        """Return True if the given combination of keys will never be returned by this iterator"""
+        for i in xrange(len(combination)):
+            if not self.isUseful is None and not self.isUseful(combination[i]):
+                return True
+            for j in xrange(i):
+                if self.__hasSamePrefix__(combination[j], combination[i]):
+                    return True
         ## FOR
-        
-        return invalid_combination
+        return False
     ## DEF
+
     '''
     maxCompoundCount - maximum number of elements in the compound key.
     anything < 0 means "unlimited"
+    isUseful - optional function that returns False for the keys that
+    should never be part of a combination
     '''
-    def __init__(self, keys, maxCompoundCount):
-        # blow up all possible combinations of index keys
+    def __init__(self, keys, maxCompoundCount, isUseful=None):
         self.lastValue = None
-        self.currentSize = 0
         self.keys = keys
         self.currentIterator = None
-        self.invalidCombinations = None
+        self.isUseful = isUseful
         if maxCompoundCount < 0:
             self.maxCompoundCount = constants.MAX_INDEX_SIZE
         else:
             self.maxCompoundCount = maxCompoundCount
-        
-        self.invalidCombinations = self.__generate_invalid_combinations__(self.keys, self.maxCompoundCount)
 ## CLASS
 
 ## ==============================================
@@ -344,7 +475,14 @@ class BBNode():
         if not self.isLeaf():
 
             self.prepareChildren()
-            child = self.getNextChild()
+            self.bbsearch.nodesExpanded += 1
+            if self.bbsearch.batchSize > 1 and not self.bbsearch.evaluator is None:
+                self.solveBatches()
+                if self.bbsearch.terminated:
+                    return
+                child = None
+            else:
+                child = self.getNextChild()
             while child is not None:
                 if self.debug:
                     LOG.debug("DEPTH: %d", child.depth)
@@ -353,6 +491,8 @@ class BBNode():
                 if child.evaluate():
                     self.children.append(child)
                     child.solve()
+                else:
+                    self.bbsearch.nodesPruned += 1
             
                 #child returned --> we backtracked
                 self.bbsearch.onBacktrack()
@@ -374,6 +514,45 @@ class BBNode():
         return
         
     
+    def solveBatches(self):
+        """
+            Evaluate our children in batches of siblings with the bbsearch's evaluator
+            and then explore the children of each batch in the order of their costs
+        """
+        batchSize = self.bbsearch.batchSize
+        while True:
+            batch = [ ]
+            while len(batch) < batchSize:
+                try:
+                    child = self.getNextChild()
+                except StopIteration:
+                    child = None
+                if child is None:
+                    break
+                batch.append(child)
+            ## WHILE
+            if not batch:
+                return
+
+            costs = self.bbsearch.evaluateBatch([child.design for child in batch])
+            for i in sorted(xrange(len(batch)), key=lambda i: costs[i]):
+                child = batch[i]
+                # The best cost could have gone down while we explored the cheaper siblings
+                if child.evaluate(costs[i]):
+                    self.children.append(child)
+                    child.solve()
+                else:
+                    self.bbsearch.nodesPruned += 1
+
+                self.bbsearch.onBacktrack()
+                if self.bbsearch.terminated:
+                    return
+            ## FOR
+            if len(batch) < batchSize:
+                return
+        ## WHILE
+    ## DEF
+
     # returns None if all children have been enumerated
     def getNextChild(self):
         if self.debug:
@@ -484,15 +663,25 @@ class BBNode():
     def prepareChildren(self):
         # initialize iterators 
         # --> determine which collection is yet to be assigned
-        self.random_instance.shuffle(self.candidate_collections)
-        for col_name in self.candidate_collections:
+        if self.bbsearch.collectionOrder is None:
+            self.bbsearch.rng.shuffle(self.candidate_collections)
+            candidate_collections = self.candidate_collections
+        else:
+            candidate_collections = self.bbsearch.collectionOrder
+        for col_name in candidate_collections:
             if self.design.isRelaxed(col_name):
                 self.currentCol = col_name
                 break
         # create the iterators
-        self.shardIter = CompoundKeyIterator(self.bbsearch.designCandidate.shardKeys[self.currentCol], SHARD_KEY_MAX_COMPOUND_COUNT)
+        if self.currentCol in self.bbsearch.designCandidate.fixedShardKeys:
+            self.shardIter = FixedKeyIterator(self.bbsearch.designCandidate.fixedShardKeys[self.currentCol])
+        else:
+            self.shardIter = CompoundKeyIterator(self.bbsearch.designCandidate.shardKeys[self.currentCol], SHARD_KEY_MAX_COMPOUND_COUNT)
         self.denormIter = SimpleKeyIterator(self.bbsearch.designCandidate.denorm[self.currentCol])
-        self.indexIter = CompoundKeyIterator(self.bbsearch.designCandidate.indexKeys[self.currentCol], INDEX_KEY_MAX_COMPOUND_COUNT)
+        isUseful = None
+        if not self.bbsearch.indexKeyFilter is None:
+            isUseful = functools.partial(self.bbsearch.indexKeyFilter, self.currentCol)
+        self.indexIter = CompoundKeyIterator(self.bbsearch.designCandidate.indexKeys[self.currentCol], INDEX_KEY_MAX_COMPOUND_COUNT, isUseful)
         
         if self.debug:
             LOG.debug("COL: %s / denorm: %s", col_name, self.bbsearch.designCandidate.denorm[self.currentCol])
@@ -503,13 +692,16 @@ class BBNode():
     # This function determines the lower and upper bound of this node
     # It updates the global lower/upper bound accordingly
     # retrun: True if the node should be explored, False if the node can be discarded
-    def evaluate(self):
+    # If the cost of this node's design was already computed, then it can be passed in
+    def evaluate(self, cost=None):
         if self.debug:
             LOG.debug(".",)
             LOG.debug(self)
         # add child only when the solution is admissible
-        self.cost = self.bbsearch.costModel.overallCost(self.design)
-        sendMessage(MSG_EVALUATED_ONE_DESIGN, (self.bbsearch.bestCost, self.cost), self.bbsearch.channel)
+        if cost is None:
+            cost = self.bbsearch.costModel.overallCost(self.design)
+        self.cost = cost
+        self.bbsearch.progress.add(self.bbsearch.bestCost, self.cost)
 #        LOG.debug("EVAL NODE: %s / bound_lower:%f / bound_upper:%f / BOUND:%f", \
 #                  self.design, self.lower_bound, self.upper_bound, self.bbsearch.lower_bound)
 
@@ -521,7 +713,11 @@ class BBNode():
             if self.cost < self.bbsearch.bestCost:
                 self.bbsearch.bestCost = self.cost
                 self.bbsearch.bestDesign = self.design.copy()
-                sendMessage(MSG_FOUND_BEST_COST, (self.bbsearch.bestCost, self.bbsearch.bestDesign), self.bbsearch.channel)
+                self.bbsearch.improvements.append((time.time(), self.cost))
+                components = None
+                if not self.bbsearch.componentsCallback is None:
+                    components = self.bbsearch.componentsCallback(self.design)
+                sendDesign(MSG_FOUND_BEST_COST, self.bbsearch.bestCost, self.bbsearch.bestDesign, self.bbsearch.channel, components)
                 
         # A node can be pruned when its cost is greater than the global best_cost
         # So when this function returns False, the node is discarded
@@ -569,7 +765,6 @@ class BBNode():
         self.children = [] # list of BBNode
         self.debug = LOG.isEnabledFor(logging.DEBUG)
         self.candidate_collections = [col_name for col_name in self.bbsearch.designCandidate.collections]
-        self.random_instance = random.Random()
         return
         
 
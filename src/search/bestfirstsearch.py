@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import heapq
+import itertools
+import logging
+import time
+
+# mongodb-d4
+from bbsearch import BBSearch
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## Best-First Search
+## ==============================================
+class BestFirstSearch(BBSearch):
+    """
+        Iterative alternative to the depth-first BBSearch. The open nodes are kept
+        in a priority queue that is keyed on the cost of their partial design
+        (the relaxed collections are not included in the cost, so it is an
+        estimate of the lower bound for the complete designs under that node).
+        Ties are broken in favor of the deeper node so that we reach complete
+        designs quickly. If beamWidth is greater than zero, then only the best
+        beamWidth open nodes are kept after each expansion.
+
+        The children of a node are generated by BBNode, so this uses the same
+        design candidates and feasibility checks as BBSearch. It also has the
+        same interface and status values, so it can be used by LNSDesigner.
+    """
+
+    def __init__(self, designCandidate, costModel, relaxedDesign, bestCost, timeout, channel=None, lock=None, beamWidth=0):
+        BBSearch.__init__(self, designCandidate, costModel, relaxedDesign, bestCost, timeout, channel, lock)
+        self.beamWidth = beamWidth
+        # The largest number of open nodes that we had at any point
+        self.maxOpenNodes = 0
+    ## DEF
+
+    def solve(self):
+        """
+            main public method. Simply call to get the optimal solution
+        """
+        self.leafNodes = 0
+        self.totalNodes = 0
+        self.status = "solving"
+        if self.debug:
+            LOG.debug("===BestFirstSearch Solve===")
+            LOG.debug(" timeout: %d / beam width: %d", self.timeout, self.beamWidth)
+        self.startTime = time.time()
+        self.clockStart = self.clock.time()
+        self.lastProgress = self.startTime
+        self.improvements = [ ]
+
+        # (Cost, -Depth, Sequence, BBNode)
+        # The sequence number makes sure that we never compare two BBNodes
+        openNodes = [ (0.0, 0, 0, self.rootNode) ]
+        sequence = itertools.count(1)
+        while openNodes:
+            self.checkTimeout()
+            if self.terminated:
+                break
+
+            node = heapq.heappop(openNodes)[-1]
+            # The best cost could have gone down since we added this node
+            if not node.cost is None and node.cost > self.bestCost:
+                self.nodesPruned += 1
+                continue
+            self.totalNodes += 1
+
+            node.prepareChildren()
+            self.nodesExpanded += 1
+            while True:
+                try:
+                    child = node.getNextChild()
+                except StopIteration:
+                    child = None
+                if child is None:
+                    break
+
+                if not child.evaluate():
+                    self.nodesPruned += 1
+                # There is nothing more to do for complete designs, since
+                # evaluate() already checked whether it is the new best
+                elif child.isLeaf():
+                    self.leafNodes += 1
+                    self.totalNodes += 1
+                else:
+                    heapq.heappush(openNodes, (child.cost, -child.depth, sequence.next(), child))
+
+                self.checkTimeout()
+                if self.terminated:
+                    break
+            ## WHILE
+
+            if self.beamWidth > 0 and len(openNodes) > self.beamWidth:
+                self.nodesPruned += len(openNodes) - self.beamWidth
+                openNodes = heapq.nsmallest(self.beamWidth, openNodes)
+                heapq.heapify(openNodes)
+            self.maxOpenNodes = max(self.maxOpenNodes, len(openNodes))
+        ## WHILE
+
+        if self.status is "solving":
+            self.status = "solved"
+
+        self.onTerminate()
+        self.progress.flush()
+
+        self.usedTime = self.clock.time() - self.clockStart
+        if self.debug:
+            LOG.debug("  max open nodes: %d", self.maxOpenNodes)
+            LOG.debug("  time to near best: %.2f", self.getTimeToNearBest())
+    ## DEF
+## CLASS
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import logging
+
+# mongodb-d4
+from designcandidates import DesignCandidates
+
+LOG = logging.getLogger(__name__)
+
+## ==============================================
+## WorkloadOrdering
+## ==============================================
+class WorkloadOrdering(object):
+    """
+        Value-ordering heuristic for the branch-and-bound search. The collections
+        are expanded in descending order of their share of the workload, and the
+        shard and index key candidates are tried in descending order of their
+        predicted benefit. The benefit of a field is how often the workload
+        uses it in a query predicate times its selectivity. The field usage is
+        counted per query hash, so each distinct query is only examined once.
+        Trying the promising children first means that BBSearch finds a good
+        incumbent early and the cost > bestCost pruning kicks in sooner.
+    """
+
+    def __init__(self, collections, workload):
+        self.collections = collections
+
+        # Collection names in the order that they should be expanded
+        self.collectionOrder = sorted(collections.iterkeys(), \
+                                      key=lambda col_name: (-(collections[col_name].get('workload_percent', None) or 0.0), col_name))
+
+        # ColName -> FieldName -> Benefit
+        self.fieldBenefit = dict([(col_name, { }) for col_name in collections.iterkeys()])
+        for (col_name, fields), count in self.__countQueryHashes__(workload).iteritems():
+            if not col_name in self.fieldBenefit:
+                continue
+            col_benefit = self.fieldBenefit[col_name]
+            for f_name in fields:
+                col_benefit[f_name] = col_benefit.get(f_name, 0) + count
+        ## FOR
+        for col_name, col_info in collections.iteritems():
+            col_benefit = self.fieldBenefit[col_name]
+            for f_name, f_info in col_info['fields'].iteritems():
+                # Fall back to the catalog's usage count if the field is
+                # not referenced in any of the predicates in the workload
+                frequency = col_benefit.get(f_name, None) or f_info.get('query_use_count', None) or 0
+                # The catalog's selectivity is 0.0 if it was never computed
+                selectivity = f_info.get('selectivity', None) or 1.0
+                col_benefit[f_name] = frequency * selectivity
+            ## FOR
+        ## FOR
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("Collection order: %s", self.collectionOrder)
+            LOG.debug("Field benefits: %s", self.fieldBenefit)
+    ## DEF
+
+    def __countQueryHashes__(self, workload):
+        """Return a dict from (ColName, PredicateFields) to the number of operations with those predicates"""
+        # QueryHash -> [ColName, PredicateFields, Count]
+        hashes = { }
+        for sess in workload:
+            for op in sess['operations']:
+                entry = hashes.get(op['query_hash'], None)
+                if entry is None:
+                    fields = tuple(sorted((op.get('predicates', None) or { }).iterkeys()))
+                    entry = [op['collection'], fields, 0]
+                    hashes[op['query_hash']] = entry
+                entry[2] += 1
+            ## FOR
+        ## FOR
+        counts = { }
+        for col_name, fields, count in hashes.itervalues():
+            counts[(col_name, fields)] = counts.get((col_name, fields), 0) + count
+        return counts
+    ## DEF
+
+    def getKeyBenefit(self, col_name, keys):
+        """
+            Return the predicted benefit of the given shard key or index key.
+            The leading fields matter the most for both of them.
+        """
+        col_benefit = self.fieldBenefit.get(col_name, { })
+        if isinstance(keys, basestring):
+            keys = (keys,)
+        return sum([col_benefit.get(f_name, 0) / float(i + 1) for i, f_name in enumerate(keys)])
+    ## DEF
+
+    def isUsefulIndex(self, col_name, indexKey):
+        """An index is useless for the workload if none of its queries use its leading field"""
+        return self.fieldBenefit.get(col_name, { }).get(indexKey[0], 0) > 0
+    ## DEF
+
+    def sortKeys(self, col_name, keys):
+        """Return a copy of the given key candidates in descending order of their benefit"""
+        return sorted(keys, key=lambda k: -self.getKeyBenefit(col_name, k))
+    ## DEF
+
+    def apply(self, designCandidates):
+        """Return a copy of the given DesignCandidates with all of the key candidates sorted"""
+        dc = DesignCandidates()
+        for col_name in designCandidates.collections:
+            dc.addCollection(col_name, \
+                             self.sortKeys(col_name, designCandidates.indexKeys[col_name]), \
+                             self.sortKeys(col_name, designCandidates.shardKeys[col_name]), \
+                             designCandidates.denorm[col_name])
+            if col_name in designCandidates.fixedShardKeys:
+                dc.fixShardKey(col_name, designCandidates.fixedShardKeys[col_name])
+        ## FOR
+        return dc
+    ## DEF
+
+    def getCollectionOrder(self, designCandidates):
+        """Return the collections of the given DesignCandidates in the order that they should be expanded"""
+        return [col_name for col_name in self.collectionOrder if col_name in designCandidates.collections]
+    ## DEF
+## CLASS
@@ -275,6 +275,38 @@ class Design(object):
         return ret
     ## DEF
 
+    def getKey(self):
+        """Return a hashable value that is the same for every design with the same configuration"""
+        key = [ ]
+        for col_name in sorted(self.data.iterkeys()):
+            value = self.data[col_name]
+            if value is None:
+                key.append((col_name, None))
+            else:
+                key.append((col_name, tuple(value['shardKeys'] or ()), \
+                            tuple([tuple(i) for i in value['indexes']]), value['denorm']))
+        ## FOR
+        return tuple(key)
+    ## DEF
+
+    @staticmethod
+    def fromKey(key):
+        """Return a new design with the configuration of the given getKey() value"""
+        d = Design()
+        for entry in key:
+            d.addCollection(entry[0])
+            if len(entry) == 2:
+                d.reset(entry[0])
+                continue
+            col_name, shardKeys, indexes, denorm = entry
+            d.addShardKey(col_name, shardKeys)
+            for indexKeys in indexes:
+                d.addIndex(col_name, indexKeys)
+            d.setDenormalizationParent(col_name, denorm)
+        ## FOR
+        return d
+    ## DEF
+
     def toJSON(self):
         return json.dumps(self.toDICT(), sort_keys=False, indent=4)
 
@@ -30,6 +30,9 @@ class DesignCandidates():
         self.shardKeys = {}
         # col names mapped to possible col names the collection can be denormalized to
         self.denorm = {}
+        # col names mapped to the only shard key that the search may assign to them
+        # This is used to split up the search space between the workers
+        self.fixedShardKeys = {}
     
 
     def addCollection(self, collection, indexKeys, shardKeys, denorm) :
@@ -43,9 +46,16 @@ class DesignCandidates():
         candidates = DesignCandidates()
         for coll_name in collection_names:
             candidates.addCollection(coll_name, self.indexKeys[coll_name], self.shardKeys[coll_name], self.denorm[coll_name])
+            if coll_name in self.fixedShardKeys:
+                candidates.fixShardKey(coll_name, self.fixedShardKeys[coll_name])
 
         return candidates
 
+    def fixShardKey(self, collection, shardKey):
+        """Only allow the given shard key for the collection (an empty key means that it is not sharded)"""
+        assert collection in self.collections
+        self.fixedShardKeys[collection] = shardKey
+
     def __str__(self):
         return pformat(self.__dict__)
 
@@ -22,11 +22,13 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
 import itertools
+import json
 import logging
 import operator
 import time
 import os
 import sys
+import tempfile
 from pprint import pformat
 
 basedir = os.path.realpath(os.path.dirname(__file__))
@@ -38,19 +40,48 @@ sys.path.append(os.path.join(basedir, "../multithreaded"))
 import workload
 import catalog
 from initialdesigner import InitialDesigner
+from knapsackdesigner import KnapsackDesigner
 from design import Design
 from lnsdesigner import LNSDesigner
+import bbsearch
+from metaheuristic import SimulatedAnnealingDesigner, GeneticDesigner
 from randomdesigner import RandomDesigner
 from costmodel import CostModel
+from costmodel import MigrationCost
+from costmodel import explain
 from util import constants
 from util import configutil
 from designcandidates import DesignCandidates
+from shardkeyscreen import ShardKeyScreener
 
 from message import *
 import thread
 
 LOG = logging.getLogger(__name__)
 
+# InitialDesigner -> Designer class
+INITIAL_DESIGNERS = {
+    "greedy":   InitialDesigner,
+    "knapsack": KnapsackDesigner,
+}
+
+# SearchStrategy -> Designer class
+SEARCH_STRATEGIES = {
+    "lns":       LNSDesigner,
+    "annealing": SimulatedAnnealingDesigner,
+    "genetic":   GeneticDesigner,
+}
+
+def countIndexPermutations(numKeys):
+    """Return the number of index keys that all of the permutations of the given number of keys make"""
+    total = 0
+    perms = 1
+    for o in xrange(1, min(numKeys, constants.MAX_INDEX_SIZE) + 1):
+        perms *= numKeys - o + 1
+        total += perms
+    return total
+## DEF
+
 ## ==============================================
 ## Designer
 ## This is the central object that will have all of the
@@ -85,6 +116,23 @@ class Designer():
         self.sess_limit = None
         self.op_limit = None
 
+        # If this is set, then the catalog and the workload are loaded from
+        # this snapshot file instead of from the metadata database
+        self.snapshot = None
+
+        # If this is set, then we re-optimize the design in this design file
+        # instead of starting from scratch (see costmodel.MigrationCost)
+        self.deployed_design = None
+
+        # If this is set, then load() explains the cost of the replayed design
+        # instead of just computing it. The report is sorted on explain_sort,
+        # formatted as explain_format ('text' or 'json') and written to
+        # explain_output (standard out if None)
+        self.explain = False
+        self.explain_sort = explain.DEFAULT_SORT_KEY
+        self.explain_format = "text"
+        self.explain_output = None
+
         # Used for multithread
         self.channel = channel
         self.search_method = None
@@ -176,10 +224,28 @@ class Designer():
         )
     ## DEF
 
-    def generateDesignCandidates(self, collections, isShardingEnabled=True, isIndexesEnabled=True, isDenormalizationEnabled=True):
-
+    def generateDesignCandidates(self, collections, isShardingEnabled=True, isIndexesEnabled=True, isDenormalizationEnabled=True, workload=None, shardKeyWorkload=None):
+        """
+            Build the DesignCandidates for the given collections. If a workload is
+            given, then the index candidates are only the key orderings that the
+            queries in it can actually use. Otherwise every permutation of the
+            interesting keys is a candidate.
+            If a shardKeyWorkload is given, then the shard keys that are dominated
+            by another one for that workload are not candidates.
+        """
         dc = DesignCandidates()
         valid_collection = set()
+        # ColName -> (Kept, Total)
+        self.indexCandidateStats = { }
+        # ColName -> [(DroppedKey, DominatingKey, Metrics)]
+        self.shardKeyScreening = { }
+        queryPatterns = None
+        if isIndexesEnabled and not workload is None:
+            queryPatterns = self.__collectQueryPatterns__(workload)
+        screener = None
+        if isShardingEnabled and not shardKeyWorkload is None:
+            screener = ShardKeyScreener(collections, shardKeyWorkload, \
+                                        self.config.getint(configutil.SECT_CLUSTER, 'nodes'))
         for col_info in collections.itervalues():
 
             shardKeys = []
@@ -204,16 +270,32 @@ class Designer():
             if isShardingEnabled:
                 LOG.debug("Sharding is enabled")
                 shardKeys = interesting
+                if not screener is None:
+                    shardKeys, dropped = screener.screen(col_info['name'], interesting)
+                    self.shardKeyScreening[col_info['name']] = dropped
+                    for key, other, metrics in dropped:
+                        LOG.info("%s: dropped shard key '%s' because '%s' is better " \
+                                 "[docSkew=%.2f / opSkew=%.2f / messages=%.2f / targeted=%.2f]", \
+                                 col_info['name'], key, other, metrics['docSkew'], metrics['opSkew'], \
+                                 metrics['messages'], metrics['targeted'])
 
             # deal with indexes
             if isIndexesEnabled:
                 LOG.debug("Indexes is enabled")
-                for o in xrange(1, len(interesting) + 1) :
-                    if o > constants.MAX_INDEX_SIZE: break
-                    for i in itertools.permutations(interesting, o):
-                        indexKeys.append(i)
+                if queryPatterns is None:
+                    for o in xrange(1, len(interesting) + 1) :
+                        if o > constants.MAX_INDEX_SIZE: break
+                        for i in itertools.permutations(interesting, o):
+                            indexKeys.append(i)
+                        ## FOR
                     ## FOR
-                ## FOR
+                else:
+                    indexKeys = self.__generateIndexCandidates__(col_info, interesting, \
+                                                                 queryPatterns.get(col_info['name'], { }))
+                    total = countIndexPermutations(len(interesting))
+                    self.indexCandidateStats[col_info['name']] = (len(indexKeys), total)
+                    LOG.info("%s: kept %d index candidates and removed %d of the %d key permutations", \
+                             col_info['name'], len(indexKeys), total - len(indexKeys), total)
             # deal with de-normalization
             if len(indexKeys) > 10:
                 LOG.warn("Too many index keys: %s", len(indexKeys))
@@ -228,6 +310,83 @@ class Designer():
 
         return dc
 
+    def __collectQueryPatterns__(self, workload):
+        """
+            Make one pass over the workload and return the distinct access patterns
+            of the operations in each collection:
+                ColName -> QueryHash -> (EqualityFields, RangeFields, SortFields, ProjectionFields)
+            Regex predicates are left out because the cost model never uses an
+            index for them.
+        """
+        patterns = { }
+        for sess in workload:
+            for op in sess['operations']:
+                col_patterns = patterns.setdefault(op['collection'], { })
+                if op['query_hash'] in col_patterns:
+                    continue
+                predicates = op['predicates'] or { }
+                eq = set([f for f, t in predicates.iteritems() if t == constants.PRED_TYPE_EQUALITY])
+                rng = set([f for f, t in predicates.iteritems() if t == constants.PRED_TYPE_RANGE])
+                sort = [ ]
+                for content in op['query_content'] or [ ]:
+                    orderby = content.get(constants.REPLACE_KEY_DOLLAR_PREFIX + "orderby", None) \
+                              if isinstance(content, dict) else None
+                    if isinstance(orderby, dict):
+                        sort.extend([f for f in orderby.iterkeys() if not f in sort])
+                ## FOR
+                projection = set(op['query_fields'].keys()) if op['query_fields'] else set()
+                col_patterns[op['query_hash']] = (eq, rng, sort, projection)
+            ## FOR
+        ## FOR
+        return patterns
+    ## DEF
+
+    def __generateIndexCandidates__(self, col_info, interesting, patterns):
+        """
+            Return the index keys for the given collection that match the access
+            patterns of its queries: the equality fields followed by at most one
+            range field or by the sort fields, their prefixes, and the covering
+            variants that also include the projected fields.
+        """
+        interesting_pos = dict([(f, i) for i, f in enumerate(interesting)])
+        def selectivityOrder(f):
+            return (-(col_info['fields'][f].get('selectivity', None) or 0.0), interesting_pos[f])
+
+        candidates = set()
+        def addCandidate(key):
+            key = tuple(key[:constants.MAX_INDEX_SIZE])
+            if key: candidates.add(key)
+
+        for eq, rng, sort, projection in patterns.itervalues():
+            eq = sorted([f for f in eq if f in interesting_pos], key=selectivityOrder)
+            rng = sorted([f for f in rng if f in interesting_pos], key=selectivityOrder)
+            sort = [f for f in sort if f in interesting_pos]
+            projection = sorted([f for f in projection if f in interesting_pos], key=selectivityOrder)
+
+            # Every order of the equality fields is equivalent for this query, but
+            # the leading field decides what other queries can share the index
+            if len(eq) <= constants.MAX_INDEX_EQ_PERMUTATIONS:
+                eqOrders = list(itertools.permutations(eq))
+            else:
+                eqOrders = [tuple(eq)]
+
+            tails = [ [] ] + [ [f] for f in rng ]
+            if sort: tails.append(sort)
+            for eqOrder in eqOrders:
+                for i in xrange(1, len(eqOrder)):
+                    addCandidate(eqOrder[:i])
+                for tail in tails:
+                    key = list(eqOrder) + [f for f in tail if not f in eqOrder]
+                    addCandidate(key)
+                    covering = [f for f in projection if not f in key]
+                    if key and covering:
+                        addCandidate(key + covering)
+                ## FOR
+            ## FOR
+        ## FOR
+        return sorted(candidates, key=lambda key: (len(key), [interesting_pos[f] for f in key]))
+    ## DEF
+
     def __remove_heuristicaly_bad_key__(self, col_info, keys):
         res = keys[:]
         key_selectivtiy = []
@@ -285,6 +444,32 @@ class Designer():
         return workload
     ## DEF
 
+    def exportSnapshot(self, path):
+        """Write the catalog and the workload from the metadata database out to a snapshot file"""
+        collections = self.loadCollections()
+        workload.exportSnapshot(path, collections, self.loadWorkload(collections))
+    ## DEF
+
+    def exportSharedSnapshot(self, directory=None):
+        """
+            Write the catalog and the workload out to a temporary snapshot file so
+            that the workers do not have to fetch and parse the sessions from
+            the metadata database themselves. Returns the path of the file,
+            which the caller has to remove once the workers are done with it.
+        """
+        start = time.time()
+        fd, path = tempfile.mkstemp(prefix="d4-workload-", suffix=".snapshot", dir=directory or None)
+        os.close(fd)
+        try:
+            self.exportSnapshot(path)
+        except:
+            os.remove(path)
+            raise
+        LOG.info("Shared the workload with the workers through '%s' [%.1fMB] in %.2f seconds", \
+                 path, os.path.getsize(path) / (1024.0 * 1024.0), time.time() - start)
+        return path
+    ## DEF
+
     ## -------------------------------------------------------------------------
     ## DESIGNER EXECUTION
     ## -------------------------------------------------------------------------
@@ -292,29 +477,47 @@ class Designer():
     ## HACK HACK HACK
     # the replay flag and replay_design is used to re-evalutated the design read from a design file
     # This is very ugly...but we don't have time now...
-    def load(self, replay=False, replay_design=None, init=False):
-        """Perform the actual search for a design"""
+    def load(self, replay=False, replay_design=None, init=False, resume=False):
+        """
+            Perform the actual search for a design
+            If resume is True, then the search will continue from a checkpoint,
+            so we don't compute the initial design and return (None, None)
+        """
         isShardingEnabled = self.config.getboolean(configutil.SECT_DESIGNER, 'enable_sharding')
         isIndexesEnabled = self.config.getboolean(configutil.SECT_DESIGNER, 'enable_indexes')
         isDenormalizationEnabled = self.config.getboolean(configutil.SECT_DESIGNER, 'enable_denormalization')
 
-        self.collections = self.loadCollections()
-        self.workload = self.loadWorkload(self.collections)
+        if self.snapshot and configutil.getBoolean(self.config, configutil.SECT_COSTMODEL, 'stream_workload'):
+            # The sess_limit and op_limit are not supported when streaming
+            budget = self.config.getint(configutil.SECT_COSTMODEL, 'stream_memory') * 1024 * 1024
+            self.workload = workload.SnapshotStream(self.snapshot, budget)
+            self.collections = self.workload.collections
+        elif self.snapshot:
+            self.collections, self.workload = workload.loadSnapshot(self.snapshot, self.sess_limit, self.op_limit)
+        else:
+            self.collections = self.loadCollections()
+            self.workload = self.loadWorkload(self.collections)
         # Generate all the design candidates
-        self.designCandidates = self.generateDesignCandidates(self.collections, isShardingEnabled, isIndexesEnabled, isDenormalizationEnabled)
+        candidateWorkload = None
+        if configutil.getBoolean(self.config, configutil.SECT_DESIGNER, 'prune_index_candidates'):
+            candidateWorkload = self.workload
+        shardKeyWorkload = None
+        if configutil.getBoolean(self.config, configutil.SECT_DESIGNER, 'screen_shard_keys'):
+            shardKeyWorkload = self.workload
+        self.designCandidates = self.generateDesignCandidates(self.collections, isShardingEnabled, isIndexesEnabled, \
+                                                              isDenormalizationEnabled, workload=candidateWorkload, \
+                                                              shardKeyWorkload=shardKeyWorkload)
+        deployedDesign = None
+        if self.deployed_design:
+            deployedDesign = self.loadDeployedDesign(self.deployed_design)
+            self.addDeployedCandidates(self.designCandidates, deployedDesign, isShardingEnabled, \
+                                       isIndexesEnabled, isDenormalizationEnabled)
         #LOG.info("candidates: %s\n", self.designCandidates)
         # Instantiate cost model
-        cmConfig = {
-            'weight_network': self.config.getfloat(configutil.SECT_COSTMODEL, 'weight_network'),
-            'weight_disk':    self.config.getfloat(configutil.SECT_COSTMODEL, 'weight_disk'),
-            'weight_skew':    self.config.getfloat(configutil.SECT_COSTMODEL, 'weight_skew'),
-            'nodes':          self.config.getint(configutil.SECT_CLUSTER, 'nodes'),
-            'max_memory':     self.config.getint(configutil.SECT_CLUSTER, 'node_memory'),
-            'skew_intervals': self.config.getint(configutil.SECT_COSTMODEL, 'time_intervals'),
-            'address_size':   self.config.getint(configutil.SECT_COSTMODEL, 'address_size'),
-            'window_size':    self.config.getint(configutil.SECT_COSTMODEL, 'window_size')
-        }
+        cmConfig = configutil.getCostModelConfig(self.config)
         self.cm = CostModel(self.collections, self.workload, cmConfig)
+        if deployedDesign:
+            self.cm.setMigration(MigrationCost(self.collections, deployedDesign, cmConfig))
 #        if self.debug:
 #            state.debug = True
 #            costmodel.LOG.setLevel(logging.DEBUG)
@@ -322,8 +525,19 @@ class Designer():
         # Compute initial solution and calculate its cost
         # This will be the upper bound from starting design
         
-        if not replay:
-            initialDesign = InitialDesigner(self.collections, self.workload, self.config).generate()
+        if resume:
+            return None, None
+        elif not replay and deployedDesign:
+            # The deployed design is always within the change budget
+            initialDesign = deployedDesign.copy()
+            if init:
+                print initialDesign.toJSON()
+            return self.cm.overallCost(initialDesign), initialDesign
+        elif not replay:
+            initialDesigner = self.config.get(configutil.SECT_DESIGNER, 'initial_designer')
+            assert initialDesigner in INITIAL_DESIGNERS, \
+                "Invalid initial designer '%s'. Expected one of %s" % (initialDesigner, INITIAL_DESIGNERS.keys())
+            initialDesign = INITIAL_DESIGNERS[initialDesigner](self.collections, self.workload, self.config).generate()
             
             if init:
                 print initialDesign.toJSON()
@@ -335,17 +549,131 @@ class Designer():
             #pycallgraph.make_dot_graph('d4.png')
             
             return initialCost, initialDesign
+        elif self.explain:
+            cost, explanation = self.cm.explainCost(replay_design)
+            self.writeExplanation(explanation)
+            return None
         else:
             self.cm.overallCost(replay_design)
+            if deployedDesign:
+                plan = self.cm.migration.getPlan(replay_design)
+                LOG.info("Migration plan with %d steps:\n%s", len(plan), self.cm.migration.formatPlan(plan))
             return None
     ## DEF
+
+    def loadDeployedDesign(self, path):
+        """
+            Load the design that is currently deployed from the given design file
+            (written with --output-design). The collections that are not in the
+            catalog are ignored, and the ones that are missing from the file do
+            not have a shard key, indexes or denormalization.
+        """
+        with open(path, "r") as fd:
+            doc = json.load(fd)
+        design = Design()
+        for col_name in sorted(self.collections.iterkeys()):
+            design.addCollection(col_name)
+            value = doc.get(col_name, None)
+            if not value: continue
+            for indexKeys in value.get('indexes', []):
+                design.addIndex(col_name, indexKeys)
+            design.addShardKey(col_name, tuple(value.get('shardKeys', None) or ()))
+            if value.get('denorm', None) in self.collections:
+                design.setDenormalizationParent(col_name, value['denorm'])
+        ## FOR
+        for col_name in doc.iterkeys():
+            if not col_name in self.collections:
+                LOG.warn("Ignoring collection '%s' of the deployed design because it is not in the catalog", col_name)
+        ## FOR
+        LOG.info("Re-optimizing the deployed design from '%s'\n%s", path, design)
+        return design
+    ## DEF
+
+    def addDeployedCandidates(self, dc, deployedDesign, isShardingEnabled=True, isIndexesEnabled=True, isDenormalizationEnabled=True):
+        """
+            Make sure that the search can keep every part of the deployed design,
+            even if the candidate generation left out some of its keys
+        """
+        for col_name in dc.collections:
+            if not deployedDesign.hasCollection(col_name): continue
+            if isShardingEnabled:
+                for f in deployedDesign.getShardKeys(col_name) or ():
+                    if not f in dc.shardKeys[col_name]:
+                        dc.shardKeys[col_name].append(f)
+            if isIndexesEnabled:
+                for indexKeys in deployedDesign.getIndexes(col_name):
+                    if not tuple(indexKeys) in dc.indexKeys[col_name]:
+                        dc.indexKeys[col_name].append(tuple(indexKeys))
+            parent = deployedDesign.getDenormalizationParent(col_name)
+            if isDenormalizationEnabled and parent and not parent in dc.denorm[col_name]:
+                dc.denorm[col_name].append(parent)
+        ## FOR
+    ## DEF
+
+    def writeExplanation(self, explanation):
+        """Output the cost explanation report using the --explain-* options"""
+        if self.explain_format == "json":
+            report = explanation.toJSON(self.explain_sort)
+        else:
+            report = explanation.toText(self.explain_sort)
+
+        if self.explain_output:
+            with open(self.explain_output, "w") as fd:
+                fd.write(report)
+            LOG.info("Wrote cost explanation for %d query classes to '%s'", len(explanation.entries), self.explain_output)
+        else:
+            print report
+    ## DEF
     
-    def search(self, initialCost, initialDesign, worker_id):
+    def getSearchPartitions(self):
+        """
+            Split up the search space by the shard keys of the collections with
+            the largest share of the workload. Returns a list of dicts that map each
+            of those collections to one of its shard key choices, or None if the
+            search space should not be partitioned.
+        """
+        num_collections = self.config.getint(configutil.SECT_MULTI_SEARCH, 'partition_collections')
+        strategy = self.config.get(configutil.SECT_DESIGNER, 'search_strategy')
+        if num_collections <= 0 or strategy != "lns":
+            return None
+
+        # Collections that only have one choice don't split up anything
+        candidates = [col_name for col_name in self.designCandidates.collections if self.designCandidates.shardKeys[col_name]]
+        candidates.sort(key=lambda col_name: (-self.collections[col_name].get('workload_percent', 0), col_name))
+        partitions = [ { } ]
+        for col_name in candidates[:num_collections]:
+            shardKeys = list(bbsearch.CompoundKeyIterator(self.designCandidates.shardKeys[col_name], bbsearch.SHARD_KEY_MAX_COMPOUND_COUNT))
+            expanded = [ ]
+            for partition in partitions:
+                for shardKey in shardKeys:
+                    p = dict(partition)
+                    p[col_name] = shardKey
+                    expanded.append(p)
+            ## FOR
+            partitions = expanded
+        ## FOR
+        LOG.info("Split up the search space into %d partitions by the shard keys of %s", \
+                 len(partitions), candidates[:num_collections])
+        return partitions
+    ## DEF
+
+    def search(self, initialCost, initialDesign, worker_id, checkpoint=None, partitions=None):
         """
             Main search process starts here
+            The optional checkpoint is the state that this worker's search
+            sent to the coordinator before the search was interrupted
+            If partitions is not None, then the search is limited to those
+            partitions from getSearchPartitions()
         """
         lock = thread.allocate_lock()
-        self.search_method = LNSDesigner(self.collections, self.designCandidates, self.workload, self.config, self.cm, initialDesign, initialCost, self.channel, lock, worker_id)
+        strategy = self.config.get(configutil.SECT_DESIGNER, 'search_strategy')
+        assert strategy in SEARCH_STRATEGIES, \
+            "Invalid search strategy '%s'. Expected one of %s" % (strategy, SEARCH_STRATEGIES.keys())
+        self.search_method = SEARCH_STRATEGIES[strategy](self.collections, self.designCandidates, self.workload, self.config, self.cm, initialDesign, initialCost, self.channel, lock, worker_id)
+        if checkpoint:
+            self.search_method.restoreCheckpoint(checkpoint)
+        if not partitions is None:
+            self.search_method.addPartitions(partitions)
         self.search_method.start()
     ## DEF
 
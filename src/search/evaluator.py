@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import logging
+import multiprocessing
+
+LOG = logging.getLogger(__name__)
+
+# The cost model of the designer that created the evaluation pool. The pool
+# processes are forked after it is set, so they all share the same loaded
+# workload and catalog instead of getting their own pickled copy
+_poolCostModel = None
+
+def evaluateDesign(design):
+    return _poolCostModel.overallCost(design)
+## DEF
+
+## ==============================================
+## PopulationEvaluator
+## ==============================================
+class PopulationEvaluator(object):
+    """
+        Computes the costs of a list of designs, such as the population of a
+        metaheuristic step or a batch of sibling nodes in BBSearch. If there is
+        more than one process, then the designs are evaluated in parallel by a
+        local pool of processes that are forked from this one so that they
+        share the cost model's workload with us.
+    """
+
+    def __init__(self, costModel, processes):
+        global _poolCostModel
+        self.costModel = costModel
+        if processes <= 0:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        self.pool = None
+        # The number of designs that the pool computed in the last call to evaluate()
+        self.lastEvaluated = 0
+        if processes > 1:
+            _poolCostModel = costModel
+            self.pool = multiprocessing.Pool(processes)
+    ## DEF
+
+    def evaluate(self, designs):
+        if self.pool is None:
+            return [self.costModel.overallCost(design) for design in designs]
+
+        # The pool processes have their own copy of the cost model's design memo,
+        # so we check ours before we send them the designs
+        memo = self.costModel.design_memo
+        keys = [design.getKey() for design in designs]
+        missing = { }
+        for i in xrange(len(designs)):
+            if not keys[i] in memo and not keys[i] in missing:
+                missing[keys[i]] = designs[i]
+        ## FOR
+        computed = dict(zip(missing.keys(), self.pool.map(evaluateDesign, missing.values())))
+        self.lastEvaluated = len(missing)
+
+        for key, cost in computed.iteritems():
+            if len(memo) >= self.costModel.design_memo_size:
+                break
+            memo[key] = cost
+        ## FOR
+        return [computed[key] if key in computed else memo[key] for key in keys]
+    ## DEF
+
+    def close(self):
+        if not self.pool is None:
+            self.pool.terminate()
+            self.pool = None
+    ## DEF
+## CLASS
@@ -22,8 +22,6 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
 
-import random
-import itertools
 import logging
 
 from pprint import pformat
@@ -31,8 +29,10 @@ from pprint import pformat
 # mongodb-d4
 from design import Design
 import workload
-from util import Histogram, configutil, constants
+from util import configutil, constants
+from util.fpgrowth import FPGrowth
 from abstractdesigner import AbstractDesigner
+from searchclock import createRandom
 import utilmethods
 
 LOG = logging.getLogger(__name__)
@@ -48,6 +48,7 @@ class InitialDesigner(AbstractDesigner):
     def __init__(self, collections, workload, config):
         AbstractDesigner.__init__(self, collections, workload, config)
         self.address_size = constants.DEFAULT_ADDRESS_SIZE
+        self.rng = createRandom(config, "initial")
         self.debug = LOG.isEnabledFor(logging.DEBUG)
     ## DEF
     
@@ -77,20 +78,25 @@ class InitialDesigner(AbstractDesigner):
     ## DEF
     
     def generateCollectionHistograms(self):
-        col_keys = dict([(col_name, Histogram()) for col_name in self.collections])
+        """
+            Return a histogram for each collection of the sets of keys that
+            are referenced together by at least initial_min_support of its
+            operations. The sets are mined with FP-growth instead of adding
+            every combination of the keys of each operation.
+        """
+        min_support = self.config.getfloat(configutil.SECT_DESIGNER, "initial_min_support")
+        miners = dict([(col_name, FPGrowth(min_support, constants.MAX_INDEX_SIZE)) for col_name in self.collections])
         for sess in self.workload:
             for op in sess["operations"]:
                 if op["collection"].find("$cmd") != -1:
                     continue
-                if not op["collection"] in col_keys:
+                if not op["collection"] in miners:
                     LOG.warn("Missing: " + op["collection"])
                     continue
-                fields = workload.getReferencedFields(op)
-                h = col_keys[op["collection"]]
-                for i in xrange(1, len(fields)+1):
-                    map(h.put, itertools.combinations(fields, i))
+                miners[op["collection"]].add(workload.getReferencedFields(op))
             ## FOR (op)
         ## FOR (sess)
+        col_keys = dict([(col_name, miner.mine()) for col_name, miner in miners.iteritems()])
         return (col_keys)
     ## DEF
     
@@ -100,7 +106,7 @@ class InitialDesigner(AbstractDesigner):
             if self.debug:
                 LOG.debug("Sharding Key Candidates %s => %s", col_name, max_keys)
             if len(max_keys) > 0:
-                design.addShardKey(col_name, random.choice(max_keys))
+                design.addShardKey(col_name, self.rng.choice(max_keys))
             else:
                 design.addShardKey(col_name, [])
         ## FOR
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import math
+import itertools
+import logging
+
+# mongodb-d4
+from design import Design
+import workload
+from util import configutil, constants
+from initialdesigner import InitialDesigner, INITIAL_INDEX_MEMORY_ALLOCATION
+import utilmethods
+
+LOG = logging.getLogger(__name__)
+
+# Constants
+# The fraction of the documents that we assume a range predicate selects
+RANGE_PREDICATE_FRACTION = 0.3
+# The number of index candidates per collection whose combinations we
+# consider in the knapsack
+MAX_INDEX_CANDIDATES = 4
+# The number of buckets that the index memory budget is split into
+KNAPSACK_BUCKETS = 1000
+
+## ==============================================
+## KnapsackDesigner
+## ==============================================
+class KnapsackDesigner(InitialDesigner):
+    """
+        Warm-start designer that picks the shard key of each collection with
+        the smallest estimated number of messages and then solves a knapsack
+        over the index candidates of all the collections for the memory of a
+        single node. The value of a set of indexes is the number of pages that
+        they save the queries minus the pages that the writes have to update.
+    """
+    
+    def __init__(self, collections, workload, config):
+        InitialDesigner.__init__(self, collections, workload, config)
+        self.num_nodes = config.getint(configutil.SECT_CLUSTER, "nodes")
+        self.page_size = constants.DEFAULT_PAGE_SIZE
+        
+        # ColName -> [(ShardKeys, NumMessages)]
+        self.networkCosts = { }
+        # ColName -> [(IndexKeys, Value, Bytes)]
+        self.indexValues = { }
+    ## DEF
+    
+    def generate(self):
+        if self.debug:
+            LOG.debug("Computing knapsack initial design")
+        design = Design()
+        
+        # STEP 1
+        # Group the operations by their collections
+        col_ops = self.generateCollectionOperations()
+        map(design.addCollection, col_ops.iterkeys())
+        
+        # STEP 2
+        # Select the sharding key of each collection that sends the fewest messages
+        self.__selectShardingKeys__(design, col_ops)
+        
+        # STEP 3
+        # Select the indexes that save the most pages within the memory
+        # allocation of a single node
+        total_memory = self.config.getint(configutil.SECT_CLUSTER, "node_memory") * 1024 * 1024 \
+                       * INITIAL_INDEX_MEMORY_ALLOCATION
+        assert total_memory > 0
+        self.__selectIndexKeys__(design, col_ops, total_memory)
+        
+        return design
+    ## DEF
+    
+    def generateCollectionOperations(self):
+        col_ops = dict([(col_name, [ ]) for col_name in self.collections])
+        for sess in self.workload:
+            for op in sess["operations"]:
+                if op["collection"].find("$cmd") != -1:
+                    continue
+                if not op["collection"] in col_ops:
+                    LOG.warn("Missing: " + op["collection"])
+                    continue
+                col_ops[op["collection"]].append(op)
+            ## FOR (op)
+        ## FOR (sess)
+        return (col_ops)
+    ## DEF
+    
+    ## ----------------------------------------------
+    ## SHARDING KEYS
+    ## ----------------------------------------------
+    
+    def estimateMessages(self, col_name, ops, shardKey):
+        """
+            Return the number of messages that the given operations send when
+            the collection is sharded on the given key. This follows the rules of
+            the NodeEstimator that the network cost component uses.
+        """
+        field = self.collections[col_name].getField(shardKey)
+        num_messages = 0
+        for op in ops:
+            predicates = op.get("predicates", { })
+            if op["type"] in [constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT]:
+                num_messages += 1
+            elif predicates.get(shardKey) == constants.PRED_TYPE_EQUALITY:
+                num_messages += 1
+            elif predicates.get(shardKey) == constants.PRED_TYPE_RANGE:
+                num_messages += max(1, int(math.ceil(field['selectivity'] * self.num_nodes)))
+            else:
+                num_messages += self.num_nodes
+        ## FOR
+        return (num_messages)
+    ## DEF
+    
+    def __selectShardingKeys__(self, design, col_ops):
+        for col_name, ops in col_ops.iteritems():
+            col_info = self.collections[col_name]
+            candidates = set()
+            for op in ops:
+                for key in op.get("predicates", { }).iterkeys():
+                    if col_info.getField(key):
+                        candidates.add(key)
+            ## FOR
+            
+            # Keys with fewer distinct values than nodes will be skewed
+            balanced = [key for key in candidates if col_info.getField(key)['cardinality'] >= self.num_nodes]
+            if balanced:
+                candidates = balanced
+            
+            costs = [((key,), self.estimateMessages(col_name, ops, key)) for key in candidates]
+            costs.sort(key=lambda x: (x[1], -col_info.getField(x[0][0])['cardinality'], x[0]))
+            self.networkCosts[col_name] = costs
+            if self.debug:
+                LOG.debug("Sharding Key Candidates %s => %s", col_name, costs)
+            if len(costs) > 0:
+                design.addShardKey(col_name, costs[0][0])
+            else:
+                design.addShardKey(col_name, [])
+        ## FOR
+    ## DEF
+    
+    ## ----------------------------------------------
+    ## INDEX KEYS
+    ## ----------------------------------------------
+    
+    def getScanPages(self, col_name):
+        """Return the number of pages that a collection scan reads"""
+        col_info = self.collections[col_name]
+        return max(1, int(math.ceil(col_info['doc_count'] * col_info['avg_doc_size'] / float(self.page_size))))
+    ## DEF
+    
+    def getIndexMemory(self, design, col_name, indexKeys):
+        """Return the number of bytes that the index uses on the node with the most data"""
+        col_info = self.collections[col_name]
+        index_memory = utilmethods.getIndexSize(col_info, indexKeys) * col_info['doc_count']
+        if design.getShardKeys(col_name):
+            index_memory /= float(self.num_nodes)
+        return (index_memory)
+    ## DEF
+    
+    def estimateSavedPages(self, col_name, op, indexKeys):
+        """
+            Return the number of pages that the given index saves a query compared
+            to scanning the collection. The index can only be used for the prefix
+            of its keys that match equality predicates, plus one range predicate.
+        """
+        col_info = self.collections[col_name]
+        predicates = op.get("predicates", { })
+        fraction = 1.0
+        matched = 0
+        for key in indexKeys:
+            pred_type = predicates.get(key)
+            if pred_type == constants.PRED_TYPE_EQUALITY:
+                fraction /= max(1, col_info.getField(key)['cardinality'])
+                matched += 1
+                continue
+            elif pred_type == constants.PRED_TYPE_RANGE:
+                fraction *= RANGE_PREDICATE_FRACTION
+                matched += 1
+            break
+        ## FOR
+        if matched == 0:
+            return (0)
+        
+        scan_pages = self.getScanPages(col_name)
+        # One page to look up the index, then one page per matching document
+        index_pages = 1 + min(scan_pages, int(math.ceil(fraction * col_info['doc_count'])))
+        return max(0, scan_pages - index_pages)
+    ## DEF
+    
+    def getUpdatedFields(self, op):
+        """Return the fields that an update modifies"""
+        fields = set()
+        for contents in op["query_content"][1:]:
+            for key, value in contents.iteritems():
+                if not key.startswith(constants.REPLACE_KEY_DOLLAR_PREFIX):
+                    fields.add(key)
+                elif isinstance(value, dict):
+                    fields.update([k for k in value.iterkeys() if not k.startswith(constants.REPLACE_KEY_DOLLAR_PREFIX)])
+            ## FOR
+        ## FOR
+        if not fields:
+            fields.update(workload.getReferencedFields(op))
+        return (fields)
+    ## DEF
+    
+    def estimateWritePages(self, op, indexKeys):
+        """Return the number of index pages that a write has to update"""
+        if op["type"] in [constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT, constants.OP_TYPE_DELETE]:
+            return (1)
+        elif op["type"] == constants.OP_TYPE_UPDATE:
+            updated = self.getUpdatedFields(op)
+            if [key for key in indexKeys if key in updated]:
+                return (1)
+        return (0)
+    ## DEF
+    
+    def estimateValue(self, col_name, ops, indexes):
+        """
+            Return the number of pages that the given set of indexes saves the
+            operations minus the number of pages that the writes add. Each query
+            only uses the best index in the set.
+        """
+        value = 0
+        for op in ops:
+            if op["type"] in [constants.OP_TYPE_QUERY, constants.OP_TYPE_UPDATE, constants.OP_TYPE_DELETE]:
+                value += max([0] + [self.estimateSavedPages(col_name, op, indexKeys) for indexKeys in indexes])
+            for indexKeys in indexes:
+                value -= self.estimateWritePages(op, indexKeys)
+        ## FOR
+        return (value)
+    ## DEF
+    
+    def generateIndexCandidates(self, col_name, ops):
+        """
+            Return the index candidates that match the predicates of the operations.
+            For each query we try the index on its equality predicates (most
+            selective first) followed by its range predicate and each of its
+            equality predicates by itself.
+        """
+        col_info = self.collections[col_name]
+        candidates = set()
+        for op in ops:
+            equality = [ ]
+            ranges = [ ]
+            for key, pred_type in op.get("predicates", { }).iteritems():
+                if not col_info.getField(key):
+                    continue
+                if pred_type == constants.PRED_TYPE_EQUALITY:
+                    equality.append(key)
+                elif pred_type == constants.PRED_TYPE_RANGE:
+                    ranges.append(key)
+            ## FOR
+            equality.sort(key=lambda k: (-col_info.getField(k)['cardinality'], k))
+            map(candidates.add, [(key,) for key in equality + ranges])
+            indexKeys = (equality + sorted(ranges)[:1])[:constants.MAX_INDEX_SIZE]
+            if len(indexKeys) > 1:
+                candidates.add(tuple(indexKeys))
+        ## FOR
+        return sorted(candidates)
+    ## DEF
+    
+    def __selectIndexKeys__(self, design, col_ops, total_memory):
+        # Each collection is a group of the knapsack whose options are the
+        # combinations of its best candidates. This way we can account for
+        # the queries that could use more than one of them
+        groups = [ ]
+        for col_name in sorted(col_ops.iterkeys()):
+            ops = col_ops[col_name]
+            values = [ ]
+            for indexKeys in self.generateIndexCandidates(col_name, ops):
+                value = self.estimateValue(col_name, ops, [indexKeys])
+                if value > 0:
+                    values.append((indexKeys, value, self.getIndexMemory(design, col_name, indexKeys)))
+            ## FOR
+            values.sort(key=lambda x: (-x[1] / max(1.0, x[2]), x[0]))
+            self.indexValues[col_name] = values
+            if self.debug:
+                LOG.debug("Index Candidates %s => %s", col_name, values)
+            
+            best = [x[0] for x in values[:MAX_INDEX_CANDIDATES]]
+            options = [ ]
+            for i in xrange(1, len(best)+1):
+                for indexes in itertools.combinations(best, i):
+                    memory = sum([self.getIndexMemory(design, col_name, indexKeys) for indexKeys in indexes])
+                    weight = int(math.ceil(memory * KNAPSACK_BUCKETS / total_memory))
+                    if weight > KNAPSACK_BUCKETS:
+                        continue
+                    value = self.estimateValue(col_name, ops, indexes)
+                    if value > 0:
+                        options.append((indexes, weight, value))
+                ## FOR
+            ## FOR
+            if options:
+                groups.append((col_name, options))
+        ## FOR
+        
+        # Multiple-choice knapsack: best[w] is the largest value that
+        # we can get with at most w buckets of memory
+        best = [0] * (KNAPSACK_BUCKETS+1)
+        choices = [ ]
+        for col_name, options in groups:
+            nextBest = list(best)
+            choice = [None] * (KNAPSACK_BUCKETS+1)
+            for i in xrange(len(options)):
+                weight, value = options[i][1:]
+                for w in xrange(weight, KNAPSACK_BUCKETS+1):
+                    if best[w-weight] + value > nextBest[w]:
+                        nextBest[w] = best[w-weight] + value
+                        choice[w] = i
+            ## FOR
+            best = nextBest
+            choices.append(choice)
+        ## FOR
+        
+        w = KNAPSACK_BUCKETS
+        for g in xrange(len(groups)-1, -1, -1):
+            col_name, options = groups[g]
+            i = choices[g][w]
+            if i is None:
+                continue
+            indexes, weight, value = options[i]
+            if self.debug:
+                LOG.debug("Adding indexes %s for %s [value=%d / buckets=%d]", indexes, col_name, value, weight)
+            map(lambda indexKeys: design.addIndex(col_name, indexKeys), indexes)
+            w -= weight
+        ## FOR
+    ## DEF
+## CLASS
@@ -27,10 +27,18 @@ import os
 import math
 import random
 import logging
+import threading
+import time
 
 # mongodb-d4
 from util import *
+from util import checkpoint
 from search import bbsearch
+from search.bestfirstsearch import BestFirstSearch
+from search.childordering import WorkloadOrdering
+from search.lnsscheduler import AdaptiveScheduler
+from search.evaluator import PopulationEvaluator
+from search.searchclock import createClock, createRandom
 from abstractdesigner import AbstractDesigner
 
 basedir = os.path.realpath(os.path.dirname(__file__))
@@ -43,6 +51,12 @@ LOG = logging.getLogger(__name__)
 RELAX_RATIO_STEP = 0.1
 RELAX_RATIO_UPPER_BOUND = 0.5
 INIFITY = float('inf')
+# Every collection gets at least this much weight (divided by the number of
+# collections) when the relaxed collections are picked by their cost shares
+MIN_COLLECTION_WEIGHT = 0.1
+SEARCH_ENGINES = [ "bbsearch", "bestfirst" ]
+CHILD_ORDERINGS = [ "random", "workload" ]
+LNS_SCHEDULERS = [ "fixed", "adaptive" ]
 
 ## ==============================================
 ## LNSDesigner
@@ -52,8 +66,8 @@ class LNSDesigner(AbstractDesigner):
         Implementation of the large-neighborhood search design algorithm
     """
     class RandomCollectionGenerator:
-        def __init__(self, collections):
-            self.rng = random.Random()
+        def __init__(self, collections, rng=None):
+            self.rng = rng if rng else random.Random()
             self.collections = [ ]
             for col_name in collections.iterkeys():
                 self.collections.append(col_name)
@@ -65,6 +79,19 @@ class LNSDesigner(AbstractDesigner):
             r = self.rng.sample(self.collections, num)
             return r
         ## DEF
+
+        def getWeightedCollections(self, num, weights):
+            """
+                Pick num collections without replacement, where the chance of picking
+                each collection is proportional to its weight (Efraimidis-Spirakis)
+            """
+            keys = [ ]
+            for col_name in self.collections:
+                weight = weights.get(col_name, 0.0) + MIN_COLLECTION_WEIGHT / self.length
+                keys.append((self.rng.random() ** (1.0 / weight), col_name))
+            ## FOR
+            return [col_name for key, col_name in sorted(keys, reverse=True)[:num]]
+        ## DEF
     ## CLASS
     
     def __init__(self, collections, designCandidates, workload, config, costModel, initialDesign, bestCost, channel=None, lock=None, worker_id=None):
@@ -89,14 +116,87 @@ class LNSDesigner(AbstractDesigner):
             
         self.ratio_step = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'relax_ratio_step')
         self.max_ratio = self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'max_relax_ratio')
+
+        self.lns_scheduler = self.config.get(configutil.SECT_MULTI_SEARCH, 'lns_scheduler')
+        assert self.lns_scheduler in LNS_SCHEDULERS, \
+            "Invalid LNS scheduler '%s'. Expected one of %s" % (self.lns_scheduler, LNS_SCHEDULERS)
+        self.scheduler = None
+        if self.lns_scheduler == "adaptive" and not self.isExhaustedSearch:
+            # Only keep one ratio for each number of relaxed collections
+            ratios = [ ]
+            sizes = set()
+            ratio = self.init_relaxRatio
+            while ratio <= self.max_ratio + 1e-9:
+                size = int(round(len(self.collections) * ratio))
+                if size > 0 and not size in sizes:
+                    sizes.add(size)
+                    ratios.append(ratio)
+                ratio += self.ratio_step
+            ## WHILE
+            self.scheduler = AdaptiveScheduler(ratios or [ self.init_relaxRatio ])
+        # The per-collection cost shares of the last design that we split up
+        self.costShares = None
+        self.costSharesDesign = None
         
         self.designCandidates = designCandidates
 
+        self.search_engine = self.config.get(configutil.SECT_DESIGNER, 'search_engine')
+        assert self.search_engine in SEARCH_ENGINES, \
+            "Invalid search engine '%s'. Expected one of %s" % (self.search_engine, SEARCH_ENGINES)
+        self.beam_width = self.config.getint(configutil.SECT_DESIGNER, 'beam_width')
+        self.sibling_batch_size = self.config.getint(configutil.SECT_DESIGNER, 'sibling_batch_size')
+        self.eval_processes = self.config.getint(configutil.SECT_DESIGNER, 'eval_processes')
+        self.evaluator = None
+
+        self.child_ordering = self.config.get(configutil.SECT_DESIGNER, 'child_ordering')
+        assert self.child_ordering in CHILD_ORDERINGS, \
+            "Invalid child ordering '%s'. Expected one of %s" % (self.child_ordering, CHILD_ORDERINGS)
+        self.ordering = None
+        if self.child_ordering == "workload":
+            self.ordering = WorkloadOrdering(self.collections, self.workload)
+
         self.channel = channel
         self.bbsearch_method = None
         self.bestLock = lock
+        # The (cost, design) from another worker that we will use as the base
+        # design of our next round
+        self.pendingDesign = None
+        self.restart_on_update = configutil.getBoolean(self.config, configutil.SECT_MULTI_SEARCH, 'restart_on_update')
+
+        # If the search space is partitioned, then this is the list of partitions
+        # that we have not searched yet. Each one maps collection names to the
+        # shard key that they must have. The collections in the current partition
+        # are relaxed in every round so that we never leave it.
+        self.partitions = None
+        self.partition = None
+        self.workReceived = threading.Event()
         self.worker_id = worker_id
         self.debug = False
+
+        # The time limits are measured with this clock. If the search is seeded,
+        # then we pick the relaxed collections and BBSearch shuffles the
+        # collections with our own generators for this worker
+        self.clock = createClock(self.config, self.costModel)
+        self.rng = createRandom(self.config, worker_id, "lns")
+        self.bbsearch_rng = createRandom(self.config, worker_id, "bbsearch")
+
+        # Profiling counters for the LNS rounds. These are sent back to the
+        # coordinator together with the cost model's counters
+        self.stats = SearchStats()
+        self.stats_interval = self.config.getint(configutil.SECT_MULTI_SEARCH, 'stats_interval')
+        # Shared by all of the rounds so that the evaluated designs are reported in batches
+        self.progress = ProgressCounter(self.channel, self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'progress_interval'))
+        # List of (timestamp, cost) for every new best design found by this worker
+        self.improvements = [ ]
+
+        # The state that we send to the coordinator so that the search can be
+        # continued after a crash. If resumeState is set, then we pick up where
+        # that checkpoint left off
+        self.checkpoint_interval = self.config.getint(configutil.SECT_MULTI_SEARCH, 'checkpoint_interval')
+        self.last_checkpoint = time.time()
+        self.resumeState = None
+        # The keys of the design memo entries that the coordinator already has
+        self.memoSent = set()
         ### Test
         self.count = 0
     ## DEF
@@ -105,7 +205,7 @@ class LNSDesigner(AbstractDesigner):
         """
             main public method. Simply call to get the optimal solution
         """
-        col_generator = LNSDesigner.RandomCollectionGenerator(self.collections)
+        col_generator = LNSDesigner.RandomCollectionGenerator(self.collections, self.rng)
         
         worker_used_time = 0 # This is used to record how long this worker has been running
         elapsedTime = 0 # this is used to check if this worker has found a better design for a limited time: patient time
@@ -113,54 +213,320 @@ class LNSDesigner(AbstractDesigner):
         bbsearch_time_out = self.init_bbsearch_time
         bestCost = self.init_bestCost
         bestDesign = self.init_bestDesign.copy()
+        self.improvements = [ (time.time(), bestCost) ]
+        if not self.resumeState is None:
+            relaxRatio = self.resumeState["relax_ratio"]
+            bbsearch_time_out = self.resumeState["bbsearch_time_out"]
+            worker_used_time = self.resumeState["worker_used_time"]
+            elapsedTime = self.resumeState["elapsed_time"]
+            self.timeout = self.resumeState["timeout"]
+            LOG.info("Resuming LNS search after %d rounds [relaxRatio=%s, bbsearchTimeout=%s, timeLeft=%s]", \
+                     self.resumeState["rounds"], relaxRatio, bbsearch_time_out, self.timeout)
+        ## IF
         
-        while True:
-            relaxedCollectionsNames, relaxedDesign = self.__relax__(col_generator, bestDesign, relaxRatio)
-            sendMessage(MSG_SEARCH_INFO, (relaxedCollectionsNames, bbsearch_time_out, relaxedDesign, worker_used_time, elapsedTime, self.worker_id), self.channel)
+        if not self.partitions is None:
+            self.partition = self.nextPartition()
+        if self.sibling_batch_size > 1 and self.search_engine == "bbsearch":
+            self.evaluator = PopulationEvaluator(self.costModel, self.eval_processes)
+        
+        # If the search space is partitioned, we stop once there is no partition left for us
+        while self.partitions is None or not self.partition is None:
+            pending = self.takePendingDesign()
+            if not pending is None and pending[0] < bestCost:
+                bestCost, bestDesign = pending
+                self.stats.incr("lns_incumbents_adopted")
+            ## IF
+            arm = None
+            weights = None
+            if not self.scheduler is None:
+                arm = self.scheduler.choose()
+                relaxRatio, strategy = self.scheduler.getArm(arm)
+                self.stats.incr("lns_arm_%.2f_%s" % (relaxRatio, strategy))
+                if strategy == "cost":
+                    weights = self.__getCostShares__(bestDesign)
+            relaxedCollectionsNames, relaxedDesign = self.__relax__(col_generator, bestDesign, relaxRatio, weights, self.partition)
+            sendMessage(MSG_SEARCH_INFO, (relaxedCollectionsNames, bbsearch_time_out, relaxedDesign, worker_used_time, elapsedTime, self.worker_id, relaxRatio), self.channel)
             
             dc = self.designCandidates.getCandidates(relaxedCollectionsNames)
-            self.bbsearch_method = bbsearch.BBSearch(dc, self.costModel, relaxedDesign, bestCost, bbsearch_time_out, self.channel, self.bestLock)
+            if not self.partition is None:
+                for col_name, shardKey in self.partition.iteritems():
+                    dc.fixShardKey(col_name, shardKey)
+            ## IF
+            self.bbsearch_method = self.__createSearch__(dc, relaxedDesign, bestCost, bbsearch_time_out)
+            self.bbsearch_method.progressCallback = self.sendStats
+            self.bbsearch_method.progressInterval = self.stats_interval
+            self.bbsearch_method.componentsCallback = self.costModel.getComponents
+            self.bbsearch_method.restartOnUpdate = self.restart_on_update
+            roundCost = bestCost
+            cpuStart = self.clock.cpu()
+            evaluations = self.costModel.stats.get("evaluations")
             self.bbsearch_method.solve()
+            cpuTime = self.clock.cpu() - cpuStart
+            evaluations = self.costModel.stats.get("evaluations") - evaluations + self.bbsearch_method.poolEvaluations
             
             worker_used_time += self.bbsearch_method.usedTime
+            self.__collectStats__(self.bbsearch_method)
+            self.sendStats()
             
             if self.bbsearch_method.status != "updated_design":
+                # The best design of the round is either one that we found in this
+                # neighborhood or one from another worker that arrived while we were
+                # searching. Only the first counts as an improvement of this round.
+                localImprovements = self.bbsearch_method.improvements
+                improved = len(localImprovements) > 0
                 if self.bbsearch_method.bestCost < bestCost:
                     bestCost = self.bbsearch_method.bestCost
                     bestDesign = self.bbsearch_method.bestDesign.copy()
+                    if not improved or bestCost < localImprovements[-1][1]:
+                        self.stats.incr("lns_incumbents_adopted")
+                ## IF
+                if improved:
                     elapsedTime = 0
                 else:
                     elapsedTime += self.bbsearch_method.usedTime
+                if not self.scheduler is None:
+                    roundBest = localImprovements[-1][1] if improved else roundCost
+                    self.scheduler.update(arm, roundCost, roundBest, cpuTime)
                 
                 if self.isExhaustedSearch:
                     elapsedTime = INIFITY
                     
-                if elapsedTime >= self.patient_time:
+                finishedPartition = False
+                if elapsedTime >= self.patient_time and not self.partitions is None:
+                    finishedPartition = True
+                elif elapsedTime >= self.patient_time:
                     # if it haven't found a better design for one hour, give up
                     LOG.info("Haven't found a better design for %s minutes. QUIT", elapsedTime)
                     break
 
-                relaxRatio += self.ratio_step
-                if relaxRatio > self.max_ratio:
-                    relaxRatio = self.max_ratio
-                    
                 self.timeout -= self.bbsearch_method.usedTime
-                bbsearch_time_out += self.ratio_step / 0.1 * 30
+                if self.scheduler is None:
+                    relaxRatio += self.ratio_step
+                    if relaxRatio > self.max_ratio:
+                        relaxRatio = self.max_ratio
+                    bbsearch_time_out += self.ratio_step / 0.1 * 30
+                elif self.bbsearch_method.status == "timed_out" and not improved:
+                    # The scheduler picks the size of the neighborhoods, so we only
+                    # give them more time when BBSearch could not finish one
+                    bbsearch_time_out += self.ratio_step / 0.1 * 30
 
                 if self.timeout <= 0:
                     break
+                if finishedPartition:
+                    # Start over in our next partition of the search space
+                    LOG.info("Haven't found a better design in partition %s for %s seconds", self.partition, elapsedTime)
+                    self.stats.incr("lns_partitions")
+                    self.partition = self.nextPartition()
+                    elapsedTime = 0
+                    relaxRatio = self.init_relaxRatio
+                    bbsearch_time_out = self.init_bbsearch_time
+                ## IF
             ## IF
             else:
+                # We abandoned this round because of restart_on_update
+                self.stats.incr("lns_restarts")
+                self.stats.incr("lns_wasted_evaluations", evaluations)
                 if self.bbsearch_method.bestCost < bestCost:
                     bestCost = self.bbsearch_method.bestCost
                     bestDesign = self.bbsearch_method.bestDesign.copy()
                 ## IF
             ## ELSE
+            if time.time() - self.last_checkpoint >= self.checkpoint_interval:
+                self.sendCheckpoint(relaxRatio, bbsearch_time_out, worker_used_time, elapsedTime, bestCost, bestDesign)
         ## WHILE
+        if not self.evaluator is None:
+            self.evaluator.close()
+        self.sendCheckpoint(relaxRatio, bbsearch_time_out, worker_used_time, elapsedTime, bestCost, bestDesign)
+        LOG.info("Found a design within %d%% of the best cost %f after %.2f seconds [engine=%s]", \
+                 bbsearch.NEAR_BEST_RATIO * 100, bestCost, self.getTimeToNearBest(), self.search_engine)
+        if not self.scheduler is None:
+            LOG.info("Adaptive LNS scheduler arms: %s", self.scheduler.toDICT())
         sendMessage(MSG_EXECUTE_COMPLETED, self.worker_id, self.channel)
     # DEF
 
-    def __relax__(self, generator, design, ratio):
+    def __createSearch__(self, dc, relaxedDesign, bestCost, timeout):
+        """Return the search engine object that will explore the given neighborhood"""
+        if not self.ordering is None:
+            dc = self.ordering.apply(dc)
+        if self.search_engine == "bestfirst":
+            search = BestFirstSearch(dc, self.costModel, relaxedDesign, bestCost, timeout, self.channel, self.bestLock, self.beam_width)
+        else:
+            search = bbsearch.BBSearch(dc, self.costModel, relaxedDesign, bestCost, timeout, self.channel, self.bestLock)
+            search.evaluator = self.evaluator
+            search.batchSize = self.sibling_batch_size
+        search.clock = self.clock
+        search.rng = self.bbsearch_rng
+        search.progress = self.progress
+        if not self.ordering is None:
+            search.collectionOrder = self.ordering.getCollectionOrder(dc)
+            search.indexKeyFilter = self.ordering.isUsefulIndex
+        return search
+    ## DEF
+
+    def updateBest(self, bestCost, bestDesign):
+        """
+            Called when another worker found a better design. The BBSearch that is
+            running prunes against its cost right away, and the next round uses it
+            as its base design.
+        """
+        self.bestLock.acquire()
+        if self.pendingDesign is None or bestCost < self.pendingDesign[0]:
+            self.pendingDesign = (bestCost, bestDesign.copy())
+        self.bestLock.release()
+        if not self.bbsearch_method is None:
+            self.bbsearch_method.updateBest(bestCost, bestDesign)
+    ## DEF
+
+    def addPartitions(self, partitions):
+        """Add partitions of the search space to the ones that we still have to search"""
+        self.bestLock.acquire()
+        if self.partitions is None:
+            self.partitions = [ ]
+        self.partitions.extend(partitions)
+        self.bestLock.release()
+        self.workReceived.set()
+    ## DEF
+
+    def stealPartitions(self):
+        """
+            Give up half of the partitions that we have not started yet so that an
+            idle worker can search them. Returns the list of those partitions and
+            the number of partitions that we have left.
+        """
+        self.bestLock.acquire()
+        stolen = [ ]
+        if self.partitions:
+            num = (len(self.partitions) + 1) / 2
+            stolen = self.partitions[-num:]
+            del self.partitions[-num:]
+        remaining = len(self.partitions or [ ])
+        self.bestLock.release()
+        return stolen, remaining
+    ## DEF
+
+    def nextPartition(self):
+        """
+            Return the next partition that we should search. If we don't have any
+            left, then we ask the coordinator to take some from another worker and
+            wait for them. Returns None if there is no work left.
+        """
+        self.bestLock.acquire()
+        self.workReceived.clear()
+        partition = self.partitions.pop(0) if self.partitions else None
+        self.bestLock.release()
+        if partition is None:
+            sendMessage(MSG_REQUEST_WORK, self.worker_id, self.channel)
+            self.workReceived.wait()
+            self.bestLock.acquire()
+            partition = self.partitions.pop(0) if self.partitions else None
+            self.bestLock.release()
+        ## IF
+        if not partition is None:
+            LOG.info("Searching partition %s [partitionsLeft=%d]", partition, len(self.partitions))
+        return partition
+    ## DEF
+
+    def takePendingDesign(self):
+        """Return the (cost, design) from updateBest() that has not been used yet, or None"""
+        self.bestLock.acquire()
+        pending = self.pendingDesign
+        self.pendingDesign = None
+        self.bestLock.release()
+        return pending
+    ## DEF
+
+    def sendCheckpoint(self, relaxRatio, bbsearch_time_out, worker_used_time, elapsedTime, bestCost, bestDesign):
+        """
+            Send the state of our search loop and the design memo entries that
+            are new since our last checkpoint to the coordinator
+        """
+        state = {
+            "relax_ratio":       relaxRatio,
+            "bbsearch_time_out": bbsearch_time_out,
+            "worker_used_time":  worker_used_time,
+            "elapsed_time":      elapsedTime,
+            "timeout":           self.timeout,
+            "rounds":            self.stats.get("lns_rounds"),
+            "best_cost":         bestCost,
+            "best_design":       bestDesign,
+            "memo":              checkpoint.getNewMemoEntries(self.costModel.design_memo, self.memoSent),
+            "scheduler":         None,
+            "random_state":      (self.rng.getstate(), self.bbsearch_rng.getstate()),
+        }
+        if not self.scheduler is None:
+            state["scheduler"] = (self.scheduler.pulls, self.scheduler.rewards, self.scheduler.total_pulls)
+        sendMessage(MSG_CHECKPOINT, (self.worker_id, state), self.channel)
+        self.last_checkpoint = time.time()
+    ## DEF
+
+    def restoreCheckpoint(self, state):
+        """Continue from the state that an earlier run sent with sendCheckpoint()"""
+        self.resumeState = state
+        self.costModel.design_memo.update(state["memo"])
+        self.memoSent.update(state["memo"].iterkeys())
+        self.stats.incr("lns_rounds", state["rounds"])
+        if "random_state" in state:
+            self.rng.setstate(state["random_state"][0])
+            self.bbsearch_rng.setstate(state["random_state"][1])
+        if not self.scheduler is None and state["scheduler"] and \
+           len(state["scheduler"][0]) == len(self.scheduler.arms):
+            self.scheduler.pulls, self.scheduler.rewards, self.scheduler.total_pulls = state["scheduler"]
+    ## DEF
+
+    def getTimeToNearBest(self):
+        """Return the number of seconds that it took to get within NEAR_BEST_RATIO of our best cost"""
+        if not self.improvements:
+            return None
+        return bbsearch.timeToNearBest(self.improvements) - self.improvements[0][0]
+    ## DEF
+
+    def __collectStats__(self, bb):
+        """Fold the counters of a finished BBSearch round into our stats"""
+        self.stats.incr("lns_rounds")
+        self.stats.incr("bb_nodes_expanded", bb.nodesExpanded)
+        self.stats.incr("bb_nodes_pruned", bb.nodesPruned)
+        self.stats.incr("bb_backtracks", bb.totalBacktracks)
+        self.stats.incr("bb_%s" % bb.status)
+        self.stats.incr("lns_incumbent_updates", bb.incumbentUpdates)
+        # The evaluations in the pool processes are not counted by our cost model
+        self.stats.incr("evaluations", bb.poolEvaluations)
+        self.stats.incr("bb_batches", bb.batches)
+        self.stats.addTime("bbsearch", bb.usedTime)
+        self.improvements.extend(bb.improvements)
+    ## DEF
+
+    def getStats(self):
+        """
+            Return a new SearchStats with the counters of this designer, the
+            BBSearch round that is still running, and the cost model
+        """
+        stats = SearchStats()
+        stats.start_time = self.stats.start_time
+        stats.merge(self.stats)
+        stats.merge(self.costModel.getStats())
+        bb = self.bbsearch_method
+        if bb is not None and bb.status == "solving":
+            stats.incr("bb_nodes_expanded", bb.nodesExpanded)
+            stats.incr("bb_nodes_pruned", bb.nodesPruned)
+            stats.incr("bb_backtracks", bb.totalBacktracks)
+        stats.setGauge("time_to_near_best", self.getTimeToNearBest())
+        return stats
+    ## DEF
+
+    def sendStats(self):
+        sendMessage(MSG_SEARCH_STATS, (self.worker_id, self.getStats().toDICT()), self.channel)
+    ## DEF
+
+    def __getCostShares__(self, design):
+        """Return the fraction of the cost of the given design that each collection is responsible for"""
+        if not design is self.costSharesDesign:
+            self.costShares = self.costModel.getCostShares(design)
+            self.costSharesDesign = design
+            self.stats.incr("lns_cost_shares")
+        return self.costShares
+    ## DEF
+
+    def __relax__(self, generator, design, ratio, weights=None, partition=None):
         numberOfRelaxedCollections = int(round(len(self.collections) * ratio))
         relaxedDesign = design.copy()
         
@@ -170,11 +536,27 @@ class LNSDesigner(AbstractDesigner):
             relaxedCollectionsNames = self.collections.keys()[:]
             ## FOR
         ## IF
+        elif weights:
+            relaxedCollectionsNames = generator.getWeightedCollections(numberOfRelaxedCollections, weights)
+            for col_name in relaxedCollectionsNames:
+                relaxedDesign.reset(col_name)
+            ## FOR
         else:
             relaxedCollectionsNames = generator.getRandomCollections(numberOfRelaxedCollections)
             for col_name in relaxedCollectionsNames:
                 relaxedDesign.reset(col_name)
             ## FOR
+
+        # The shard keys of these collections are fixed by the partition, so
+        # we always relax them so that we stay inside of it
+        if partition:
+            relaxedCollectionsNames = list(relaxedCollectionsNames)
+            for col_name in partition:
+                if not col_name in relaxedCollectionsNames:
+                    relaxedCollectionsNames.append(col_name)
+                    relaxedDesign.reset(col_name)
+            ## FOR
+        ## IF
             
         return relaxedCollectionsNames, relaxedDesign
     ## DEF
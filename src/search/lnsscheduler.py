@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import math
+import logging
+
+LOG = logging.getLogger(__name__)
+
+# Constants
+# How the collections of a neighborhood are picked: uniformly at random or
+# in proportion to their share of the cost of the current best design
+SELECTION_STRATEGIES = [ "random", "cost" ]
+# The exploration coefficient of UCB1
+DEFAULT_EXPLORATION = math.sqrt(2.0)
+# Rounds that take less CPU time than this are treated as if they took this long
+MIN_CPU_TIME = 0.1
+
+## ==============================================
+## AdaptiveScheduler
+## ==============================================
+class AdaptiveScheduler(object):
+    """
+        Multi-armed bandit that picks the neighborhood of the next LNS round.
+        Each arm is a (relaxRatio, selectionStrategy) pair, and its reward is
+        the relative cost improvement of a round per CPU-second. Arms are
+        picked with UCB1, where the average rewards are scaled by the best
+        average reward so far because there is no upper bound on them.
+    """
+
+    def __init__(self, ratios, strategies=SELECTION_STRATEGIES, exploration=DEFAULT_EXPLORATION):
+        assert ratios, "No relax ratios for the scheduler"
+        self.arms = [ (ratio, strategy) for ratio in ratios for strategy in strategies ]
+        self.exploration = exploration
+        self.pulls = [ 0 ] * len(self.arms)
+        self.rewards = [ 0.0 ] * len(self.arms)
+        self.total_pulls = 0
+    ## DEF
+
+    def choose(self):
+        """Return the index of the arm for the next round"""
+        # Try every arm once first
+        for i in xrange(len(self.arms)):
+            if not self.pulls[i]:
+                return i
+        ## FOR
+        means = [ self.rewards[i] / self.pulls[i] for i in xrange(len(self.arms)) ]
+        scale = max(means) or 1.0
+        best = None
+        bestScore = None
+        for i in xrange(len(self.arms)):
+            score = means[i] / scale + self.exploration * math.sqrt(math.log(self.total_pulls) / self.pulls[i])
+            if bestScore is None or score > bestScore:
+                best = i
+                bestScore = score
+        ## FOR
+        return best
+    ## DEF
+
+    def getArm(self, i):
+        """Return the (relaxRatio, selectionStrategy) of the given arm"""
+        return self.arms[i]
+    ## DEF
+
+    def update(self, i, oldCost, newCost, cpuTime):
+        """Record the outcome of a round that used the given arm. Returns its reward"""
+        improvement = 0.0
+        if newCost < oldCost and oldCost:
+            improvement = (oldCost - newCost) / abs(oldCost)
+        reward = improvement / max(cpuTime, MIN_CPU_TIME)
+        self.pulls[i] += 1
+        self.rewards[i] += reward
+        self.total_pulls += 1
+        LOG.debug("Arm %s: improvement %f in %.2f CPU seconds [reward=%f]", self.arms[i], improvement, cpuTime, reward)
+        return reward
+    ## DEF
+
+    def toDICT(self):
+        """Return the number of pulls and the average reward of every arm"""
+        ret = { }
+        for i in xrange(len(self.arms)):
+            ratio, strategy = self.arms[i]
+            ret["%.2f/%s" % (ratio, strategy)] = {
+                "pulls":  self.pulls[i],
+                "reward": (self.rewards[i] / self.pulls[i]) if self.pulls[i] else None,
+            }
+        ## FOR
+        return ret
+    ## DEF
+## CLASS
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import sys
+import os
+import math
+import random
+import logging
+import time
+
+# mongodb-d4
+from util import *
+from util import checkpoint
+from search import bbsearch
+from search.evaluator import PopulationEvaluator
+from search.searchclock import createClock, createRandom
+from abstractdesigner import AbstractDesigner
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../multithreaded"))
+
+from message import *
+LOG = logging.getLogger(__name__)
+
+# Constants
+INIFITY = float('inf')
+# Probability that a shard key mutation removes the shard key altogether
+NO_SHARD_KEY_PROBABILITY = 0.1
+# Number of times that we try to make a feasible mutation before giving up
+MAX_MUTATION_ATTEMPTS = 10
+TOURNAMENT_SIZE = 2
+
+## ==============================================
+## DesignMutator
+## ==============================================
+class DesignMutator(object):
+    """
+        The mutation and crossover operators that the metaheuristic designers
+        apply to complete designs. Every new key comes from the DesignCandidates,
+        and we never return a design that BBSearch would consider infeasible.
+    """
+    MUTATIONS = [ "shardKey", "addIndex", "dropIndex", "denorm" ]
+
+    def __init__(self, designCandidates, rng=None):
+        self.designCandidates = designCandidates
+        self.collections = sorted(designCandidates.collections)
+        self.rng = rng if rng else random.Random()
+    ## DEF
+
+    def mutate(self, design):
+        """Return a copy of the given design with one random change to one collection"""
+        for attempt in xrange(MAX_MUTATION_ATTEMPTS):
+            col_name = self.rng.choice(self.collections)
+            mutation = self.rng.choice(DesignMutator.MUTATIONS)
+            child = getattr(self, "__%s__" % mutation)(design, col_name)
+            if not child is None and self.isFeasible(child):
+                return child
+        ## FOR
+        return design.copy()
+    ## DEF
+
+    def crossover(self, design0, design1):
+        """Return a new design that takes the configuration of each collection from one of the two parents"""
+        child = design0.copy()
+        for col_name in self.collections:
+            if self.rng.random() < 0.5:
+                self.__assign__(child, col_name, design1.getShardKeys(col_name), \
+                                design1.getIndexes(col_name), design1.getDenormalizationParent(col_name))
+        ## FOR
+        return self.repair(child)
+    ## DEF
+
+    def isFeasible(self, design):
+        """
+            Same constraints as BBNode: there are no denormalization cycles and a
+            collection cannot have a shard key if any collection that it is
+            embedded in has one
+        """
+        for col_name in design.getCollections():
+            parent = design.getDenormalizationParent(col_name)
+            visited = set([col_name])
+            hasShardKey = len(design.getShardKeys(col_name) or []) > 0
+            while parent:
+                if parent in visited:
+                    return False
+                visited.add(parent)
+                if hasShardKey and design.hasCollection(parent) and len(design.getShardKeys(parent) or []) > 0:
+                    return False
+                parent = design.getDenormalizationParent(parent)
+            ## WHILE
+        ## FOR
+        return True
+    ## DEF
+
+    def repair(self, design):
+        """Undo the denormalization of collections until the given design is feasible"""
+        col_names = design.getCollections()
+        self.rng.shuffle(col_names)
+        for col_name in col_names:
+            if self.isFeasible(design):
+                break
+            if design.isDenormalized(col_name):
+                design.setDenormalizationParent(col_name, None)
+        ## FOR
+        return design
+    ## DEF
+
+    def __assign__(self, design, col_name, shardKey, indexes, denorm):
+        design.recover(col_name)
+        design.addShardKey(col_name, tuple(shardKey) if shardKey else None)
+        for indexKeys in indexes or [ ]:
+            design.addIndex(col_name, indexKeys)
+        design.setDenormalizationParent(col_name, denorm)
+    ## DEF
+
+    def __shardKey__(self, design, col_name):
+        candidates = self.designCandidates.shardKeys[col_name]
+        if not candidates:
+            return None
+        shardKey = ()
+        if self.rng.random() >= NO_SHARD_KEY_PROBABILITY:
+            size = self.rng.randint(1, min(len(candidates), bbsearch.SHARD_KEY_MAX_COMPOUND_COUNT))
+            shardKey = tuple(self.rng.sample(candidates, size))
+        if shardKey == tuple(design.getShardKeys(col_name) or ()):
+            return None
+        child = design.copy()
+        self.__assign__(child, col_name, shardKey, design.getIndexes(col_name), design.getDenormalizationParent(col_name))
+        return child
+    ## DEF
+
+    def __addIndex__(self, design, col_name):
+        indexes = design.getIndexes(col_name) or [ ]
+        # Skip the keys that share a prefix with an existing index (like CompoundKeyIterator)
+        candidates = [keys for keys in self.designCandidates.indexKeys[col_name] \
+                      if not [i for i in indexes if i[:len(keys)] == tuple(keys)[:len(i)]]]
+        if not candidates:
+            return None
+        child = design.copy()
+        child.addIndex(col_name, self.rng.choice(candidates))
+        return child
+    ## DEF
+
+    def __dropIndex__(self, design, col_name):
+        indexes = design.getIndexes(col_name) or [ ]
+        if not indexes:
+            return None
+        indexes = list(indexes)
+        indexes.remove(self.rng.choice(indexes))
+        child = design.copy()
+        self.__assign__(child, col_name, design.getShardKeys(col_name), indexes, design.getDenormalizationParent(col_name))
+        return child
+    ## DEF
+
+    def __denorm__(self, design, col_name):
+        current = design.getDenormalizationParent(col_name)
+        candidates = [parent for parent in [None] + list(self.designCandidates.denorm[col_name]) if parent != current]
+        if not candidates:
+            return None
+        child = design.copy()
+        child.setDenormalizationParent(col_name, self.rng.choice(candidates))
+        return child
+    ## DEF
+## CLASS
+
+## ==============================================
+## MetaheuristicDesigner
+## ==============================================
+class MetaheuristicDesigner(AbstractDesigner):
+    """
+        Base class for the search strategies that improve complete designs
+        instead of exploring neighborhoods with BBSearch. Each step evaluates
+        a whole batch of designs at once. It talks to the coordinator with
+        the same messages as LNSDesigner.
+    """
+
+    def __init__(self, collections, designCandidates, workload, config, costModel, initialDesign, bestCost, channel=None, lock=None, worker_id=None):
+        AbstractDesigner.__init__(self, collections, workload, config)
+        self.costModel = costModel
+        self.designCandidates = designCandidates
+        self.init_bestDesign = initialDesign.copy()
+        self.init_bestCost = bestCost
+
+        self.timeout = self.config.getint(configutil.SECT_MULTI_SEARCH, 'time_for_lnssearch')
+        self.patient_time = self.config.getint(configutil.SECT_MULTI_SEARCH, 'patient_time')
+        self.population_size = self.config.getint(configutil.SECT_DESIGNER, 'population_size')
+        self.eval_processes = self.config.getint(configutil.SECT_DESIGNER, 'eval_processes')
+
+        self.channel = channel
+        self.bestLock = lock
+        self.worker_id = worker_id
+        # The timeout and the patience are measured with this clock
+        self.clock = createClock(self.config, self.costModel)
+        self.rng = createRandom(self.config, worker_id, "metaheuristic")
+        self.mutator = DesignMutator(designCandidates, self.rng)
+
+        self.bestCost = bestCost
+        self.bestDesign = self.init_bestDesign.copy()
+        # A better design from another worker that has not been added to our population yet
+        self.pendingDesign = None
+
+        self.stats = SearchStats()
+        self.stats_interval = self.config.getint(configutil.SECT_MULTI_SEARCH, 'stats_interval')
+        # Reports the evaluated designs to the coordinator in batches
+        self.progress = ProgressCounter(self.channel, self.config.getfloat(configutil.SECT_MULTI_SEARCH, 'progress_interval'))
+        # List of (timestamp, cost) for every new best design found by this worker
+        self.improvements = [ ]
+        self.checkpoint_interval = self.config.getint(configutil.SECT_MULTI_SEARCH, 'checkpoint_interval')
+        self.elapsed = 0.0
+        # The keys of the design memo entries that the coordinator already has
+        self.memoSent = set()
+    ## DEF
+
+    def run(self):
+        """
+            main public method. Simply call to get the optimal solution
+        """
+        start = time.time()
+        # Include the time that an earlier run spent if we were resumed
+        clockStart = self.clock.time() - self.elapsed
+        lastImprovement = self.clock.time()
+        lastStats = lastCheckpoint = time.time()
+        self.improvements = [ (start, self.bestCost) ]
+        self.evaluator = PopulationEvaluator(self.costModel, self.eval_processes)
+        try:
+            sendMessage(MSG_SEARCH_INFO, (self.designCandidates.collections, self.timeout, self.bestDesign, \
+                                          0, 0, self.worker_id), self.channel)
+            self.initialize()
+            while True:
+                if self.step():
+                    lastImprovement = self.clock.time()
+                self.stats.incr("meta_steps")
+
+                now = time.time()
+                if now - lastStats >= self.stats_interval:
+                    self.sendStats()
+                    lastStats = now
+                if now - lastCheckpoint >= self.checkpoint_interval:
+                    self.sendCheckpoint(self.clock.time() - clockStart)
+                    lastCheckpoint = now
+                if self.clock.time() - lastImprovement >= self.patient_time:
+                    LOG.info("Haven't found a better design for %s. QUIT", self.clock.time() - lastImprovement)
+                    break
+                if self.clock.time() - clockStart >= self.timeout:
+                    break
+            ## WHILE
+        finally:
+            self.evaluator.close()
+        self.progress.flush()
+        self.sendCheckpoint(self.clock.time() - clockStart)
+        self.stats.addTime("metaheuristic", time.time() - start)
+        self.sendStats()
+        LOG.info("Found a design within %d%% of the best cost %f after %.2f seconds [strategy=%s]", \
+                 bbsearch.NEAR_BEST_RATIO * 100, self.bestCost, self.getTimeToNearBest(), self.__class__.__name__)
+        sendMessage(MSG_EXECUTE_COMPLETED, self.worker_id, self.channel)
+    ## DEF
+
+    def initialize(self):
+        raise NotImplementedError("Unimplemented %s.initialize()" % self.__init__.im_class)
+    ## DEF
+
+    def step(self):
+        """Perform one round of the search. Returns True if it found a new best design"""
+        raise NotImplementedError("Unimplemented %s.step()" % self.__init__.im_class)
+    ## DEF
+
+    def evaluate(self, designs):
+        """Compute the costs of the given designs and remember the best one. Returns the list of costs"""
+        costs = self.evaluator.evaluate(designs)
+        self.stats.incr("meta_evaluations", len(designs))
+        # The evaluations in the pool processes are not counted by our cost model
+        if not self.evaluator.pool is None:
+            self.stats.incr("evaluations", self.evaluator.lastEvaluated)
+            self.clock.addEvaluations(len(designs))
+
+        self.bestLock.acquire()
+        try:
+            for design, cost in zip(designs, costs):
+                self.progress.add(self.bestCost, cost)
+                if cost < self.bestCost:
+                    self.bestCost = cost
+                    self.bestDesign = design.copy()
+                    self.improvements.append((time.time(), cost))
+                    sendDesign(MSG_FOUND_BEST_COST, self.bestCost, self.bestDesign, self.channel)
+            ## FOR
+        finally:
+            self.bestLock.release()
+        return costs
+    ## DEF
+
+    def updateBest(self, bestCost, bestDesign):
+        """Called when another worker found a better design. It joins our population in the next step"""
+        self.bestLock.acquire()
+        if bestCost < self.bestCost:
+            self.bestCost = bestCost
+            self.bestDesign = bestDesign.copy()
+            self.pendingDesign = (bestCost, bestDesign.copy())
+        self.bestLock.release()
+    ## DEF
+
+    def takePendingDesign(self):
+        """Return the (cost, design) from updateBest() that has not been used yet, or None"""
+        self.bestLock.acquire()
+        pending = self.pendingDesign
+        self.pendingDesign = None
+        self.bestLock.release()
+        return pending
+    ## DEF
+
+    def sendCheckpoint(self, elapsed):
+        """Send our best design and the design memo entries that are new since our last checkpoint to the coordinator"""
+        state = {
+            "elapsed":     elapsed,
+            "best_cost":   self.bestCost,
+            "best_design": self.bestDesign,
+            "memo":        checkpoint.getNewMemoEntries(self.costModel.design_memo, self.memoSent),
+        }
+        sendMessage(MSG_CHECKPOINT, (self.worker_id, state), self.channel)
+    ## DEF
+
+    def restoreCheckpoint(self, state):
+        """Continue from the state that an earlier run sent with sendCheckpoint()"""
+        self.elapsed = state.get("elapsed", 0.0)
+        self.costModel.design_memo.update(state["memo"])
+        self.memoSent.update(state["memo"].iterkeys())
+    ## DEF
+
+    def getTimeToNearBest(self):
+        """Return the number of seconds that it took to get within NEAR_BEST_RATIO of our best cost"""
+        if not self.improvements:
+            return None
+        return bbsearch.timeToNearBest(self.improvements) - self.improvements[0][0]
+    ## DEF
+
+    def getStats(self):
+        stats = SearchStats()
+        stats.start_time = self.stats.start_time
+        stats.merge(self.stats)
+        stats.merge(self.costModel.getStats())
+        stats.setGauge("time_to_near_best", self.getTimeToNearBest())
+        return stats
+    ## DEF
+
+    def sendStats(self):
+        sendMessage(MSG_SEARCH_STATS, (self.worker_id, self.getStats().toDICT()), self.channel)
+    ## DEF
+## CLASS
+
+## ==============================================
+## SimulatedAnnealingDesigner
+## ==============================================
+class SimulatedAnnealingDesigner(MetaheuristicDesigner):
+    """
+        Simulated annealing over complete designs. Every step evaluates
+        population_size random neighbors of the current design in parallel
+        and moves to the best one of them if the Metropolis criterion accepts it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        MetaheuristicDesigner.__init__(self, *args, **kwargs)
+        # The initial temperature is relative to the cost of the initial design
+        self.temperature = self.config.getfloat(configutil.SECT_DESIGNER, 'annealing_temperature') * abs(self.init_bestCost)
+        self.cooling = self.config.getfloat(configutil.SECT_DESIGNER, 'annealing_cooling')
+    ## DEF
+
+    def initialize(self):
+        self.current = self.init_bestDesign.copy()
+        self.currentCost = self.init_bestCost
+    ## DEF
+
+    def step(self):
+        pending = self.takePendingDesign()
+        if not pending is None and pending[0] < self.currentCost:
+            self.currentCost, self.current = pending
+
+        neighbors = [self.mutator.mutate(self.current) for i in xrange(self.population_size)]
+        oldBest = self.bestCost
+        costs = self.evaluate(neighbors)
+        cost, idx = min(zip(costs, xrange(len(costs))))
+
+        delta = cost - self.currentCost
+        if delta <= 0 or (self.temperature > 0 and self.rng.random() < math.exp(-delta / self.temperature)):
+            self.current = neighbors[idx]
+            self.currentCost = cost
+            self.stats.incr("meta_accepted")
+        self.temperature *= self.cooling
+        return self.bestCost < oldBest
+    ## DEF
+## CLASS
+
+## ==============================================
+## GeneticDesigner
+## ==============================================
+class GeneticDesigner(MetaheuristicDesigner):
+    """
+        Genetic algorithm over complete designs. The best design of each
+        generation survives as-is. The rest of the next generation is made
+        from parents that win a tournament selection, which are crossed over
+        and then mutated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        MetaheuristicDesigner.__init__(self, *args, **kwargs)
+        self.mutation_rate = self.config.getfloat(configutil.SECT_DESIGNER, 'mutation_rate')
+    ## DEF
+
+    def initialize(self):
+        # Start from random mutations of the initial design
+        designs = [self.mutator.mutate(self.init_bestDesign) for i in xrange(self.population_size - 1)]
+        self.population = [ (self.init_bestCost, self.init_bestDesign.copy()) ]
+        self.population.extend(zip(self.evaluate(designs), designs))
+    ## DEF
+
+    def step(self):
+        oldBest = self.bestCost
+        self.population.sort(key=lambda x: x[0])
+        pending = self.takePendingDesign()
+        if not pending is None:
+            self.population[-1] = pending
+            self.population.sort(key=lambda x: x[0])
+
+        children = [ ]
+        while len(children) < self.population_size - 1:
+            child = self.mutator.crossover(self.__select__()[1], self.__select__()[1])
+            # Always mutate the children of identical parents
+            if self.rng.random() < self.mutation_rate or not child.getDelta(self.population[0][1]):
+                child = self.mutator.mutate(child)
+            children.append(child)
+        ## WHILE
+        self.population = [ self.population[0] ] + zip(self.evaluate(children), children)
+        return self.bestCost < oldBest
+    ## DEF
+
+    def __select__(self):
+        """Tournament selection: the best of TOURNAMENT_SIZE random members of the population"""
+        return min(self.rng.sample(self.population, min(TOURNAMENT_SIZE, len(self.population))), key=lambda x: x[0])
+    ## DEF
+## CLASS
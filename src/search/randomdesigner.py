@@ -23,11 +23,11 @@
 # -----------------------------------------------------------------------
 
 import logging
-import random
 
 # mongodb-d4
 from design import Design
 from abstractdesigner import AbstractDesigner
+from searchclock import createRandom
 
 LOG = logging.getLogger(__name__)
 
@@ -43,7 +43,7 @@ class RandomDesigner(AbstractDesigner):
     def generate(self):
         LOG.info("Generating random design")
         design = Design()
-        rng = random.Random()
+        rng = createRandom(self.config, "random")
         for col_info in self.collections.itervalues():
             design.addCollection(col_info['name'])
 
@@ -56,7 +56,7 @@ class RandomDesigner(AbstractDesigner):
             attrs = [ ]
             chosen_field = None
             while chosen_field is None or str(chosen_field).startswith("#") or str(chosen_field).startswith("_"):
-                chosen_field = random.choice(col_fields)
+                chosen_field = rng.choice(col_fields)
             attrs.append(chosen_field)
             print "field: ", chosen_field
 
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import time
+import random
+import hashlib
+
+from util import configutil
+
+# The units that the search budgets can be measured in
+SEARCH_BUDGETS = [ "seconds", "evaluations" ]
+
+## ==============================================
+## WallClock
+## ==============================================
+class WallClock(object):
+    """Measures the search time limits in seconds"""
+    
+    def time(self):
+        return time.time()
+    ## DEF
+    
+    def cpu(self):
+        """Return the amount of work done so far (used to compare rounds)"""
+        return time.clock()
+    ## DEF
+    
+    def addEvaluations(self, count):
+        pass
+    ## DEF
+## CLASS
+
+## ==============================================
+## EvaluationClock
+## ==============================================
+class EvaluationClock(object):
+    """
+        Measures the search time limits in the number of designs whose cost
+        the search looked up, including the ones that came from the cost
+        model's memo, that were over the change budget of a deployed design
+        or that were computed by a process pool. Unlike seconds,
+        this does not depend on the speed of the machine or its load, so a
+        seeded search always stops at the same point.
+    """
+    
+    def __init__(self, costModel):
+        self.costModel = costModel
+        # The designs that were evaluated without going through our cost model
+        self.poolEvaluations = 0
+    ## DEF
+    
+    def time(self):
+        stats = self.costModel.stats
+        return stats.get("evaluations") + stats.get("memo_hits") + \
+               stats.get("over_change_budget") + self.poolEvaluations
+    ## DEF
+    
+    def cpu(self):
+        return self.time()
+    ## DEF
+    
+    def addEvaluations(self, count):
+        self.poolEvaluations += count
+    ## DEF
+## CLASS
+
+def createClock(config, costModel):
+    """Return the clock that the search budgets of the given config are measured with"""
+    budget = config.get(configutil.SECT_MULTI_SEARCH, 'search_budget')
+    assert budget in SEARCH_BUDGETS, \
+        "Invalid search budget '%s'. Expected one of %s" % (budget, SEARCH_BUDGETS)
+    if budget == "evaluations":
+        return EvaluationClock(costModel)
+    return WallClock()
+## DEF
+
+def getSeed(config, *names):
+    """
+        Return the seed for the random number generator with the given names
+        (e.g., the worker id and what the generator is used for), derived from
+        the search seed of the config. Returns None if the search is not seeded.
+    """
+    seed = config.get(configutil.SECT_MULTI_SEARCH, 'seed') if config else ""
+    if seed is None or str(seed).strip() == "":
+        return None
+    key = ":".join([str(x) for x in (seed,) + names])
+    return int(hashlib.md5(key).hexdigest()[:16], 16)
+## DEF
+
+def createRandom(config, *names):
+    """Return a random number generator seeded with getSeed()"""
+    return random.Random(getSeed(config, *names))
+## DEF
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import math
+import logging
+
+# mongodb-d4
+import catalog
+import workload
+from util import Histogram, constants
+
+# NumPy is optional. Without it we count the nodes in plain Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LOG = logging.getLogger(__name__)
+
+# Constants
+# Maximum number of operations per collection that we sample
+MAX_SCREEN_SAMPLES = 10000
+# A key only dominates another one if it is better by more than this fraction
+SCREEN_TOLERANCE = 0.05
+# With n samples over N nodes the skew is only meaningful if it differs by
+# more than SKEW_NOISE * sqrt(N/n)
+SKEW_NOISE = 2.0
+
+## ==============================================
+## ShardKeyScreener
+## ==============================================
+class ShardKeyScreener(object):
+    """
+        Pre-screens the shard key candidates of each collection before the search.
+        For every candidate we hash the values of the sampled documents and
+        operations onto the nodes the same way as the NodeEstimator and compute:
+            docSkew   - Largest number of documents on a node / the average
+            opSkew    - Largest number of operations on a node / the average
+            messages  - Average number of nodes that an operation is sent to
+            targeted  - Fraction of the operations that only go to one node
+        A key is dropped if another key is at least as good on all of docSkew,
+        opSkew and messages and better on one of them. The skews of small
+        samples are noisy, so they need to differ by more for that.
+    """
+    
+    def __init__(self, collections, sessions, num_nodes, useNumpy=True):
+        self.collections = collections
+        self.num_nodes = num_nodes
+        self.useNumpy = useNumpy and not numpy is None
+        
+        # ColName -> [(OpType, Predicates, Contents)]
+        self.samples = dict([(col_name, [ ]) for col_name in collections])
+        for sess in sessions:
+            for op in sess["operations"]:
+                samples = self.samples.get(op["collection"])
+                if samples is None or len(samples) >= MAX_SCREEN_SAMPLES:
+                    continue
+                if not op["type"] in [constants.OP_TYPE_QUERY, constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT, \
+                                      constants.OP_TYPE_UPDATE, constants.OP_TYPE_DELETE]:
+                    continue
+                samples.append((op["type"], op.get("predicates") or { }, workload.getOpContents(op)))
+            ## FOR
+        ## FOR
+    ## DEF
+    
+    def computeNode(self, value):
+        try:
+            return catalog.hashFieldValues((value,)) % self.num_nodes
+        except TypeError:
+            # Lists and embedded documents
+            return hash(repr(value)) % self.num_nodes
+    ## DEF
+    
+    def getSkew(self, nodeIds, extra=0):
+        """
+            Return the largest count of the given node ids divided by the average.
+            The extra count is added to every node (broadcasts).
+        """
+        if self.useNumpy:
+            counts = numpy.bincount(numpy.array(nodeIds, dtype=numpy.int64), minlength=self.num_nodes) + extra
+            total = counts.sum()
+            return float(counts.max()) * self.num_nodes / total if total else 1.0
+        counts = Histogram()
+        map(counts.put, nodeIds)
+        total = len(nodeIds) + extra * self.num_nodes
+        return float(max(counts.values() or [0]) + extra) * self.num_nodes / total if total else 1.0
+    ## DEF
+    
+    def computeMetrics(self, col_name, key):
+        """Return the dict of metrics for sharding the given collection on the given key"""
+        field = self.collections[col_name]['fields'][key]
+        docValues = [ ]
+        opNodes = [ ]
+        queryValues = [ ]
+        broadcasts = 0
+        messages = 0
+        targeted = 0
+        for op_type, predicates, contents in self.samples[col_name]:
+            pred_type = predicates.get(key)
+            if op_type in [constants.OP_TYPE_INSERT, constants.OP_TYPE_ISERT]:
+                values = [catalog.getFieldValue(key, content) for content in contents]
+                docValues.extend(values)
+            elif pred_type == constants.PRED_TYPE_EQUALITY:
+                values = [catalog.getFieldValue(key, content) for content in contents]
+                queryValues.extend(values)
+            elif pred_type == constants.PRED_TYPE_RANGE:
+                num_touched = max(1, int(math.ceil(field['selectivity'] * self.num_nodes)))
+                messages += num_touched
+                if num_touched == 1: targeted += 1
+                broadcasts += num_touched / float(self.num_nodes)
+                continue
+            else:
+                messages += self.num_nodes
+                broadcasts += 1
+                continue
+            
+            nodes = set(map(self.computeNode, values))
+            opNodes.extend(nodes)
+            messages += len(nodes)
+            if len(nodes) == 1: targeted += 1
+        ## FOR
+        num_ops = len(self.samples[col_name])
+        
+        # Without inserted documents we use the values that the queries look up.
+        # If there are none of those either, then a key with fewer values than
+        # nodes puts everything on that many nodes
+        sample = docValues or queryValues
+        if sample:
+            docSkew = self.getSkew(map(self.computeNode, sample))
+        else:
+            docSkew = max(1.0, self.num_nodes / float(max(1, field['cardinality'])))
+        
+        return {
+            "docSkew":    docSkew,
+            "docSamples": len(sample) or None,
+            "opSkew":     self.getSkew(opNodes, broadcasts) if num_ops else 1.0,
+            "opSamples":  len(opNodes) or None,
+            "messages":   messages / float(num_ops) if num_ops else float(self.num_nodes),
+            "targeted":   targeted / float(num_ops) if num_ops else 0.0,
+        }
+    ## DEF
+    
+    def getTolerance(self, a, b, samples):
+        """Return how much the skews of the given metrics have to differ"""
+        if samples is None:
+            return SCREEN_TOLERANCE
+        num_samples = min([x[samples] or float("inf") for x in (a, b)])
+        return max(SCREEN_TOLERANCE, SKEW_NOISE * math.sqrt(self.num_nodes / float(num_samples)))
+    ## DEF
+    
+    def dominates(self, a, b):
+        """Return True if the metrics a are better than the metrics b"""
+        better = False
+        for metric, samples in [("docSkew", "docSamples"), ("opSkew", "opSamples"), ("messages", None)]:
+            tolerance = self.getTolerance(a, b, samples)
+            if a[metric] > b[metric] * (1 + tolerance):
+                return False
+            if a[metric] < b[metric] * (1 - tolerance):
+                better = True
+        ## FOR
+        return better
+    ## DEF
+    
+    def screen(self, col_name, keys):
+        """
+            Return the list of the given keys that are not dominated by another
+            one and the list of (key, dominatingKey, metrics) that were dropped
+        """
+        if len(keys) < 2 or not self.samples.get(col_name):
+            return keys, [ ]
+        metrics = dict([(key, self.computeMetrics(col_name, key)) for key in keys])
+        kept = [ ]
+        dropped = [ ]
+        for key in keys:
+            dominator = None
+            for other in keys:
+                if other != key and self.dominates(metrics[other], metrics[key]):
+                    dominator = other
+                    break
+            ## FOR
+            if dominator is None:
+                kept.append(key)
+            else:
+                dropped.append((key, dominator, metrics[key]))
+        ## FOR
+        # The tolerance could make every key look dominated by another one
+        if not kept:
+            return keys, [ ]
+        return kept, dropped
+    ## DEF
+## CLASS
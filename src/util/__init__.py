@@ -2,4 +2,5 @@
 
 from constants import *
 from utilmethods import *
-from histogram import Histogram
\ No newline at end of file
+from histogram import Histogram, HeapHistogram
+from searchstats import SearchStats
\ No newline at end of file
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import os
+import logging
+import time
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+LOG = logging.getLogger(__name__)
+
+# Checkpoint File Layout
+# The file is a single pickled dict with the following keys:
+#   version     - CHECKPOINT_VERSION
+#   timestamp   - When the checkpoint was written
+#   elapsed     - Number of seconds that the search has been running for,
+#                 including the time before any earlier resumes
+#   best_cost   - The cost of the best design that any worker found
+#   best_design - The best Design that any worker found
+#   workers     - WorkerId -> the last dict that the worker sent with
+#                 LNSDesigner.sendCheckpoint(), without its "memo":
+#                   relax_ratio, bbsearch_time_out, worker_used_time,
+#                   elapsed_time, timeout, rounds, best_cost, best_design,
+#                   scheduler (the bandit's pulls, rewards and total_pulls,
+#                   or None), random_state (the states of the LNS and the
+#                   BBSearch random generators)
+#                 or with MetaheuristicDesigner.sendCheckpoint():
+#                   elapsed, best_cost, best_design
+#
+# Memo Files
+# The cost model's design memo of each worker is kept in "<path>.memo<WorkerId>"
+# instead, because it can hold a lot of designs. The "memo" of every checkpoint
+# that a worker sends only has the entries (DesignKey -> Cost) that are new since
+# its previous checkpoint, and we append each of them to the file as one more
+# pickled dict. So a checkpoint never rewrites the designs that we already have.
+CHECKPOINT_VERSION = 2
+
+def writeCheckpoint(path, best_cost, best_design, workers, elapsed):
+    """
+        Write the search state out to the given file. We write to a temporary
+        file first and then rename it, so a crash while writing never leaves
+        us without the previous checkpoint.
+    """
+    start = time.time()
+    data = {
+        "version":     CHECKPOINT_VERSION,
+        "timestamp":   start,
+        "elapsed":     elapsed,
+        "best_cost":   best_cost,
+        "best_design": best_design,
+        "workers":     workers,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fd:
+        pickle.dump(data, fd, -1)
+    os.rename(tmp_path, path)
+    LOG.info("Wrote checkpoint with best cost %s for %d workers to '%s' in %.2f seconds", \
+             best_cost, len(workers), path, time.time() - start)
+## DEF
+
+def loadCheckpoint(path):
+    """Load the search state dict from the given checkpoint file"""
+    with open(path, "rb") as fd:
+        data = pickle.load(fd)
+    if not isinstance(data, dict) or data.get("version", None) != CHECKPOINT_VERSION:
+        raise Exception("Unsupported checkpoint version '%s' in '%s'" % \
+                        (data.get("version", None) if isinstance(data, dict) else None, path))
+    LOG.info("Loaded checkpoint with best cost %s for %d workers from '%s'", \
+             data["best_cost"], len(data["workers"]), path)
+    return data
+## DEF
+
+def getMemoPath(path, worker_id):
+    """Return the path of the design memo file of the given worker"""
+    return "%s.memo%s" % (path, worker_id)
+## DEF
+
+def appendMemo(path, worker_id, memo):
+    """Add the given design memo entries to the memo file of the given worker"""
+    with open(getMemoPath(path, worker_id), "ab") as fd:
+        pickle.dump(memo, fd, -1)
+## DEF
+
+def loadMemo(path, worker_id):
+    """Return the design memo of the given worker that is stored next to the checkpoint file"""
+    memo = { }
+    memo_path = getMemoPath(path, worker_id)
+    if not os.path.exists(memo_path):
+        return memo
+    with open(memo_path, "rb") as fd:
+        while True:
+            try:
+                memo.update(pickle.load(fd))
+            except EOFError:
+                break
+            except Exception, ex:
+                # We crashed in the middle of appending to it
+                LOG.warn("Ignoring the end of the design memo file '%s': %s", memo_path, ex)
+                break
+        ## WHILE
+    return memo
+## DEF
+
+def removeMemos(path):
+    """Remove the design memo files of an earlier search with the given checkpoint file"""
+    dir_name, prefix = os.path.split(os.path.abspath(getMemoPath(path, "")))
+    for name in os.listdir(dir_name):
+        if name.startswith(prefix):
+            os.remove(os.path.join(dir_name, name))
+    ## FOR
+## DEF
+
+def getNewMemoEntries(memo, sent):
+    """
+        Return the entries of the given design memo whose keys are not in the
+        set of keys that were already sent, and add their keys to that set
+    """
+    entries = dict([(key, cost) for key, cost in memo.iteritems() if not key in sent])
+    sent.update(entries.iterkeys())
+    return entries
+## DEF
@@ -45,6 +45,20 @@ constants.METADATA_DB_NAME),
         ("enable_denormalization", "Enable the designer to look for denormalization candidates.", True),
         ("enable_local_search_inc", "Enable increasing local search parameters after a restart", True),
         ("sample_rate", "Integer Percentage of dataset values to sample while gathering statistics.", 100),
+        ("search_engine", "The search algorithm that LNS uses to explore each neighborhood: 'bbsearch' (depth-first branch-and-bound) or 'bestfirst' (best-first search on the partial design costs).", "bbsearch"),
+        ("beam_width", "The maximum number of open nodes that the 'bestfirst' search engine keeps (0 means unlimited).", 0),
+        ("prune_index_candidates", "Only generate the index candidates whose key orderings match the predicates, sort fields and projections of the queries in the workload.", True),
+        ("search_strategy", "The search algorithm that each worker runs: 'lns' (large-neighborhood search), 'annealing' (simulated annealing) or 'genetic' (genetic algorithm).", "lns"),
+        ("population_size", "Number of designs that the 'annealing' and 'genetic' strategies evaluate in each step.", 16),
+        ("eval_processes", "Number of local processes that evaluate the designs of each 'annealing' or 'genetic' step or each batch of sibling nodes in BBSearch in parallel (0 means one per CPU).", 0),
+        ("sibling_batch_size", "Number of sibling nodes that BBSearch evaluates together with the eval_processes before it explores them in the order of their costs (0 to evaluate them one at a time).", 0),
+        ("annealing_temperature", "Initial temperature of the 'annealing' strategy as a fraction of the initial design's cost.", 0.05),
+        ("annealing_cooling", "Factor by which the 'annealing' strategy lowers the temperature after each step.", 0.95),
+        ("mutation_rate", "Probability that the 'genetic' strategy mutates a child after the crossover.", 0.3),
+        ("screen_shard_keys", "Drop the shard key candidates whose predicted document and operation distribution and number of messages for the workload are all worse than those of another candidate before the search.", True),
+        ("initial_designer", "The algorithm that computes the initial design: 'greedy' (the most frequently used keys) or 'knapsack' (shard keys by estimated messages and the indexes that save the most pages per byte of node memory).", "greedy"),
+        ("initial_min_support", "Fraction of a collection's operations that a set of keys has to be referenced in for the 'greedy' initial designer to consider it.", 0.01),
+        ("child_ordering", "The order in which the search engines try the collections and key candidates: 'random' or 'workload' (by workload percentage and predicted benefit).", "random"),
     ],
     
     # Cost Model Configuration
@@ -55,6 +69,14 @@ constants.METADATA_DB_NAME),
         ("time_intervals", "Number of intervals over which to examine the workload skew", constants.DEFAULT_TIME_INTERVALS),
         ("address_size", "Size of an address for an index node in bytes", constants.DEFAULT_ADDRESS_SIZE),
         ("window_size", "Size of the window used by the lru buffer", constants.WINDOW_SIZE),
+        ("stream_workload", "Stream the workload from the snapshot file instead of loading it into memory (requires --snapshot).", False),
+        ("stream_memory", "The amount of memory (MB) used to cache the decoded workload chunks when streaming.", 256),
+        ("design_memo_size", "Maximum number of evaluated designs whose costs are remembered so that they are not computed again (0 to disable).", 100000),
+        ("migration_shard_key", "Cost of changing the shard key of a collection when re-optimizing the design given with --deployed-design, as a fraction of the cost of rewriting the whole database. It is scaled by the collection's share of the database size (doc_count * avg_doc_size).", 0.05),
+        ("migration_add_index", "Cost of building a new index when re-optimizing a deployed design (scaled like migration_shard_key).", 0.02),
+        ("migration_drop_index", "Cost of dropping an index when re-optimizing a deployed design (scaled like migration_shard_key).", 0.001),
+        ("migration_denormalization", "Cost of embedding a collection in another one or taking it out when re-optimizing a deployed design (scaled by the size of both collections).", 0.05),
+        ("change_budget", "Maximum number of migration steps (changed shard keys, added or dropped indexes and denormalization changes) from the deployed design (-1 for no limit).", -1),
     ],
     
     # MySQL Conversion Configuration
@@ -69,12 +91,30 @@ constants.METADATA_DB_NAME),
     # Multi-threaded search configuration
     SECT_MULTI_SEARCH: [
         ("num_clients", "number of clients the LNS/BB search will be run on", 1),
+        ("hosts", "comma-separated list of host[:num_workers] entries to run the workers on over ssh (num_workers defaults to num_clients). The workload snapshot is copied to every host once. A 'popen' host runs its workers on this machine as if it were a remote host (for testing). Empty to run num_clients workers on this machine", ""),
+        ("remote_path", "path of the src directory of mongodb-d4 on the hosts (empty for the same path as on this machine)", ""),
+        ("remote_python", "Python interpreter on the hosts (empty for the default)", ""),
+        ("channel_mode", "how the workers on this machine are started: 'execnet' starts a new interpreter for every worker, which loads the workload itself; 'fork' loads the workload and the initial design once and forks the workers from this process so that they share them copy-on-write (not on Windows). Ignored with hosts", "execnet"),
         ("time_for_lnssearch", "seconds that the lns search will run", 60*60), # LNS search runs up to one hour by default
         ("patient_time", "seconds within which if a better design is not found, we quit lns search", 30*60), # We wait for half an hour 
         ("init_bbsearch_time", "time bbsearch will run at the first time", 10*60),
         ("init_relax_ratio", "initial relax ratio", 0.25),
         ("max_relax_ratio", "maximum relax ratio", 0.5),
-        ("relax_ratio_step", "the increase step of relax ratio", 0.1)
+        ("relax_ratio_step", "the increase step of relax ratio", 0.1),
+        ("restart_on_update", "abandon the current BB search when another worker finds a better design instead of only lowering its bound", False),
+        ("partition_collections", "split up the search space between the workers by the shard keys of this many collections with the largest share of the workload. Idle workers take partitions from busy ones (0 to disable)", 0),
+        ("checkpoint_file", "path of the file that the search state is periodically written to so that it can be continued with --resume (empty to disable)", ""),
+        ("checkpoint_interval", "seconds between the search checkpoints", 5*60),
+        ("lns_scheduler", "how LNS picks the relax ratio and the relaxed collections of each round: 'fixed' (grow the ratio and the time limit after every round) or 'adaptive' (bandit over the relax ratios and collection selection strategies that rewards the improvement per CPU-second)", "fixed"),
+        ("seed", "seed of the random number generators of the search. Every worker derives its own seeds from it, and the workers do not share their designs or partitions, so that the same inputs always explore the same designs (empty for an unseeded search)", ""),
+        ("search_budget", "unit of time_for_lnssearch, patient_time and init_bbsearch_time: 'seconds' or 'evaluations' (the number of designs whose cost the search looked up, so that a seeded search always stops at the same point)", "seconds"),
+        ("share_workload", "load the catalog and the workload from MongoDB only once and let the workers load them from a temporary snapshot file instead of querying MongoDB themselves (ignored with --snapshot). Set costmodel.stream_workload too so that the workers share the memory-mapped file and only decode what fits in costmodel.stream_memory", True),
+        ("snapshot_dir", "directory of the temporary workload snapshot for share_workload (empty for the system default)", ""),
+        ("progress_interval", "seconds between the reports of the number of designs that each worker evaluated", 1.0),
+        ("stats_file", "path of the JSON file that the aggregated search profiling counters are written to (empty to only log them)", ""),
+        ("stats_interval", "seconds between the profiling counter reports that the workers send to the coordinator", 60),
+        ("telemetry", "file, unix socket ('unix:PATH') or TCP socket ('tcp:HOST:PORT') that the coordinator writes the progress of the search to as JSON lines (see exps/tools/telemetry-viewer.py). The prune rates are updated every stats_interval. Empty to disable", ""),
+        ("telemetry_interval", "minimum seconds between the progress records in the telemetry", 1.0),
     ],
     
     # Replay configuration
@@ -158,3 +198,40 @@ def setDefaultValues(config):
     return (config)
 ## DEF
     
+
+## ==============================================
+## getBoolean
+## ==============================================
+def getBoolean(config, sect, key):
+    """
+        ConfigParser.getboolean() that also works for options that are not in the
+        config file, since setDefaultValues() stores their defaults as bools
+    """
+    value = config.get(sect, key)
+    if isinstance(value, bool):
+        return value
+    return config.getboolean(sect, key)
+## DEF
+
+## ==============================================
+## getCostModelConfig
+## ==============================================
+def getCostModelConfig(config):
+    """Return the parameter dict that CostModel needs from the given SafeConfigParser"""
+    return {
+        'weight_network': config.getfloat(SECT_COSTMODEL, 'weight_network'),
+        'weight_disk':    config.getfloat(SECT_COSTMODEL, 'weight_disk'),
+        'weight_skew':    config.getfloat(SECT_COSTMODEL, 'weight_skew'),
+        'nodes':          config.getint(SECT_CLUSTER, 'nodes'),
+        'max_memory':     config.getint(SECT_CLUSTER, 'node_memory'),
+        'skew_intervals': config.getint(SECT_COSTMODEL, 'time_intervals'),
+        'address_size':   config.getint(SECT_COSTMODEL, 'address_size'),
+        'window_size':    config.getint(SECT_COSTMODEL, 'window_size'),
+        'design_memo_size': config.getint(SECT_COSTMODEL, 'design_memo_size'),
+        'migration_shard_key':       config.getfloat(SECT_COSTMODEL, 'migration_shard_key'),
+        'migration_add_index':       config.getfloat(SECT_COSTMODEL, 'migration_add_index'),
+        'migration_drop_index':      config.getfloat(SECT_COSTMODEL, 'migration_drop_index'),
+        'migration_denormalization': config.getfloat(SECT_COSTMODEL, 'migration_denormalization'),
+        'change_budget':             config.getint(SECT_COSTMODEL, 'change_budget'),
+    }
+## DEF
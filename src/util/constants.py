@@ -106,6 +106,10 @@ MIN_SELECTIVITY = 0.25
 
 MAX_INDEX_SIZE = 10
 
+# The equality fields of a query are tried in every order when generating
+# the index candidates from the workload, up to this many of them
+MAX_INDEX_EQ_PERMUTATIONS = 3
+
 EXAUSTED_SEARCH_BAR = 4
 
 NUMBER_OF_BACKUP_KEYS = 2
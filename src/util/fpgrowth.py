@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+
+import math
+
+from histogram import Histogram, HeapHistogram
+
+## ==============================================
+## FPNode
+## ==============================================
+class FPNode(object):
+    """A node in the prefix tree of the FP-growth algorithm"""
+    __slots__ = ('item', 'count', 'parent', 'children')
+    
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = { }
+    ## DEF
+## CLASS
+
+## ==============================================
+## FPGrowth
+## ==============================================
+class FPGrowth(object):
+    """
+        Frequent itemset miner (FP-growth). The transactions are added one at a
+        time with add() and mine() returns a HeapHistogram of all of the
+        itemsets that occur in at least min_support of them, along with the
+        number of transactions that contain each itemset. This is the same as
+        adding every combination of the items of each transaction into a
+        Histogram and dropping the infrequent ones, but it never builds the
+        infrequent combinations.
+        
+        Identical transactions are only stored once, so the memory needed
+        depends on the number of distinct transactions and not on the size of
+        the workload.
+    """
+    
+    def __init__(self, min_support=0.0, max_size=None):
+        """
+            min_support is either the fraction of the transactions (less than 1)
+            or the number of transactions that an itemset has to occur in.
+            max_size is the largest itemset that we will return.
+        """
+        self.min_support = min_support
+        self.max_size = max_size
+        self.transactions = Histogram()
+        self.num_transactions = 0
+    ## DEF
+    
+    def add(self, items, count=1):
+        """Add a transaction with the given items"""
+        items = tuple(sorted(set(items)))
+        if items:
+            self.transactions.put(items, count)
+        self.num_transactions += count
+    ## DEF
+    
+    def getMinCount(self):
+        """Return the number of transactions that an itemset has to occur in"""
+        if self.min_support < 1:
+            return max(1, int(math.ceil(round(self.min_support * self.num_transactions, 6))))
+        return int(self.min_support)
+    ## DEF
+    
+    def mine(self):
+        itemsets = HeapHistogram()
+        self.__mine__(self.transactions.items(), ( ), self.getMinCount(), itemsets)
+        return (itemsets)
+    ## DEF
+    
+    def __mine__(self, transactions, suffix, min_count, itemsets):
+        # Count the items and drop the ones that are not frequent
+        counts = Histogram()
+        for items, count in transactions:
+            for item in items:
+                counts.put(item, count)
+        ## FOR
+        frequent = dict([(item, cnt) for item, cnt in counts.iteritems() if cnt >= min_count])
+        if not frequent:
+            return
+        
+        # Build the prefix tree with the most frequent items closest to the root
+        root = FPNode(None, None)
+        header = dict([(item, [ ]) for item in frequent])
+        for items, count in transactions:
+            node = root
+            for item in sorted([x for x in items if x in frequent], key=lambda x: (-frequent[x], x)):
+                child = node.children.get(item)
+                if child is None:
+                    child = FPNode(item, node)
+                    node.children[item] = child
+                    header[item].append(child)
+                child.count += count
+                node = child
+            ## FOR
+        ## FOR
+        
+        # Every frequent item extends the suffix. Then we mine the paths that
+        # lead to that item for longer itemsets
+        for item in sorted(frequent, key=lambda x: (frequent[x], x)):
+            itemset = suffix + (item,)
+            itemsets[tuple(sorted(itemset))] = frequent[item]
+            if not self.max_size is None and len(itemset) >= self.max_size:
+                continue
+            
+            paths = [ ]
+            for node in header[item]:
+                path = [ ]
+                parent = node.parent
+                while not parent.item is None:
+                    path.append(parent.item)
+                    parent = parent.parent
+                if path:
+                    paths.append((path, node.count))
+            ## FOR
+            self.__mine__(paths, itemset, min_count, itemsets)
+        ## FOR
+    ## DEF
+## CLASS
@@ -23,6 +23,7 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 # -----------------------------------------------------------------------
 import math
+import heapq
 
 class Histogram(dict):
     def __init__(self, *args, **kw):
@@ -151,4 +152,73 @@ class Histogram(dict):
         if not len(self): ret += "<EMPTY>"
 
         return ret
-## CLASS
\ No newline at end of file
+## CLASS
+
+## ==============================================
+## HeapHistogram
+## ==============================================
+class HeapHistogram(Histogram):
+    """
+        Histogram that keeps its counts in a max-heap so that getMaxCountKeys()
+        does not have to scan all of the keys. Entries whose count changed or
+        whose key was removed are only dropped from the heap when they reach
+        the top (or when the heap gets too big).
+    """
+    def __init__(self, *args, **kw):
+        super(HeapHistogram, self).__init__()
+        self.heap = [ ]
+        self.update(*args, **kw)
+    # DEF
+    def __setitem__(self, x, cnt):
+        super(HeapHistogram, self).__setitem__(x, cnt)
+        heapq.heappush(self.heap, (-cnt, x))
+        # Get rid of the stale entries once they make up most of the heap
+        if len(self.heap) > 2 * len(self) + 64:
+            self.heap = [(-c, k) for k, c in self.iteritems()]
+            heapq.heapify(self.heap)
+    # DEF
+    def update(self, *args, **kw):
+        for key, cnt in dict(*args, **kw).iteritems():
+            self[key] = cnt
+    # DEF
+    def setdefault(self, x, cnt=None):
+        if not x in self:
+            self[x] = cnt
+        return self[x]
+    # DEF
+    def clear(self):
+        super(HeapHistogram, self).clear()
+        self.heap = [ ]
+    # DEF
+    def __reduce__(self):
+        return (HeapHistogram, (dict(self),))
+    # DEF
+    
+    def __isStale__(self, entry):
+        cnt, key = entry
+        return not key in self or self[key] != -cnt
+    # DEF
+    
+    def getMaxCount(self):
+        """Return the largest count in the histogram (None if it is empty)"""
+        while self.heap and self.__isStale__(self.heap[0]):
+            heapq.heappop(self.heap)
+        return -self.heap[0][0] if self.heap else None
+    # DEF
+    
+    def getMaxCountKeys(self):
+        self.max_cnt = self.getMaxCount()
+        self.max_keys = [ ]
+        # Pop all of the keys with the largest count and put them back
+        top = [ ]
+        while self.heap and -self.heap[0][0] == self.max_cnt:
+            entry = heapq.heappop(self.heap)
+            # The same count might have been set more than once for a key
+            if not self.__isStale__(entry) and not entry in top:
+                top.append(entry)
+                self.max_keys.append(entry[1])
+        ## WHILE
+        map(lambda entry: heapq.heappush(self.heap, entry), top)
+        return self.max_keys
+    # DEF
+## CLASS
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import json
+import time
+
+# Pairs of (hits, misses) counters that we will compute a hit rate for
+HIT_RATE_COUNTERS = [
+    ("lru", "lru_hits", "lru_misses"),
+    ("op_nodeIds", "cache_op_nodeIds_hits", "cache_op_nodeIds_misses"),
+    ("best_index", "cache_best_index_hits", "cache_best_index_misses"),
+    ("design_memo", "memo_hits", "memo_misses"),
+]
+
+# The cost model timers that we report the split of the evaluation time for
+TIME_SPLIT_TIMERS = [ "combiner", "disk", "network", "skew" ]
+
+## ==============================================
+## SearchStats
+## ==============================================
+class SearchStats(object):
+    """
+        Lightweight profiling counters and timers for the cost model and
+        the search algorithms. Everything is kept in flat dicts so that
+        they are cheap to update, pickle and merge across workers.
+        Gauges are values that are not summed up when they are merged
+        (we keep the largest one instead).
+    """
+
+    def __init__(self):
+        self.start_time = time.time()
+        # CounterName -> Integer
+        self.counters = { }
+        # TimerName -> Seconds
+        self.timers = { }
+        # GaugeName -> Value
+        self.gauges = { }
+    ## DEF
+
+    def incr(self, name, delta=1):
+        self.counters[name] = self.counters.get(name, 0) + delta
+    ## DEF
+
+    def addTime(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+    ## DEF
+
+    def setGauge(self, name, value):
+        self.gauges[name] = value
+    ## DEF
+
+    def get(self, name):
+        return self.counters.get(name, 0)
+    ## DEF
+
+    def getElapsedTime(self):
+        return time.time() - self.start_time
+    ## DEF
+
+    def reset(self):
+        self.start_time = time.time()
+        self.counters.clear()
+        self.timers.clear()
+        self.gauges.clear()
+    ## DEF
+
+    def merge(self, other):
+        """Add all of the counters and timers of the other SearchStats (or its dict) into this one"""
+        if isinstance(other, SearchStats):
+            other = other.toDICT()
+        for name, value in other.get("counters", { }).iteritems():
+            self.incr(name, value)
+        for name, value in other.get("timers", { }).iteritems():
+            self.addTime(name, value)
+        for name, value in other.get("gauges", { }).iteritems():
+            if value is None: continue
+            self.gauges[name] = max(self.gauges.get(name, value), value)
+        return self
+    ## DEF
+
+    def toDICT(self, elapsed=None):
+        """
+            Return a dict with the raw counters and timers and the derived rates.
+            If elapsed is not given, then the rates are based on the wall-clock
+            time since this object was created.
+        """
+        if elapsed is None:
+            elapsed = self.getElapsedTime()
+        ret = {
+            "elapsed":  elapsed,
+            "counters": dict(self.counters),
+            "timers":   dict(self.timers),
+            "gauges":   dict(self.gauges),
+            "hit_rates": { },
+        }
+        evaluations = self.counters.get("evaluations", 0)
+        ret["evaluations_per_sec"] = evaluations / float(elapsed) if elapsed > 0 else 0.0
+
+        total_time = sum([self.timers.get(name, 0.0) for name in TIME_SPLIT_TIMERS])
+        ret["time_split"] = dict([(name, (self.timers.get(name, 0.0) / total_time) if total_time else 0.0) \
+                                  for name in TIME_SPLIT_TIMERS])
+
+        for name, hits, misses in HIT_RATE_COUNTERS:
+            total = self.counters.get(hits, 0) + self.counters.get(misses, 0)
+            ret["hit_rates"][name] = (self.counters.get(hits, 0) / float(total)) if total else None
+        ## FOR
+        return ret
+    ## DEF
+
+    def toJSON(self, elapsed=None):
+        return json.dumps(self.toDICT(elapsed), sort_keys=True, indent=4)
+    ## DEF
+
+    def __str__(self):
+        return self.toJSON()
+    ## DEF
+## CLASS
@@ -6,7 +6,12 @@ basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../../libs"))
 
 # Mongokit Objects
-from session import Session
+# These are only needed when we are talking to MongoDB. The cost model and
+# the search can run without mongokit/pymongo (e.g., under PyPy from a snapshot)
+try:
+    from session import Session
+except ImportError:
+    Session = None
 
 # workload combiner
 from workloadcombiner import WorkloadCombiner
@@ -14,4 +19,7 @@ from workloadcombiner import WorkloadCombiner
 from ophasher import OpHasher
 
 from utilmethods import *
-del utilmethods
\ No newline at end of file
+del utilmethods
+
+# Workload Snapshots
+from snapshot import SnapshotCollection, SnapshotStream, exportSnapshot, loadSnapshot
\ No newline at end of file
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------
+# Copyright (C) 2012 by Brown University
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+# -----------------------------------------------------------------------
+import marshal
+import mmap
+import logging
+import struct
+import time
+from collections import OrderedDict
+from itertools import izip
+
+LOG = logging.getLogger(__name__)
+
+# Snapshot File Layout
+# The file is a sequence of marshal frames. The first frame is a header dict
+# with the catalog collections and the names of the fields of the compiled
+# sessions and operations. Every frame after that is a list of up to
+# 'chunk_size' compiled sessions. A compiled session is a tuple of the values
+# of SESSION_FIELDS followed by a list of compiled operations, and a compiled
+# operation is a tuple of the values of OP_FIELDS.
+# The last frame is a list of the (offset, length) of every chunk frame and the
+# file ends with the offset of that index frame packed as TRAILER_FORMAT.
+SNAPSHOT_VERSION = 3
+DEFAULT_CHUNK_SIZE = 1000
+TRAILER_FORMAT = "<Q"
+
+# Rough ratio between the size of a decoded chunk in memory and the size of its
+# marshal frame. This is used to keep SnapshotStream within its memory budget
+DECODED_SIZE_FACTOR = 8
+
+# The session and operation attributes that the cost model and the search use.
+# Everything else (e.g., the response contents) is not written to the snapshot
+SESSION_FIELDS = [
+    "session_id",
+    "start_time",
+    "end_time",
+]
+OP_FIELDS = [
+    "collection",
+    "type",
+    "query_id",
+    "query_hash",
+    "query_content",
+    "query_fields",
+    "query_limit",
+    "query_aggregate",
+    "query_time",
+    "query_size",
+    "predicates",
+    "update_multi",
+    "update_upsert",
+    "resp_time",
+    "resp_size",
+]
+
+# The types that marshal can write out as-is
+MARSHAL_TYPES = (type(None), bool, int, long, float, str, unicode)
+
+# Strings up to this length are interned so that marshal only writes them
+# once per frame and all of the copies share the same object when loaded
+INTERN_MAX_LEN = 32
+
+## ==============================================
+## SnapshotCollection
+## ==============================================
+class SnapshotCollection(dict):
+    """
+        Plain dict replacement for catalog.Collection that is used when the
+        collections are loaded from a snapshot instead of from MongoDB.
+        It only provides the methods that the cost model and the search need.
+    """
+
+    def getField(self, f_name, fields=None):
+        if not fields: fields = self['fields']
+
+        # If the field name has a dot in it, then we will want
+        # to fix the prefix and then traverse further into the fields
+        splits = f_name.split(".")
+        if not splits[0] in fields:
+            return None
+        elif len(splits) > 1:
+            return self.getField(f_name[len(splits[0])+1:], fields[splits[0]]['fields'])
+        return fields[f_name]
+    ## DEF
+## CLASS
+
+## ==============================================
+## EXPORT
+## ==============================================
+
+def toMarshal(value, key=False):
+    """
+        Convert the given catalog or workload object into plain dicts, lists and
+        scalars that can be written with marshal. The mongokit Documents are dict
+        subclasses, so they have to be copied. ASCII unicode strings become
+        str objects (they have the same hash and compare equal) so that the
+        dict keys and short values can be interned. Anything that marshal does
+        not know how to handle (e.g., ObjectIds) is converted into a string.
+    """
+    if isinstance(value, basestring):
+        if isinstance(value, unicode):
+            try:
+                value = value.encode("ascii")
+            except UnicodeEncodeError:
+                return value
+        if key or len(value) <= INTERN_MAX_LEN:
+            value = intern(value)
+        return value
+    elif isinstance(value, dict):
+        return dict([(toMarshal(k, True), toMarshal(v)) for k, v in value.iteritems()])
+    elif isinstance(value, list):
+        return [toMarshal(v) for v in value]
+    elif isinstance(value, tuple):
+        return tuple([toMarshal(v) for v in value])
+    elif isinstance(value, MARSHAL_TYPES):
+        return value
+    return str(value)
+## DEF
+
+def compileSession(sess):
+    """Convert a workload session into the tuple format that is stored in the snapshot"""
+    ops = [tuple([toMarshal(op.get(f, None)) for f in OP_FIELDS]) for op in sess["operations"]]
+    return tuple([toMarshal(sess.get(f, None)) for f in SESSION_FIELDS]) + (ops,)
+## DEF
+
+def exportSnapshot(path, collections, workload, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write the catalog collections and the workload sessions out to the given file"""
+    start_times = [sess["start_time"] for sess in workload if not sess.get("start_time", None) is None]
+    end_times = [sess["end_time"] for sess in workload if not sess.get("end_time", None) is None]
+    header = {
+        "version":        SNAPSHOT_VERSION,
+        "collections":    dict([(toMarshal(col_name, True), toMarshal(col_info)) \
+                                for col_name, col_info in collections.iteritems()]),
+        "session_fields": SESSION_FIELDS,
+        "op_fields":      OP_FIELDS,
+        "chunk_size":     chunk_size,
+        "num_sessions":   len(workload),
+        "num_ops":        sum([len(sess["operations"]) for sess in workload]),
+        "start_time":     min(start_times) if start_times else None,
+        "end_time":       max(end_times) if end_times else None,
+    }
+    with open(path, "wb") as fd:
+        marshal.dump(header, fd, 2)
+        chunks = [ ]
+        for i in xrange(0, len(workload), chunk_size):
+            frame = marshal.dumps(map(compileSession, workload[i:i+chunk_size]), 2)
+            chunks.append((fd.tell(), len(frame)))
+            fd.write(frame)
+        ## FOR
+        index_offset = fd.tell()
+        marshal.dump(chunks, fd, 2)
+        fd.write(struct.pack(TRAILER_FORMAT, index_offset))
+    ## WITH
+    LOG.info("Wrote snapshot with %d collections, %d sessions and %d operations to '%s'", \
+             len(collections), header["num_sessions"], header["num_ops"], path)
+## DEF
+
+## ==============================================
+## LOAD
+## ==============================================
+
+def readHeader(fd):
+    """Read the header frame from the given snapshot file handle"""
+    header = marshal.load(fd)
+    if not isinstance(header, dict) or header.get("version", None) != SNAPSHOT_VERSION:
+        raise Exception("Unsupported snapshot version '%s' in '%s'" % \
+                        (header.get("version", None) if isinstance(header, dict) else None, fd.name))
+    header["collections"] = dict([(col_name, SnapshotCollection(col_info)) \
+                                  for col_name, col_info in header["collections"].iteritems()])
+    return header
+## DEF
+
+def decodeChunk(chunk, header):
+    """Convert a list of compiled sessions back into session dicts"""
+    session_fields = header["session_fields"]
+    op_fields = header["op_fields"]
+    sessions = [ ]
+    for compiled in chunk:
+        sess = dict(izip(session_fields, compiled))
+        sess["operations"] = [dict(izip(op_fields, op)) for op in compiled[-1]]
+        sessions.append(sess)
+    ## FOR
+    return sessions
+## DEF
+
+def iterSessions(fd, header):
+    """Generator for the sessions in the given snapshot file handle after its header"""
+    for i in xrange(0, header["num_sessions"], header["chunk_size"]):
+        for sess in decodeChunk(marshal.load(fd), header):
+            yield sess
+    ## FOR
+## DEF
+
+def loadSnapshot(path, sess_limit=None, op_limit=None):
+    """
+        Load the catalog collections and the workload sessions from the given snapshot
+        file. This does not need mongokit or pymongo, so it can be used to run the
+        cost model and the search without a MongoDB connection (or under PyPy).
+        The sess_limit and op_limit parameters are the same as in Designer.loadWorkload()
+        Returns a tuple of (collections, workload)
+    """
+    start = time.time()
+    workload = [ ]
+    op_ctr = 0
+    with open(path, "rb") as fd:
+        header = readHeader(fd)
+        for sess in iterSessions(fd, header):
+            if not sess_limit is None and len(workload) >= sess_limit:
+                break
+            if not op_limit is None and op_ctr >= op_limit:
+                break
+            workload.append(sess)
+            op_ctr += len(sess["operations"])
+        ## FOR
+    ## WITH
+    LOG.info("Loaded snapshot with %d collections, %d sessions and %d operations from '%s' in %.2f seconds", \
+             len(header["collections"]), len(workload), op_ctr, path, time.time() - start)
+    return header["collections"], workload
+## DEF
+
+## ==============================================
+## SnapshotStream
+## ==============================================
+class SnapshotStream(object):
+    """
+        Read-only workload that streams the sessions out of a memory-mapped
+        snapshot file instead of keeping all of them in memory. The decoded
+        chunks are kept in an LRU cache that is bounded by the memory budget,
+        so if the entire workload fits then it is only decoded once.
+        The cost model checks the isStreaming flag to switch off everything
+        that would keep a reference to every operation.
+    """
+    isStreaming = True
+
+    def __init__(self, path, memory_budget):
+        self.path = path
+        # Bytes
+        self.memory_budget = memory_budget
+
+        self.fd = open(path, "rb")
+        self.header = readHeader(self.fd)
+        self.collections = self.header["collections"]
+        self.num_sessions = self.header["num_sessions"]
+        self.num_ops = self.header["num_ops"]
+        self.start_time = self.header["start_time"]
+        self.end_time = self.header["end_time"]
+
+        self.mm = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ)
+        trailer_size = struct.calcsize(TRAILER_FORMAT)
+        index_offset = struct.unpack(TRAILER_FORMAT, self.mm[-trailer_size:])[0]
+        self.chunks = marshal.loads(self.mm[index_offset:-trailer_size])
+
+        # ChunkIdx -> (EstimatedSize, [Sessions])
+        self.cache = OrderedDict()
+        self.cache_size = 0
+        self.decoded = 0
+
+        LOG.info("Streaming %d sessions with %d operations in %d chunks from '%s' [budget=%.1fMB]", \
+                 self.num_sessions, self.num_ops, len(self.chunks), path, memory_budget / (1024.0 * 1024.0))
+    ## DEF
+
+    def __len__(self):
+        return self.num_sessions
+    ## DEF
+
+    def __iter__(self):
+        for chunk_idx in xrange(len(self.chunks)):
+            for sess in self.getChunk(chunk_idx):
+                yield sess
+        ## FOR
+    ## DEF
+
+    def getChunk(self, chunk_idx):
+        """Return the list of sessions in the given chunk"""
+        entry = self.cache.pop(chunk_idx, None)
+        if entry is None:
+            offset, length = self.chunks[chunk_idx]
+            entry = (length * DECODED_SIZE_FACTOR, decodeChunk(marshal.loads(self.mm[offset:offset+length]), self.header))
+            self.decoded += 1
+            self.cache_size += entry[0]
+            while self.cache and self.cache_size > self.memory_budget:
+                self.cache_size -= self.cache.popitem(last=False)[1][0]
+        # Only keep it if it fits on its own
+        if entry[0] <= self.memory_budget:
+            self.cache[chunk_idx] = entry
+        else:
+            self.cache_size -= entry[0]
+        return entry[1]
+    ## DEF
+
+    def close(self):
+        self.cache.clear()
+        self.mm.close()
+        self.fd.close()
+    ## DEF
+## CLASS
@@ -84,16 +84,18 @@ class WorkloadCombiner:
             
         if not hasDenormCol:
             return None
+
+        # We can't copy a workload that is streamed from disk, so we will
+        # combine each session as it is read instead
+        if getattr(self.workload, "isStreaming", False):
+            self.lastDesign = design.copy()
+            return CombinedWorkload(self, self.getCombiningOrder(design))
         
         # Here we really need to prepare the workload for use
         workload = self.prepareWorkload()
         
-        collectionsInProperOrder = self.__GetCollectionsInProperOder__(design)
-
-        for col_name in collectionsInProperOrder:
-            parent_col = design.getDenormalizationParent(col_name)
-            if parent_col:
-                self.__combine_queries__(col_name, parent_col)
+        for col_name, parent_col in self.getCombiningOrder(design):
+            self.__combine_queries__(col_name, parent_col)
 
         self.lastDesign = design.copy()
         
@@ -105,49 +107,84 @@ class WorkloadCombiner:
         return workload
     ## DEF
         
+    def getCombiningOrder(self, design):
+        """Return the list of (col_name, parent_col) pairs in the order that they must be combined"""
+        pairs = [ ]
+        for col_name in self.__GetCollectionsInProperOder__(design):
+            parent_col = design.getDenormalizationParent(col_name)
+            if parent_col:
+                pairs.append((col_name, parent_col))
+        ## FOR
+        return pairs
+    ## DEF
+
+    def combineSession(self, sess, pairs):
+        """
+            Return a combined copy of the given session for the (col_name, parent_col)
+            pairs from getCombiningOrder(). If the session does not touch any of the
+            embedded collections, then the original session is returned as-is.
+        """
+        cols = set([op["collection"] for op in sess["operations"]])
+        copied = False
+        for col, parent_col in pairs:
+            if not col in cols:
+                continue
+            if not copied:
+                sess = copy.deepcopy(sess)
+                copied = True
+            self.__combine_session__(sess, col, parent_col)
+            cols.discard(col)
+            cols.add(parent_col)
+        ## FOR
+        return sess
+    ## DEF
+
     # If we want to embed queries accessing collection B to queries accessing collection A
     # We just remove all the queries that
     def __combine_queries__(self, col, parent_col):
         # Get the sessions that contain queries to this collection
         sessions = self.col_sess_xref[col]
         for sess in sessions:
-            operations = sess['operations']
-            operations_in_use = operations[:]
-            cursor = len(operations)  - 1
-            combinedQueries = []
-            remained_ops = [ ]
-            while cursor > -1: # if cursor is -1, there won't be any embedding happening
-                if operations_in_use[cursor]['collection'] == col:
-                    combinedQueries.append((cursor, operations_in_use.pop(cursor)))
-                elif operations_in_use[cursor]['collection'] == parent_col and len(combinedQueries) > 0:
-                    for op_tuple in combinedQueries:
-                        if op_tuple[1]['type'] == operations_in_use[cursor]['type']:
-                            operations_in_use[cursor]['query_content'].extend(op_tuple[1]['query_content'])
-                        #print "removed query: ", query['query_content']
-                        #print "remove query type: ", query['type']
-                        #print "new query: ", operations_in_use[cursor]['query_content']
-                        else:
-                            remained_ops.append(op_tuple)
-                    ## FOR
-                    combinedQueries = []
-                    operations = operations_in_use[:]
-                    sess['operations'] = operations[:]
-                cursor -= 1
-            ## WHILE
-            for op_tuple in remained_ops:
-                sess['operations'].insert(op_tuple[0], op_tuple[1])
-            # We need to redirect the queries to its new collection
-            for op in sess['operations']:
-                if op['collection'] == col:
-                    op['collection'] = parent_col
-                ## IF
-            ## FOR
-            
+            self.__combine_session__(sess, col, parent_col)
             # now this session has operations to the parent collection
             self.col_sess_xref[parent_col].append(sess)
         ## FOR
     # DEF
 
+    def __combine_session__(self, sess, col, parent_col):
+        operations = sess['operations']
+        operations_in_use = operations[:]
+        cursor = len(operations)  - 1
+        combinedQueries = []
+        remained_ops = [ ]
+        while cursor > -1: # if cursor is -1, there won't be any embedding happening
+            if operations_in_use[cursor]['collection'] == col:
+                combinedQueries.append((cursor, operations_in_use.pop(cursor)))
+            elif operations_in_use[cursor]['collection'] == parent_col and len(combinedQueries) > 0:
+                for op_tuple in combinedQueries:
+                    if op_tuple[1]['type'] == operations_in_use[cursor]['type']:
+                        operations_in_use[cursor]['query_content'].extend(op_tuple[1]['query_content'])
+                    #print "removed query: ", query['query_content']
+                    #print "remove query type: ", query['type']
+                    #print "new query: ", operations_in_use[cursor]['query_content']
+                    else:
+                        remained_ops.append(op_tuple)
+                ## FOR
+                combinedQueries = []
+                operations = operations_in_use[:]
+                sess['operations'] = operations[:]
+            cursor -= 1
+        ## WHILE
+        for op_tuple in remained_ops:
+            sess['operations'].insert(op_tuple[0], op_tuple[1])
+        # We need to redirect the queries to its new collection
+        for op in sess['operations']:
+            if op['collection'] == col:
+                op['collection'] = parent_col
+            ## IF
+        ## FOR
+    # DEF
+
     # if C -> B and B -> A, we want C to appear first in the __combine_queries__ setup
     def __GetCollectionsInProperOder__(self, design):
         # initialize collection scores dictionary
@@ -172,3 +209,29 @@ class WorkloadCombiner:
             collection_scores[parent_col] += 1
             self.__update_score__(parent_col, design, collection_scores)
 ## CLASS
+
+## ==============================================
+## CombinedWorkload
+## ==============================================
+class CombinedWorkload(object):
+    """
+        Iterable view of a streaming workload that combines each session
+        on the fly. Only one combined session is alive at a time.
+    """
+    isStreaming = True
+
+    def __init__(self, combiner, pairs):
+        self.combiner = combiner
+        self.pairs = pairs
+        self.num_ops = combiner.workload.num_ops
+    ## DEF
+
+    def __len__(self):
+        return len(self.combiner.workload)
+    ## DEF
+
+    def __iter__(self):
+        for sess in self.combiner.workload:
+            yield self.combiner.combineSession(sess, self.pairs)
+    ## DEF
+## CLASS
@@ -60,6 +60,20 @@ class TestUtilMethods(unittest.TestCase):
         self.assertIsNone(actual)
     ## DEF
 
+    def testHashFieldValues(self):
+        # Strings and numbers keep their normal hash
+        values = ("abc", 1234, 5.5, (True, 99L))
+        self.assertEqual(hash(values), catalog.hashFieldValues(values))
+
+        # None is hashed by value so that every process gets the same one
+        values = catalog.getFieldValues(["scalarKey", "LiptonSoup"], TestUtilMethods.TEST_FIELDS)
+        self.assertEqual((1234, None), values)
+        self.assertEqual(catalog.hashFieldValues(values), catalog.hashFieldValues((1234, None)))
+        self.assertNotEqual(catalog.hashFieldValues(values), catalog.hashFieldValues((None, 1234)))
+
+        self.assertRaises(TypeError, catalog.hashFieldValues, ([1, 2], ))
+    ## DEF
+
     def testFieldTypeSerialization(self):
         for t in [ int, str, unicode, float ]:
             t_bson = catalog.fieldTypeToString(t)
@@ -0,0 +1,91 @@
+import os, sys
+import tempfile
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from util import constants
+import workload
+
+class SnapshotTestCase(unittest.TestCase):
+    """
+        Base test case for the cost model tests that do not need MongoDB.
+        The workload is written to a snapshot at self.path
+    """
+
+    def setUp(self):
+        fields = { }
+        for f_name in ["a", "b"]:
+            fields[f_name] = {
+                "type":              "int",
+                "fields":            { },
+                "query_use_count":   10,
+                "cardinality":       100,
+                "selectivity":       0.5,
+                "avg_size":          8,
+                "parent_col":        None,
+                "parent_key":        None,
+                "parent_candidates": [ ],
+            }
+        ## FOR
+        collections = { }
+        for col_name in ["ABC", "XYZ"]:
+            collections[col_name] = {
+                "name":             col_name,
+                "doc_count":        10000,
+                "avg_doc_size":     100,
+                "max_pages":        1000,
+                "data_size":        1000000,
+                "workload_queries": 100,
+                "workload_percent": 0.5,
+                "interesting":      ["a", "b"],
+                "fields":           dict(fields),
+                "shard_keys":       { },
+                "indexes":          [ ],
+                "embedding_ratio":  { },
+            }
+        ## FOR
+
+        # The inserts are missing part of the shard key and the queries look
+        # it up with a null value, so every shard key value includes None.
+        # The None is in a different position in each collection's shard
+        # key, so where their documents end up relative to each other
+        # depends on hash(None)
+        sessions = [ ]
+        query_id = 0
+        for i in xrange(50):
+            ops = [ ]
+            for j in xrange(4):
+                query_id += 1
+                op = {
+                    "collection": ["ABC", "XYZ"][j / 2],
+                    "query_id":   query_id,
+                    "query_hash": j % 2,
+                    "query_time": i + j * 0.1,
+                    "resp_time":  i + j * 0.1 + 0.01,
+                }
+                if j % 2 == 0:
+                    op["type"] = constants.OP_TYPE_INSERT
+                    op["query_content"] = [ {"b": i * 10 + j} ]
+                    op["predicates"] = { }
+                else:
+                    op["type"] = constants.OP_TYPE_QUERY
+                    op["query_content"] = [ {constants.REPLACE_KEY_DOLLAR_PREFIX + "query": {"a": None, "b": i}} ]
+                    op["predicates"] = {"a": constants.PRED_TYPE_EQUALITY,
+                                        "b": constants.PRED_TYPE_EQUALITY}
+                ops.append(op)
+            ## FOR
+            sessions.append({"session_id": i, "start_time": float(i),
+                             "end_time": i + 1.0, "operations": ops})
+        ## FOR
+        fd, self.path = tempfile.mkstemp(suffix=".snapshot")
+        os.close(fd)
+        workload.exportSnapshot(self.path, collections, sessions)
+    ## DEF
+
+    def tearDown(self):
+        os.remove(self.path)
+    ## DEF
+
+## CLASS
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import json
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../"))
+
+# mongodb-d4
+from costmodeltestcase import CostModelTestCase
+import costmodel
+from costmodel import explain
+from search import Design
+
+class TestCostModelExplain(CostModelTestCase):
+
+    def setUp(self):
+        CostModelTestCase.setUp(self)
+        self.cm = costmodel.CostModel(self.collections, self.workload, self.costModelConfig)
+        self.num_ops = sum([len(sess["operations"]) for sess in self.workload])
+    ## DEF
+
+    def createDesign(self, shardKey):
+        d = Design()
+        for col_name in CostModelTestCase.COLLECTION_NAMES:
+            d.addCollection(col_name)
+            d.addIndex(col_name, ["field00"])
+            if shardKey: d.addShardKey(col_name, [shardKey])
+        ## FOR
+        return d
+    ## DEF
+
+    def testExplainMatchesOverallCost(self):
+        """The explanation should not change the cost of the design"""
+        d = self.createDesign("field00")
+        cost0 = self.cm.overallCost(d)
+        cost1, explanation = self.cm.explainCost(d)
+        self.assertAlmostEqual(cost0, cost1)
+        self.assertEqual(cost1, explanation.total_cost)
+
+        # Every operation should be attributed to exactly one query class
+        self.assertEqual(self.num_ops, sum([e["op_count"] for e in explanation.entries.itervalues()]))
+        self.assertEqual(self.num_ops, sum([e["broadcast_ops"] + e["targeted_ops"] for e in explanation.entries.itervalues()]))
+
+        # The skew contributions should add up to the skew cost
+        skew = sum([e["skew_contribution"] for e in explanation.entries.itervalues()])
+        self.assertAlmostEqual(explanation.components.get("skew", 0.0), skew)
+
+        # Make sure that we did not leave the explanation attached
+        self.assertIsNone(self.cm.state.explain)
+    ## DEF
+
+    def testExplainBroadcast(self):
+        """Without a sharding key every operation is a scatter-gather query"""
+        d = self.createDesign(None)
+        cost, explanation = self.cm.explainCost(d)
+        for entry in explanation.entries.itervalues():
+            self.assertEqual(0, entry["targeted_ops"])
+            self.assertEqual(entry["broadcast_ops"] * CostModelTestCase.NUM_NODES, entry["nodes_touched"])
+            self.assertEqual(("field00",), entry["index"])
+        ## FOR
+
+        d = self.createDesign("field00")
+        cost, explanation = self.cm.explainCost(d)
+        for entry in explanation.entries.itervalues():
+            self.assertEqual(0, entry["broadcast_ops"])
+            self.assertEqual(entry["targeted_ops"], entry["nodes_touched"])
+        ## FOR
+    ## DEF
+
+    def testExplainReport(self):
+        d = self.createDesign("field00")
+        cost, explanation = self.cm.explainCost(d)
+        for sortKey in explain.SORT_KEYS:
+            entries = explanation.getEntries(sortKey)
+            values = [e[sortKey] for e in entries]
+            self.assertEqual(sorted(values, reverse=True), values)
+        ## FOR
+
+        report = json.loads(explanation.toJSON())
+        self.assertEqual(len(explanation.entries), len(report["queries"]))
+        self.assertEqual(sorted(CostModelTestCase.COLLECTION_NAMES), \
+                         sorted([c["collection"] for c in report["collections"]]))
+        self.assertTrue(explanation.toText())
+    ## DEF
+
+    def testCostShares(self):
+        d = self.createDesign(None)
+        cost, explanation = self.cm.explainCost(d)
+        shares = explanation.getCostShares()
+        self.assertEqual(sorted(CostModelTestCase.COLLECTION_NAMES), sorted(shares.keys()))
+        self.assertAlmostEqual(1.0, sum(shares.itervalues()))
+
+        # Without a disk weight, the shares only come from the other components
+        collections = explanation.getCollections()
+        shares = explanation.getCostShares({"disk": 0.0, "skew": 0.0})
+        total = sum([c["nodes_touched"] for c in collections.itervalues()])
+        for col_name, share in shares.iteritems():
+            self.assertAlmostEqual(collections[col_name]["nodes_touched"] / float(total), share)
+    ## DEF
+
+    def testSearchCostShares(self):
+        """The cost model splits up the cost without throwing away its caches"""
+        d = self.createDesign(None)
+        cost = self.cm.overallCost(d)
+        evaluations = self.cm.stats.get("evaluations")
+        handles = dict(self.cm.state.cache_handles)
+        shares = self.cm.getCostShares(d.copy())
+        self.assertEqual(sorted(CostModelTestCase.COLLECTION_NAMES), sorted(shares.keys()))
+        self.assertAlmostEqual(1.0, sum(shares.itervalues()))
+        self.assertEqual(evaluations, self.cm.stats.get("evaluations"))
+        self.assertEqual(handles, self.cm.state.cache_handles)
+
+        # A different design is evaluated first
+        other = self.createDesign("field00")
+        self.assertAlmostEqual(1.0, sum(self.cm.getCostShares(other).itervalues()))
+        self.assertEqual(evaluations + 1, self.cm.stats.get("evaluations"))
+        self.assertAlmostEqual(self.cm.overallCost(other), self.cm.last_cost)
+    ## DEF
+
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import subprocess
+import unittest
+
+from snapshottestcase import SnapshotTestCase
+
+# Costs the design in a fresh interpreter so that anything whose hash is
+# based on an object's address ends up somewhere else. Prints the cost and
+# then the nodes that the cost model routed each operation to
+COST_SCRIPT = """
+import sys
+sys.path.append(%r)
+from ConfigParser import RawConfigParser
+from util import configutil
+import workload
+from costmodel import CostModel
+from search import Design
+
+config = RawConfigParser()
+configutil.setDefaultValues(config)
+collections, sessions = workload.loadSnapshot(sys.argv[1])
+cm = CostModel(collections, sessions, configutil.getCostModelConfig(config))
+design = Design()
+design.addCollection("ABC")
+design.addShardKey("ABC", ["a", "b"])
+design.addIndex("ABC", ["a", "b"])
+design.addCollection("XYZ")
+design.addShardKey("XYZ", ["b", "a"])
+design.addIndex("XYZ", ["b", "a"])
+print repr(cm.overallCost(design))
+for col_name in sorted(collections):
+    cache = cm.state.getCacheHandleByName(collections[col_name])
+    print col_name, sorted((query_id, sorted(node_ids)) for query_id, node_ids in cache.op_nodeIds.iteritems())
+""" % os.path.join(basedir, "../../src")
+
+class TestCostModelHashing (SnapshotTestCase):
+
+    def getCost(self):
+        output = subprocess.check_output([sys.executable, "-c", COST_SCRIPT, self.path])
+        # The log messages also go to stdout
+        lines = output.strip().splitlines()[-3:]
+        return float(lines[0]), lines[1:]
+    ## DEF
+
+    def testSameCostInEveryProcess(self):
+        cost, routing = self.getCost()
+        for i in xrange(3):
+            self.assertEqual((cost, routing), self.getCost())
+    ## DEF
+
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
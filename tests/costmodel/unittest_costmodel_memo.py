@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import unittest
+from ConfigParser import RawConfigParser
+
+from snapshottestcase import SnapshotTestCase
+from util import configutil
+import workload
+from costmodel import CostModel
+from search import Design
+
+class TestCostModelMemo (SnapshotTestCase):
+
+    def setUp(self):
+        SnapshotTestCase.setUp(self)
+        config = RawConfigParser()
+        configutil.setDefaultValues(config)
+        self.collections, sessions = workload.loadSnapshot(self.path)
+        self.cm = CostModel(self.collections, sessions, configutil.getCostModelConfig(config))
+    ## DEF
+
+    def getDesign(self, shardKey):
+        design = Design()
+        for col_name in sorted(self.collections):
+            design.addCollection(col_name)
+            design.addShardKey(col_name, shardKey)
+        ## FOR
+        return design
+    ## DEF
+
+    def testComponentsOfMemoHit(self):
+        d0 = self.getDesign(["a"])
+        d1 = self.getDesign(["b"])
+        cost = self.cm.overallCost(d0)
+        components = self.cm.getComponents(d0)
+        self.assertEqual(["disk", "network", "skew"], sorted(components))
+        self.cm.overallCost(d1)
+        self.assertIsNone(self.cm.getComponents(self.getDesign(["a", "b"])))
+
+        # The second time that we see d0 its cost comes from the memo,
+        # but we still know what it is made of
+        evaluations = self.cm.stats.get("evaluations")
+        self.assertEqual(cost, self.cm.overallCost(d0.copy()))
+        self.assertEqual(evaluations, self.cm.stats.get("evaluations"))
+        self.assertEqual(1, self.cm.stats.get("memo_hits"))
+        self.assertEqual(components, self.cm.getComponents(d0))
+
+        # Changing the migration clears the memo
+        self.cm.setMigration(None)
+        self.assertIsNone(self.cm.getComponents(d0))
+    ## DEF
+
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from costmodel import MigrationCost
+from search import Design
+
+class TestMigrationCost (unittest.TestCase) :
+
+    def setUp(self):
+        self.collections = {
+            "big":   {"doc_count": 1000, "avg_doc_size": 60},
+            "small": {"doc_count": 100,  "avg_doc_size": 40},
+        }
+        self.config = {
+            'migration_shard_key': 1.0,
+            'migration_add_index': 0.5,
+            'migration_drop_index': 0.1,
+            'migration_denormalization': 2.0,
+            'change_budget': -1,
+        }
+        self.deployed = Design()
+        for col_name in self.collections:
+            self.deployed.addCollection(col_name)
+            self.deployed.addShardKey(col_name, ["a"])
+            self.deployed.addIndex(col_name, ["a"])
+        ## FOR
+        self.migration = MigrationCost(self.collections, self.deployed, self.config)
+    ## DEF
+
+    def testNoChanges(self):
+        self.assertEqual([ ], self.migration.getSteps(self.deployed))
+        self.assertEqual(0.0, self.migration.getCost(self.deployed))
+        # Lists and tuples are the same keys
+        d = self.deployed.copy()
+        d.addShardKey("big", ("a",))
+        self.assertEqual([ ], self.migration.getSteps(d))
+    ## DEF
+
+    def testSteps(self):
+        d = self.deployed.copy()
+        d.addShardKey("big", ("b",))
+        d.addIndex("big", ("b",))
+        d.getIndexes("small").remove(("a",))
+        d.setDenormalizationParent("small", "big")
+
+        steps = sorted(self.migration.getSteps(d))
+        self.assertEqual([
+            ("add_index", "big", ("b",), 60000),
+            ("denormalize", "small", "big", 64000),
+            ("drop_index", "small", ("a",), 4000),
+            ("reshard", "big", ("b",), 60000),
+        ], steps)
+        expected = (60000 * 0.5 + 64000 * 2.0 + 4000 * 0.1 + 60000 * 1.0) / 64000
+        self.assertAlmostEqual(expected, self.migration.getCost(d))
+
+        # The plan denormalizes first and drops the old indexes last
+        plan = self.migration.getPlan(d)
+        self.assertEqual(["denormalize", "add_index", "reshard", "drop_index"], [s["action"] for s in plan])
+        self.assertAlmostEqual(expected, sum([s["cost"] for s in plan]))
+        self.assertEqual(["b"], plan[1]["key"])
+        self.assertTrue(self.migration.formatPlan(plan))
+    ## DEF
+
+    def testChangeBudget(self):
+        d = self.deployed.copy()
+        d.addShardKey("big", ("b",))
+        d.addIndex("big", ("b",))
+        self.migration.changeBudget = 1
+        self.assertTrue(self.migration.isOverBudget(d))
+        self.assertEqual(float("inf"), self.migration.getCost(d))
+        self.migration.changeBudget = 2
+        self.assertFalse(self.migration.isOverBudget(d))
+
+        # The relaxed collections of a partial design are not counted
+        d.reset("big")
+        self.migration.changeBudget = 0
+        self.assertFalse(self.migration.isOverBudget(d))
+        self.assertEqual(0.0, self.migration.getCost(d))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../../src"))
+sys.path.append(os.path.join(basedir, "../../../exps/tools"))
+
+import unittest
+
+import benchmarkutil
+
+class TestBenchmarkUtil(unittest.TestCase):
+
+    def testTimeToBest(self):
+        results = [
+            {"strategy": "lns",       "best_cost": 1.0,   "improvements": [(0.0, 2.0), (3.0, 1.0)]},
+            {"strategy": "annealing", "best_cost": 1.005, "improvements": [(-0.1, 2.0), (1.0, 1.5), (2.0, 1.005)]},
+            {"strategy": "genetic",   "best_cost": 1.5,   "improvements": [(0.0, 1.5)]},
+        ]
+        self.assertEqual(1.0, benchmarkutil.computeTimeToBest(results))
+        self.assertEqual(3.0, results[0]["time_to_best"])
+        # Within 1% of the best cost
+        self.assertEqual(2.0, results[1]["time_to_best"])
+        self.assertIsNone(results[2]["time_to_best"])
+
+        # The runs can have their first improvement before the clock started
+        self.assertEqual(1.5, benchmarkutil.computeTimeToBest(results[2:]))
+        self.assertEqual(0.0, results[2]["time_to_best"])
+        results[1]["improvements"] = [(-0.1, 1.005)]
+        benchmarkutil.computeTimeToBest(results[1:])
+        self.assertEqual(0.0, results[1]["time_to_best"])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
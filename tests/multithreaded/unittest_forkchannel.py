@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+import execnet
+from message import *
+from forkchannel import ForkChannel, forkWorkers, joinWorkers, makeReceiveQueue
+
+# Loaded before the workers are forked, so they all get a copy of it
+PRELOADED = { "sessions": range(1000) }
+
+def echoWorker(channel, worker_idx):
+    """Send back every message with the id of this worker until the channel is closed"""
+    for item in channel:
+        msg = getMessage(item)
+        sendMessage(msg.header, (worker_idx, msg.data, len(PRELOADED["sessions"])), channel)
+## DEF
+
+class TestForkChannel (unittest.TestCase) :
+
+    def setUp(self):
+        self.channels = forkWorkers(3, echoWorker)
+    ## DEF
+
+    def tearDown(self):
+        if self.channels: joinWorkers(self.channels)
+    ## DEF
+
+    def testEcho(self):
+        self.assertEqual(3, len(self.channels))
+        for ch in self.channels:
+            self.assertTrue(isinstance(ch, ForkChannel))
+            self.assertIsNone(ch.gateway)
+        queue = makeReceiveQueue(self.channels)
+        for worker_idx, ch in enumerate(self.channels):
+            sendMessage(MSG_NOOP, "hello %d" % worker_idx, ch)
+        replies = { }
+        for i in xrange(len(self.channels)):
+            ch, item = queue.get(timeout=10)
+            msg = getMessage(item)
+            self.assertEqual(MSG_NOOP, msg.header)
+            replies[ch] = msg.data
+        ## FOR
+        for worker_idx, ch in enumerate(self.channels):
+            self.assertEqual((worker_idx, "hello %d" % worker_idx, 1000), replies[ch])
+    ## DEF
+
+    def testReceiveTimeout(self):
+        self.assertRaises(execnet.TimeoutError, self.channels[0].receive, 0.1)
+    ## DEF
+
+    def testJoin(self):
+        pids = [ch.pid for ch in self.channels]
+        joinWorkers(self.channels)
+        self.channels = None
+        # The workers exited when their channels were closed
+        for pid in pids:
+            self.assertRaises(OSError, os.waitpid, pid, os.WNOHANG)
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
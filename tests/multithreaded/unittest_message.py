@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+from search import Design
+from message import *
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(getMessage(msg))
+
+class TestMessage (unittest.TestCase) :
+
+    def createDesign(self, shardKey):
+        d = Design()
+        for col_name in ["col1", "col2", "col3"]:
+            d.addCollection(col_name)
+            d.addShardKey(col_name, (shardKey,))
+            d.addIndex(col_name, (shardKey, "key3"))
+        ## FOR
+        d.setDenormalizationParent("col3", "col1")
+        return d
+    ## DEF
+
+    def testFromKey(self):
+        d = self.createDesign("key1")
+        d.reset("col2")
+        self.assertEqual(d.getKey(), Design.fromKey(d.getKey()).getKey())
+        self.assertTrue(Design.fromKey(d.getKey()).isRelaxed("col2"))
+    ## DEF
+
+    def testDesignCodec(self):
+        sender = DesignCodec()
+        receiver = DesignCodec()
+        d0 = self.createDesign("key1")
+        delta = sender.encode(d0)
+        self.assertEqual(3, len(delta[0]))
+        self.assertEqual(d0.getKey(), receiver.decode(delta).getKey())
+
+        # Only the collection that changed is sent
+        d1 = d0.copy()
+        d1.addShardKey("col2", ("key2",))
+        delta = sender.encode(d1)
+        self.assertEqual(((("col2", ("key2",), (("key1", "key3"),), None),), ()), delta)
+        self.assertEqual(d1.getKey(), receiver.decode(delta).getKey())
+
+        self.assertEqual(((), ()), sender.encode(d1))
+        self.assertEqual(d1.getKey(), receiver.decode(((), ())).getKey())
+
+        # Collections can go away too
+        d2 = Design()
+        d2.addCollection("col1")
+        d2.addShardKey("col1", ("key1",))
+        d2.addIndex("col1", ("key1", "key3"))
+        d2.setDenormalizationParent("col1", None)
+        delta = sender.encode(d2)
+        self.assertEqual(["col2", "col3"], sorted(delta[1]))
+        self.assertEqual(d2.getKey(), receiver.decode(delta).getKey())
+    ## DEF
+
+    def testSendDesign(self):
+        channel = DummyChannel()
+        for shardKey in ["key1", "key2", "key1"]:
+            d = self.createDesign(shardKey)
+            sendDesign(MSG_FOUND_BEST_COST, 1.0, d, channel)
+            cost, received = receiveDesign(channel.messages[-1].data, channel)
+            self.assertEqual(1.0, cost)
+            self.assertEqual(d.getKey(), received.getKey())
+        ## FOR
+    ## DEF
+
+    def testProgressCounter(self):
+        channel = DummyChannel()
+        progress = ProgressCounter(channel, 60)
+        for cost in [5.0, 3.0, 4.0]:
+            progress.add(3.0, cost)
+        self.assertEqual([ ], channel.messages)
+        progress.flush()
+        self.assertEqual(1, len(channel.messages))
+        self.assertEqual(MSG_EVALUATED_DESIGNS, channel.messages[0].header)
+        self.assertEqual((3, 3.0, 3.0), channel.messages[0].data)
+
+        # Nothing to report
+        progress.flush()
+        self.assertEqual(1, progress.sent)
+
+        # Every design is reported on its own without an interval
+        progress = ProgressCounter(channel, 0)
+        progress.add(3.0, 5.0)
+        progress.add(3.0, 2.0)
+        self.assertEqual([(1, 3.0, 5.0), (1, 3.0, 2.0)], [m.data for m in channel.messages[1:]])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import tempfile
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+import execnet
+from util import configutil
+import multi_search
+from multi_search import MultiClientDesigner, parseHosts, shipFile
+
+class TestMultiSearch (unittest.TestCase) :
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".snapshot")
+        os.write(fd, "".join([chr(i % 256) for i in xrange(3000)]))
+        os.close(fd)
+    ## DEF
+
+    def tearDown(self):
+        os.remove(self.path)
+    ## DEF
+
+    def testParseHosts(self):
+        self.assertEqual([("host1", 4), ("host2", 2), ("host3", 2)], parseHosts("host1:4, host2,host3", 2))
+        self.assertEqual([("popen", 1)], parseHosts("popen"))
+        self.assertEqual([ ], parseHosts(" "))
+        self.assertRaises(Exception, parseHosts, "host1:abc")
+    ## DEF
+
+    def testShipFile(self):
+        gw = execnet.makegateway("popen")
+        try:
+            # Send it in more than one piece
+            chunk_size = multi_search.SHIP_CHUNK_SIZE
+            multi_search.SHIP_CHUNK_SIZE = 1000
+            try:
+                remote = shipFile(gw, self.path)
+            finally:
+                multi_search.SHIP_CHUNK_SIZE = chunk_size
+            self.assertNotEqual(self.path, remote)
+            self.assertTrue(remote.endswith(".snapshot"))
+            with open(remote, "rb") as fd:
+                with open(self.path, "rb") as expected:
+                    self.assertEqual(expected.read(), fd.read())
+
+            config = RawConfigParser()
+            configutil.setDefaultValues(config)
+            mcd = MultiClientDesigner(config, {"snapshot": self.path, "deployed_design": None})
+            args = mcd.shipInputFiles(gw, "popen")
+            self.assertTrue(os.path.exists(args["snapshot"]))
+            self.assertIsNone(args["deployed_design"])
+            # The original arguments are not changed
+            self.assertEqual(self.path, mcd.args["snapshot"])
+
+            mcd.shippedFiles[gw].append(remote)
+            mcd.removeShippedFiles()
+            self.assertFalse(os.path.exists(remote))
+            self.assertFalse(os.path.exists(args["snapshot"]))
+        finally:
+            gw.exit()
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
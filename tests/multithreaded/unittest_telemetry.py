@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import json
+import socket
+import tempfile
+import threading
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+sys.path.append(os.path.join(basedir, "../../src/multithreaded"))
+
+from telemetry import TelemetrySink, jsonCost, getPruneRate
+
+class TestTelemetry (unittest.TestCase) :
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+    ## DEF
+
+    def tearDown(self):
+        if os.path.exists(self.path): os.remove(self.path)
+    ## DEF
+
+    def testFile(self):
+        sink = TelemetrySink(self.path)
+        sink.write({"event": "start", "best_cost": 1.5})
+        sink.write({"event": "end", "best_cost": 0.5})
+        # Every record is written out right away
+        with open(self.path) as fd:
+            self.assertEqual(2, len(fd.readlines()))
+        sink.close()
+        sink.write({"event": "ignored"})
+        self.assertEqual(2, sink.written)
+        with open(self.path) as fd:
+            records = [json.loads(line) for line in fd]
+        self.assertEqual(["start", "end"], [r["event"] for r in records])
+        self.assertEqual(0.5, records[-1]["best_cost"])
+    ## DEF
+
+    def testUnixSocket(self):
+        os.remove(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(1)
+        received = [ ]
+        def receive():
+            conn, addr = server.accept()
+            received.extend(conn.makefile("r").readlines())
+            conn.close()
+        ## DEF
+        t = threading.Thread(target=receive)
+        t.start()
+        sink = TelemetrySink("unix:" + self.path)
+        for i in xrange(3):
+            sink.write({"event": "progress", "evaluations": i})
+        sink.close()
+        t.join(10)
+        server.close()
+        self.assertEqual([0, 1, 2], [json.loads(line)["evaluations"] for line in received])
+    ## DEF
+
+    def testHelpers(self):
+        self.assertEqual(0.25, jsonCost(0.25))
+        self.assertIsNone(jsonCost(float("inf")))
+        self.assertIsNone(jsonCost(sys.maxint))
+        self.assertIsNone(jsonCost(None))
+
+        stats = {"counters": {"bb_nodes_pruned": 3, "bb_nodes_expanded": 1}}
+        self.assertAlmostEqual(0.75, getPruneRate(stats))
+        self.assertIsNone(getPruneRate({ }))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
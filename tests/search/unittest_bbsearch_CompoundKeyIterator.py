@@ -45,11 +45,12 @@ class TestCompoundKeyIterator (unittest.TestCase):
                 ## WHILE
                 if len(res) != 0:
                     num_valid_keys += 1
-                    self.assertTrue(res not in iterator.invalidCombinations)
+                    self.assertFalse(iterator.isInvalidCombination(res))
             except StopIteration:
                 break
         
-        self.assertEqual(num_valid_keys + len(iterator.invalidCombinations), len(originalkeys))
+        invalidCombinations = [c for c in originalkeys if iterator.isInvalidCombination(c)]
+        self.assertEqual(num_valid_keys + len(invalidCombinations), len(originalkeys))
     ## DEF
     
     def testIfWeFindAllInvalidCombinationsWithInterestingKeys_3(self):
@@ -70,13 +71,43 @@ class TestCompoundKeyIterator (unittest.TestCase):
                 ## WHILE
                 if len(res) != 0:
                     num_valid_keys += 1
-                    self.assertTrue(res not in iterator.invalidCombinations)
+                    self.assertFalse(iterator.isInvalidCombination(res))
             except StopIteration:
                 break
         
-        self.assertEqual(num_valid_keys + len(iterator.invalidCombinations), len(originalkeys))
+        invalidCombinations = [c for c in originalkeys if iterator.isInvalidCombination(c)]
+        self.assertEqual(num_valid_keys + len(invalidCombinations), len(originalkeys))
     ## DEF
     
+    def testLazyWithManyInterestingKeys(self):
+        """The first keys should come back without enumerating all of the combinations"""
+        singleCandidateKeys = ["f" + str(i) for i in xrange(7)]
+        candidateKeys = self.__calculate_permutations__(singleCandidateKeys)
+        iterator = bbsearch.CompoundKeyIterator(candidateKeys, -1)
+
+        self.assertEqual([], iterator.next())
+        for i in xrange(len(candidateKeys)):
+            self.assertEqual((candidateKeys[i],), iterator.next())
+        res = iterator.next()
+        self.assertEqual(2, len(res))
+        self.assertFalse(iterator.isInvalidCombination(res))
+    ## DEF
+
+    def testPruneUselessKeys(self):
+        """Keys that are not useful are never part of a combination"""
+        candidateKeys = [("f0",), ("f1",), ("f1", "f0"), ("f2",)]
+        isUseful = lambda key: key[0] != "f1"
+        iterator = bbsearch.CompoundKeyIterator(candidateKeys, -1, isUseful)
+
+        results = [res for res in iterator]
+        self.assertEqual([[], (("f0",),), (("f2",),), (("f0",), ("f2",))], results)
+        self.assertTrue(iterator.isInvalidCombination((("f0",), ("f1",))))
+
+        # Shard keys are plain field names
+        iterator = bbsearch.CompoundKeyIterator(["f", "f0", "f1"], 3)
+        self.assertEqual(8, len([res for res in iterator]))
+    ## DEF
+
     def __calculate_combinations__(self, keys, store=True):
         candidateKeys = []
         counter = 0
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import threading
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from search import bbsearch
+from search import designcandidates
+from search import design
+from search.bestfirstsearch import BestFirstSearch
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(msg)
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        self.evaluations += 1
+        return self.function(design)
+
+    def __init__(self, function):
+        self.function = function
+        self.evaluations = 0
+
+def shardKeyCost(design):
+    """Only sharding on 'key2' is free. The relaxed collections do not cost anything"""
+    cost = 0.0
+    for col_name in design.getCollections():
+        if design.isRelaxed(col_name):
+            continue
+        if design.getShardKeys(col_name) != ("key2",):
+            cost += 1.0
+        cost += 0.1 * len(design.getIndexes(col_name))
+    return cost
+
+class TestBestFirstSearch (unittest.TestCase) :
+
+    def setUp(self):
+        self.initialDesign = design.Design()
+        self.dc = designcandidates.DesignCandidates()
+        for col_name in ["col1", "col2", "col3"]:
+            self.initialDesign.addCollection(col_name)
+            self.initialDesign.reset(col_name)
+            self.dc.addCollection(col_name, [("key1",)], ["key1", "key2", "key3"], [])
+        ## FOR
+        self.upper_bound = 100.0
+        self.timeout = 1000000000
+    ## DEF
+
+    def testFindsOptimum(self):
+        cm = DummyCostModel(shardKeyCost)
+        bf = BestFirstSearch(self.dc, cm, self.initialDesign, self.upper_bound, self.timeout, DummyChannel(), threading.Lock())
+        bf.solve()
+
+        self.assertEqual("solved", bf.status)
+        self.assertEqual(0.0, bf.bestCost)
+        self.assertTrue(bf.bestDesign.isComplete())
+        for col_name in bf.bestDesign.getCollections():
+            self.assertEqual(("key2",), bf.bestDesign.getShardKeys(col_name))
+            self.assertEqual([], bf.bestDesign.getIndexes(col_name))
+        self.assertGreater(bf.nodesExpanded, 0)
+        self.assertGreater(bf.nodesPruned, 0)
+        self.assertEqual(bf.improvements[-1][1], bf.bestCost)
+        self.assertGreaterEqual(bf.getTimeToNearBest(), 0.0)
+    ## DEF
+
+    def testBeamWidth(self):
+        cm = DummyCostModel(shardKeyCost)
+        bf = BestFirstSearch(self.dc, cm, self.initialDesign, self.upper_bound, self.timeout, DummyChannel(), threading.Lock(), beamWidth=2)
+        bf.solve()
+        self.assertEqual(0.0, bf.bestCost)
+        self.assertLessEqual(bf.maxOpenNodes, 2)
+    ## DEF
+
+    def testReportsProgress(self):
+        # All of the designs that were evaluated are reported to the
+        # coordinator by the time that solve() returns
+        channel = DummyChannel()
+        cm = DummyCostModel(shardKeyCost)
+        bf = BestFirstSearch(self.dc, cm, self.initialDesign, self.upper_bound, self.timeout, channel, threading.Lock())
+        bf.solve()
+        self.assertEqual(0, bf.progress.count)
+        self.assertGreater(bf.progress.sent, 0)
+    ## DEF
+
+    def testIncumbentUpdate(self):
+        incumbent = self.initialDesign.copy()
+        for col_name in incumbent.getCollections():
+            incumbent.recover(col_name)
+            incumbent.addShardKey(col_name, ("key2",))
+            incumbent.addIndex(col_name, ("key1",))
+        ## FOR
+
+        for restart in [False, True]:
+            # Another worker finds a design with a cost of 0.3 while we are searching
+            def cost(design):
+                if cm.evaluations == 3:
+                    bf.updateBest(0.3, incumbent)
+                return shardKeyCost(design)
+            cm = DummyCostModel(cost)
+            bf = BestFirstSearch(self.dc, cm, self.initialDesign, self.upper_bound, self.timeout, DummyChannel(), threading.Lock())
+            bf.restartOnUpdate = restart
+            bf.solve()
+            self.assertEqual(1, bf.incumbentUpdates)
+            if restart:
+                self.assertEqual("updated_design", bf.status)
+                self.assertEqual(0.3, bf.bestCost)
+                self.assertEqual(("key2",), bf.bestDesign.getShardKeys("col1"))
+            else:
+                # We kept going and found a better design than the other worker
+                self.assertEqual("solved", bf.status)
+                self.assertEqual(0.0, bf.bestCost)
+        ## FOR
+    ## DEF
+
+    def testTimeToNearBest(self):
+        self.assertIsNone(bbsearch.timeToNearBest([ ]))
+        improvements = [ (0.0, 10.0), (1.0, 6.0), (2.0, 4.99), (3.0, 4.98) ]
+        self.assertEqual(2.0, bbsearch.timeToNearBest(improvements))
+        self.assertEqual(1.0, bbsearch.timeToNearBest(improvements, ratio=0.25))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
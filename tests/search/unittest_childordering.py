@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from search import designcandidates
+from search.childordering import WorkloadOrdering
+
+class TestWorkloadOrdering (unittest.TestCase) :
+
+    def setUp(self):
+        self.collections = {
+            "small": {
+                "workload_percent": 0.2,
+                "fields": {
+                    "a": {"query_use_count": 5, "selectivity": 1.0},
+                },
+            },
+            "big": {
+                "workload_percent": 0.8,
+                "fields": {
+                    "x": {"query_use_count": 0, "selectivity": 0.1},
+                    "y": {"query_use_count": 0, "selectivity": 0.9},
+                    "z": {"query_use_count": 100, "selectivity": 0.5},
+                },
+            },
+        }
+        ops = [ ]
+        # 'x' is used the most, but it is not selective
+        for i in xrange(10):
+            ops.append({"collection": "big", "query_hash": 1, "predicates": {"x": "eq"}})
+        for i in xrange(5):
+            ops.append({"collection": "big", "query_hash": 2, "predicates": {"y": "eq"}})
+        self.workload = [ {"operations": ops} ]
+    ## DEF
+
+    def testOrdering(self):
+        ordering = WorkloadOrdering(self.collections, self.workload)
+        self.assertEqual(["big", "small"], ordering.collectionOrder)
+
+        # x: 10 * 0.1, y: 5 * 0.9, z: falls back to the catalog 100 * 0.5
+        self.assertAlmostEqual(1.0, ordering.getKeyBenefit("big", "x"))
+        self.assertAlmostEqual(4.5, ordering.getKeyBenefit("big", "y"))
+        self.assertAlmostEqual(50.0, ordering.getKeyBenefit("big", "z"))
+        self.assertAlmostEqual(50.0 + 1.0 / 2, ordering.getKeyBenefit("big", ("z", "x")))
+        self.assertEqual(["z", "y", "x"], ordering.sortKeys("big", ["x", "y", "z"]))
+        self.assertTrue(ordering.isUsefulIndex("big", ("x", "w")))
+        self.assertFalse(ordering.isUsefulIndex("big", ("w", "x")))
+    ## DEF
+
+    def testUnknownSelectivity(self):
+        # The catalog's default selectivity does not make a field useless
+        self.collections["small"]["fields"]["b"] = {"query_use_count": 3, "selectivity": 0.0}
+        ordering = WorkloadOrdering(self.collections, self.workload)
+        self.assertAlmostEqual(3.0, ordering.getKeyBenefit("small", "b"))
+        self.assertTrue(ordering.isUsefulIndex("small", ("b",)))
+    ## DEF
+
+    def testApply(self):
+        dc = designcandidates.DesignCandidates()
+        indexKeys = [("x",), ("y", "x"), ("z",)]
+        shardKeys = ["x", "y", "z"]
+        dc.addCollection("big", indexKeys, shardKeys, [])
+        dc.addCollection("small", [("a",)], ["a"], [])
+
+        ordering = WorkloadOrdering(self.collections, self.workload)
+        ordered = ordering.apply(dc.getCandidates(["big"]))
+        self.assertEqual([("z",), ("y", "x"), ("x",)], ordered.indexKeys["big"])
+        self.assertEqual(["z", "y", "x"], ordered.shardKeys["big"])
+        self.assertEqual(["big"], ordering.getCollectionOrder(ordered))
+
+        # The original candidates are not modified
+        self.assertEqual(["x", "y", "z"], dc.shardKeys["big"])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
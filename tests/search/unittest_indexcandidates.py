@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from util import configutil
+from util import constants
+from search.designer import Designer, countIndexPermutations
+
+class TestIndexCandidates (unittest.TestCase) :
+
+    def setUp(self):
+        fields = { }
+        for f_name, selectivity in [("a", 0.9), ("b", 0.5), ("c", 0.4), ("d", 0.3), ("e", 0.8), ("f", 0.6)]:
+            fields[f_name] = {"selectivity": selectivity, "cardinality": 100, "parent_col": None}
+        self.collections = {
+            "col": {
+                "name": "col",
+                "interesting": ["a", "b", "c", "d", "e", "f"],
+                "fields": fields,
+            },
+        }
+        ops = [
+            # a = ? AND b = ? AND c > ?
+            {"collection": "col", "query_hash": 1, "query_content": [ ], "query_fields": None,
+             "predicates": {"a": constants.PRED_TYPE_EQUALITY, "b": constants.PRED_TYPE_EQUALITY,
+                            "c": constants.PRED_TYPE_RANGE}},
+            # d = ? ORDER BY e, projected onto a
+            {"collection": "col", "query_hash": 2, "query_fields": {"a": 1},
+             "query_content": [ {constants.REPLACE_KEY_DOLLAR_PREFIX + "orderby": {"e": 1}} ],
+             "predicates": {"d": constants.PRED_TYPE_EQUALITY}},
+            # Regex predicates cannot use an index
+            {"collection": "col", "query_hash": 3, "query_content": [ ], "query_fields": None,
+             "predicates": {"f": constants.PRED_TYPE_REGEX}},
+        ]
+        self.workload = [ {"operations": ops + ops} ]
+
+        config = RawConfigParser()
+        configutil.setDefaultValues(config)
+        self.designer = Designer(config, None, None)
+    ## DEF
+
+    def testWithoutWorkload(self):
+        dc = self.designer.generateDesignCandidates(self.collections)
+        self.assertEqual(countIndexPermutations(6), len(dc.indexKeys["col"]))
+        self.assertEqual({ }, self.designer.indexCandidateStats)
+    ## DEF
+
+    def testWorkloadPruning(self):
+        dc = self.designer.generateDesignCandidates(self.collections, workload=self.workload)
+        indexKeys = dc.indexKeys["col"]
+        expected = [
+            ("a",), ("b",), ("d",), ("a", "b"), ("b", "a"), ("d", "a"), ("d", "e"),
+            ("a", "b", "c"), ("b", "a", "c"), ("d", "e", "a"),
+        ]
+        self.assertEqual(sorted(expected), sorted(indexKeys))
+        self.assertEqual(len(set(indexKeys)), len(indexKeys))
+        self.assertEqual((len(expected), countIndexPermutations(6)), self.designer.indexCandidateStats["col"])
+
+        # The shard keys are not affected
+        self.assertEqual(["a", "b", "c", "d", "e", "f"], dc.shardKeys["col"])
+    ## DEF
+
+    def testCountIndexPermutations(self):
+        self.assertEqual(0, countIndexPermutations(0))
+        self.assertEqual(3 + 6 + 6, countIndexPermutations(3))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
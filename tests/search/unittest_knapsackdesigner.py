@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import catalog
+from util import configutil
+from util import constants
+from search import KnapsackDesigner
+
+def makeCollection(name, doc_count, avg_doc_size, fields):
+    col_info = catalog.Collection()
+    col_info['name'] = name
+    col_info['doc_count'] = doc_count
+    col_info['avg_doc_size'] = avg_doc_size
+    for f_name, cardinality, avg_size in fields:
+        f = catalog.Collection.fieldFactory(f_name, "int")
+        f['cardinality'] = cardinality
+        f['selectivity'] = cardinality / float(doc_count)
+        f['avg_size'] = avg_size
+        col_info['fields'][f_name] = f
+    ## FOR
+    return col_info
+
+def makeOps(col_name, op_type, count, predicates={}, content=[{}]):
+    return [{"collection": col_name, "type": op_type, "predicates": dict(predicates),
+             "query_content": content} for i in xrange(count)]
+
+class TestKnapsackDesigner (unittest.TestCase) :
+
+    def setUp(self):
+        self.collections = {
+            # 4883 pages
+            "orders": makeCollection("orders", 100000, 200, [("a", 1000, 8), ("b", 50, 8), ("c", 2, 4)]),
+            # 1954 pages
+            "users": makeCollection("users", 40000, 200, [("u", 40000, 0)]),
+            # 25 pages
+            "log": makeCollection("log", 1000, 100, [("e", 1000, 8)]),
+        }
+        EQ = constants.PRED_TYPE_EQUALITY
+        ops = makeOps("orders", constants.OP_TYPE_QUERY, 30, {"a": EQ}) + \
+              makeOps("orders", constants.OP_TYPE_QUERY, 20, {"b": EQ}) + \
+              makeOps("orders", constants.OP_TYPE_QUERY, 60, {"c": EQ}) + \
+              makeOps("orders", constants.OP_TYPE_INSERT, 10) + \
+              makeOps("users", constants.OP_TYPE_QUERY, 40, {"u": EQ}) + \
+              makeOps("log", constants.OP_TYPE_QUERY, 1, {"e": EQ}) + \
+              makeOps("log", constants.OP_TYPE_INSERT, 50)
+        self.workload = [ {"operations": ops} ]
+
+        self.config = RawConfigParser()
+        configutil.setDefaultValues(self.config)
+        self.config.set(configutil.SECT_CLUSTER, "nodes", 4)
+        # Half of a megabyte for the indexes of each node
+        self.config.set(configutil.SECT_CLUSTER, "node_memory", 1)
+        self.designer = KnapsackDesigner(self.collections, self.workload, self.config)
+    ## DEF
+
+    def testSelectShardingKeys(self):
+        d = self.designer.generate()
+        # 'c' is used the most but it only has two values for four nodes
+        self.assertEqual(("a",), d.getShardKeys("orders"))
+        self.assertEqual([(("a",), 30 + 4*20 + 4*60 + 10), (("b",), 20 + 4*30 + 4*60 + 10)], \
+                         self.designer.networkCosts["orders"])
+        self.assertEqual(("u",), d.getShardKeys("users"))
+        self.assertEqual(("e",), d.getShardKeys("log"))
+    ## DEF
+
+    def testSelectIndexKeys(self):
+        d = self.designer.generate()
+        # Only one of the indexes on 'orders' fits next to the one on 'users'
+        self.assertEqual([("a",)], d.getIndexes("orders"))
+        self.assertEqual([("u",)], d.getIndexes("users"))
+        # The inserts cost more than what the index saves the only query
+        self.assertEqual([ ], d.getIndexes("log"))
+
+        total_memory = 0
+        for col_name in d.getCollections():
+            for indexKeys in d.getIndexes(col_name):
+                total_memory += self.designer.getIndexMemory(d, col_name, indexKeys)
+        self.assertLessEqual(total_memory, 1024 * 1024 / 2)
+    ## DEF
+
+    def testEstimateValue(self):
+        ops = self.workload[0]["operations"]
+        orders = [op for op in ops if op["collection"] == "orders"]
+        # Scanning 4883 pages vs. one index page plus 100 documents
+        self.assertEqual(4883 - 101, self.designer.estimateSavedPages("orders", orders[0], ("a",)))
+        self.assertEqual(30 * (4883 - 101) - 10, self.designer.estimateValue("orders", orders, [("a",)]))
+        # Half of the collection is not worth an index
+        self.assertEqual(0, self.designer.estimateSavedPages("orders", orders[-11], ("c",)))
+        # Each query only uses the best index
+        self.assertEqual(self.designer.estimateValue("orders", orders, [("a",)]) + \
+                         self.designer.estimateValue("orders", orders, [("b",)]), \
+                         self.designer.estimateValue("orders", orders, [("a",), ("b",)]))
+        self.assertEqual(self.designer.estimateValue("orders", orders, [("a",)]) - 10, \
+                         self.designer.estimateValue("orders", orders, [("a",), ("a", "b")]))
+
+        update = makeOps("orders", constants.OP_TYPE_UPDATE, 1, {"a": constants.PRED_TYPE_EQUALITY}, \
+                         [{"a": 1}, {constants.REPLACE_KEY_DOLLAR_PREFIX + "set": {"b": 2}}])[0]
+        self.assertEqual(set(["b"]), self.designer.getUpdatedFields(update))
+        self.assertEqual(0, self.designer.estimateWritePages(update, ("a",)))
+        self.assertEqual(1, self.designer.estimateWritePages(update, ("a", "b")))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
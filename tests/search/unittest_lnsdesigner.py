@@ -34,6 +34,26 @@ class TestSearchSpace (unittest.TestCase) :
         self.assertNotEqual(sorted(value_list[0]), sorted(value_list[2]))
         self.assertNotEqual(sorted(value_list[1]), sorted(value_list[2]))
     ## DEF
+
+    def testWeightedCollections(self):
+        """
+            Check whether the collections with most of the cost are relaxed more often
+        """
+        rcg = LNSDesigner.RandomCollectionGenerator(self.collections)
+        rcg.rng.seed(0)
+        weights = {"key0": 0.6, "key1": 0.4}
+        counts = { }
+        for j in xrange(200):
+            picked = rcg.getWeightedCollections(2, weights)
+            self.assertEqual(2, len(set(picked)))
+            for col_name in picked:
+                counts[col_name] = counts.get(col_name, 0) + 1
+        ## FOR
+        self.assertGreater(counts["key0"], 160)
+        self.assertGreater(counts["key1"], 130)
+        others = [cnt for col_name, cnt in counts.iteritems() if not col_name in weights]
+        self.assertLess(max(others), 20)
+    ## DEF
 ## CLASS
 
 if __name__ == '__main__':
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from search.lnsscheduler import AdaptiveScheduler
+
+class TestAdaptiveScheduler (unittest.TestCase) :
+
+    def testTriesEveryArm(self):
+        scheduler = AdaptiveScheduler([0.25, 0.5], ["random", "cost"])
+        self.assertEqual(4, len(scheduler.arms))
+        chosen = [ ]
+        for i in xrange(4):
+            arm = scheduler.choose()
+            chosen.append(scheduler.getArm(arm))
+            scheduler.update(arm, 10.0, 10.0, 1.0)
+        ## FOR
+        self.assertEqual(sorted(scheduler.arms), sorted(chosen))
+    ## DEF
+
+    def testPrefersProductiveArm(self):
+        scheduler = AdaptiveScheduler([0.25, 0.5], ["random", "cost"])
+        good = scheduler.arms.index((0.5, "cost"))
+        cost = 100.0
+        counts = [ 0 ] * len(scheduler.arms)
+        for i in xrange(100):
+            arm = scheduler.choose()
+            counts[arm] += 1
+            # Only one of the arms ever improves the cost
+            newCost = cost * 0.99 if arm == good else cost
+            scheduler.update(arm, cost, newCost, 2.0)
+            cost = newCost
+        ## FOR
+        self.assertEqual(max(counts), counts[good])
+        self.assertGreater(counts[good], 50)
+        self.assertEqual(counts[good], scheduler.toDICT()["0.50/cost"]["pulls"])
+    ## DEF
+
+    def testRewardPerCpuSecond(self):
+        scheduler = AdaptiveScheduler([0.5], ["random"])
+        self.assertAlmostEqual(0.05, scheduler.update(0, 10.0, 9.0, 2.0))
+        # Worse designs are not a negative reward
+        self.assertEqual(0.0, scheduler.update(0, 9.0, 9.5, 2.0))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import random
+import threading
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from util import configutil
+from util import SearchStats
+from search import designcandidates
+from search import design
+from search.metaheuristic import DesignMutator, PopulationEvaluator, \
+                                 SimulatedAnnealingDesigner, GeneticDesigner
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(msg)
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        self.evaluations += 1
+        return self.function(design)
+
+    def getStats(self):
+        return SearchStats()
+
+    def __init__(self, function):
+        self.function = function
+        self.evaluations = 0
+        self.design_memo = { }
+        self.design_memo_size = 0
+
+def shardKeyCost(design):
+    """Only sharding on 'key2' is free. Every index costs a little bit"""
+    cost = 0.0
+    for col_name in design.getCollections():
+        if tuple(design.getShardKeys(col_name) or ()) != ("key2",):
+            cost += 1.0
+        cost += 0.1 * len(design.getIndexes(col_name))
+    return cost
+
+class TestMetaheuristic (unittest.TestCase) :
+
+    def setUp(self):
+        self.initialDesign = design.Design()
+        self.dc = designcandidates.DesignCandidates()
+        for col_name in ["col1", "col2", "col3"]:
+            self.initialDesign.addCollection(col_name)
+            self.initialDesign.addShardKey(col_name, ("key1",))
+            self.initialDesign.addIndex(col_name, ("key1",))
+            self.dc.addCollection(col_name, [("key1",), ("key2",), ("key1", "key3")], ["key1", "key2", "key3"], [])
+        ## FOR
+        # col3 can be embedded in col1 and col1 can be embedded in col3
+        self.dc.denorm["col3"] = ["col1"]
+        self.dc.denorm["col1"] = ["col3"]
+
+        self.config = RawConfigParser()
+        configutil.setDefaultValues(self.config)
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'time_for_lnssearch', 5)
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'patient_time', 1)
+        self.config.set(configutil.SECT_DESIGNER, 'population_size', 8)
+        self.config.set(configutil.SECT_DESIGNER, 'eval_processes', 1)
+    ## DEF
+
+    def testMutations(self):
+        mutator = DesignMutator(self.dc, random.Random(0))
+        d = self.initialDesign
+        changed = 0
+        for i in xrange(200):
+            child = mutator.mutate(d)
+            self.assertTrue(mutator.isFeasible(child))
+            if child.getDelta(d): changed += 1
+            for col_name in child.getCollections():
+                for indexKeys in child.getIndexes(col_name):
+                    self.assertIn(indexKeys, self.dc.indexKeys[col_name])
+            d = child
+        ## FOR
+        self.assertGreater(changed, 150)
+        # The original design is never modified
+        self.assertEqual(["key1"], list(self.initialDesign.getShardKeys("col1")))
+
+        child = mutator.crossover(self.initialDesign, d)
+        self.assertTrue(mutator.isFeasible(child))
+    ## DEF
+
+    def testFeasibility(self):
+        mutator = DesignMutator(self.dc)
+        d = self.initialDesign.copy()
+        d.setDenormalizationParent("col3", "col1")
+        # Both col3 and col1 have a shard key
+        self.assertFalse(mutator.isFeasible(d))
+        d.recover("col3")
+        d.setDenormalizationParent("col3", "col1")
+        self.assertTrue(mutator.isFeasible(d))
+        # Cycle
+        d.setDenormalizationParent("col1", "col3")
+        self.assertFalse(mutator.isFeasible(d))
+        self.assertTrue(mutator.isFeasible(mutator.repair(d)))
+    ## DEF
+
+    def testStrategies(self):
+        initialCost = shardKeyCost(self.initialDesign)
+        for cls in [SimulatedAnnealingDesigner, GeneticDesigner]:
+            cm = DummyCostModel(shardKeyCost)
+            designer = cls({"col1": {}, "col2": {}, "col3": {}}, self.dc, [ ], self.config, cm, \
+                           self.initialDesign, initialCost, DummyChannel(), threading.Lock())
+            designer.run()
+            self.assertLess(designer.bestCost, initialCost)
+            self.assertEqual(designer.improvements[-1][1], designer.bestCost)
+            self.assertEqual(cm.evaluations, designer.stats.get("meta_evaluations"))
+    ## DEF
+
+    def testParallelEvaluation(self):
+        cm = DummyCostModel(shardKeyCost)
+        mutator = DesignMutator(self.dc)
+        designs = [mutator.mutate(self.initialDesign) for i in xrange(10)]
+        evaluator = PopulationEvaluator(cm, 2)
+        try:
+            self.assertIsNotNone(evaluator.pool)
+            self.assertEqual(map(shardKeyCost, designs), evaluator.evaluate(designs))
+        finally:
+            evaluator.close()
+        # The designs were evaluated in the pool processes
+        self.assertEqual(0, cm.evaluations)
+    ## DEF
+
+    def testEvaluationMemo(self):
+        cm = DummyCostModel(shardKeyCost)
+        cm.design_memo_size = 100
+        mutator = DesignMutator(self.dc, random.Random(0))
+        designs = [mutator.mutate(self.initialDesign) for i in xrange(5)]
+        evaluator = PopulationEvaluator(cm, 2)
+        try:
+            costs = evaluator.evaluate(designs)
+            self.assertEqual(len(set([d.getKey() for d in designs])), evaluator.lastEvaluated)
+            # Nothing is sent to the pool if we already know all of the costs
+            self.assertEqual(costs, evaluator.evaluate(designs))
+            self.assertEqual(0, evaluator.lastEvaluated)
+        finally:
+            evaluator.close()
+        self.assertEqual(map(shardKeyCost, designs), costs)
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import threading
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from util import configutil
+from util import SearchStats
+from search import designcandidates
+from search import design
+from search.searchclock import WallClock, EvaluationClock, createClock, getSeed, createRandom
+from search.metaheuristic import SimulatedAnnealingDesigner, GeneticDesigner
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(msg)
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        self.stats.incr("evaluations")
+        return self.function(design)
+
+    def getStats(self):
+        return self.stats
+
+    def __init__(self, function):
+        self.function = function
+        self.stats = SearchStats()
+        self.design_memo = { }
+        self.design_memo_size = 0
+
+def shardKeyCost(design):
+    """Only sharding on 'key2' is free. Every index costs a little bit"""
+    cost = 0.0
+    for col_name in design.getCollections():
+        if tuple(design.getShardKeys(col_name) or ()) != ("key2",):
+            cost += 1.0
+        cost += 0.1 * len(design.getIndexes(col_name))
+    return cost
+
+class TestSearchClock (unittest.TestCase) :
+
+    def setUp(self):
+        self.initialDesign = design.Design()
+        self.dc = designcandidates.DesignCandidates()
+        for col_name in ["col1", "col2", "col3"]:
+            self.initialDesign.addCollection(col_name)
+            self.initialDesign.addShardKey(col_name, ("key1",))
+            self.initialDesign.addIndex(col_name, ("key1",))
+            self.dc.addCollection(col_name, [("key1",), ("key2",), ("key1", "key3")], ["key1", "key2", "key3"], [])
+        ## FOR
+
+        self.config = RawConfigParser()
+        configutil.setDefaultValues(self.config)
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'seed', 42)
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'search_budget', 'evaluations')
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'time_for_lnssearch', 300)
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'patient_time', 100)
+        self.config.set(configutil.SECT_DESIGNER, 'population_size', 8)
+        self.config.set(configutil.SECT_DESIGNER, 'eval_processes', 1)
+    ## DEF
+
+    def testSeeds(self):
+        self.assertEqual(getSeed(self.config, 1, "lns"), getSeed(self.config, 1, "lns"))
+        self.assertNotEqual(getSeed(self.config, 1, "lns"), getSeed(self.config, 2, "lns"))
+        self.assertNotEqual(getSeed(self.config, 1, "lns"), getSeed(self.config, 1, "bbsearch"))
+        rng1 = createRandom(self.config, 0, "lns")
+        rng2 = createRandom(self.config, 0, "lns")
+        self.assertEqual([rng1.random() for i in xrange(10)], [rng2.random() for i in xrange(10)])
+
+        # Not seeded
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'seed', "")
+        self.assertIsNone(getSeed(self.config, 0, "lns"))
+        self.assertIsNone(getSeed(None, 0, "lns"))
+    ## DEF
+
+    def testEvaluationClock(self):
+        cm = DummyCostModel(shardKeyCost)
+        clock = createClock(self.config, cm)
+        self.assertIsInstance(clock, EvaluationClock)
+        self.assertEqual(0, clock.time())
+        cm.overallCost(self.initialDesign)
+        cm.overallCost(self.initialDesign)
+        cm.stats.incr("memo_hits")
+        self.assertEqual(3, clock.time())
+        clock.addEvaluations(5)
+        self.assertEqual(8, clock.time())
+        self.assertEqual(clock.time(), clock.cpu())
+
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'search_budget', 'seconds')
+        self.assertIsInstance(createClock(self.config, cm), WallClock)
+    ## DEF
+
+    def testReproducibleSearch(self):
+        initialCost = shardKeyCost(self.initialDesign)
+        for cls in [SimulatedAnnealingDesigner, GeneticDesigner]:
+            results = [ ]
+            for i in xrange(2):
+                cm = DummyCostModel(shardKeyCost)
+                designer = cls({"col1": {}, "col2": {}, "col3": {}}, self.dc, [ ], self.config, cm, \
+                               self.initialDesign, initialCost, DummyChannel(), threading.Lock(), worker_id=0)
+                designer.run()
+                # The search stops after the same number of evaluations
+                self.assertLessEqual(cm.stats.get("evaluations"), 300 + self.config.getint(configutil.SECT_DESIGNER, 'population_size'))
+                results.append(([cost for t, cost in designer.improvements], designer.bestDesign.getKey(), cm.stats.get("evaluations")))
+            ## FOR
+            self.assertEqual(results[0], results[1])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import threading
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from util import configutil
+from search import bbsearch
+from search import designcandidates
+from search import design
+from search.designer import Designer
+from search.lnsdesigner import LNSDesigner
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(msg)
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        return 0.0
+
+    def __init__(self):
+        self.design_memo = { }
+
+class TestSearchPartitions (unittest.TestCase) :
+
+    def setUp(self):
+        self.collections = {
+            "col1": {"workload_percent": 0.1},
+            "col2": {"workload_percent": 0.6},
+            "col3": {"workload_percent": 0.3},
+        }
+        self.dc = designcandidates.DesignCandidates()
+        self.dc.addCollection("col1", [("key1",)], ["key1", "key2"], [])
+        self.dc.addCollection("col2", [("key1",)], ["key1", "key2", "key3"], [])
+        self.dc.addCollection("col3", [("key1",)], [], [])
+
+        self.config = RawConfigParser()
+        configutil.setDefaultValues(self.config)
+        self.designer = Designer(self.config, None, None)
+        self.designer.collections = self.collections
+        self.designer.designCandidates = self.dc
+    ## DEF
+
+    def testPartitions(self):
+        self.assertIsNone(self.designer.getSearchPartitions())
+
+        # col3 does not have any shard keys to pick from, so it is skipped
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'partition_collections', 2)
+        partitions = self.designer.getSearchPartitions()
+        # 8 shard keys (including no key) for col2 and 4 for col1
+        self.assertEqual(8 * 4, len(partitions))
+        for p in partitions:
+            self.assertEqual(["col1", "col2"], sorted(p.keys()))
+        unique = set([(tuple(p["col1"]), tuple(p["col2"])) for p in partitions])
+        self.assertEqual(len(partitions), len(unique))
+
+        self.config.set(configutil.SECT_MULTI_SEARCH, 'partition_collections', 1)
+        partitions = self.designer.getSearchPartitions()
+        self.assertEqual(8, len(partitions))
+        self.assertEqual(["col2"], partitions[0].keys())
+
+        # Only LNS supports partitions
+        self.config.set(configutil.SECT_DESIGNER, 'search_strategy', 'annealing')
+        self.assertIsNone(self.designer.getSearchPartitions())
+    ## DEF
+
+    def testFixedShardKey(self):
+        initialDesign = design.Design()
+        for col_name in self.collections:
+            initialDesign.addCollection(col_name)
+            initialDesign.reset(col_name)
+        dc = self.dc.getCandidates(["col1", "col2", "col3"])
+        dc.fixShardKey("col2", ("key1", "key3"))
+        self.assertEqual(("key1", "key3"), dc.getCandidates(["col2"]).fixedShardKeys["col2"])
+
+        # Every design has a cost of zero, so we see all of the leaves
+        bb = bbsearch.BBSearch(dc, DummyCostModel(), initialDesign, 1.0, 1000000000, DummyChannel(), threading.Lock())
+        bb.solve()
+        leaves = [node for node in bb.listAllNodes() if node.isLeaf()]
+        self.assertGreater(len(leaves), 0)
+        for node in leaves:
+            self.assertEqual(("key1", "key3"), node.design.getShardKeys("col2"))
+    ## DEF
+
+    def testStealPartitions(self):
+        initialDesign = design.Design()
+        for col_name in self.collections:
+            initialDesign.addCollection(col_name)
+        lns = LNSDesigner(self.collections, self.dc, [ ], self.config, DummyCostModel(), \
+                          initialDesign, 1.0, DummyChannel(), threading.Lock())
+        self.assertIsNone(lns.partitions)
+        lns.addPartitions([{"col2": [ ]}, {"col2": ("key1",)}, {"col2": ("key2",)}])
+        self.assertEqual({"col2": [ ]}, lns.nextPartition())
+
+        # An idle worker gets the partitions that we would have searched last
+        stolen, remaining = lns.stealPartitions()
+        self.assertEqual([{"col2": ("key2",)}], stolen)
+        self.assertEqual(1, remaining)
+        self.assertEqual({"col2": ("key1",)}, lns.nextPartition())
+        self.assertEqual(([ ], 0), lns.stealPartitions())
+
+        # When we run out, we ask the coordinator for more and wait for them
+        timer = threading.Timer(0.1, lns.addPartitions, [[ {"col2": ("key3",)} ]])
+        timer.start()
+        self.assertEqual({"col2": ("key3",)}, lns.nextPartition())
+        timer = threading.Timer(0.1, lns.addPartitions, [[ ]])
+        timer.start()
+        self.assertIsNone(lns.nextPartition())
+        self.assertEqual(2, len(lns.channel.messages))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import random
+import unittest
+from ConfigParser import RawConfigParser
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import catalog
+from util import configutil
+from util import constants
+from search.shardkeyscreen import ShardKeyScreener
+from search.designer import Designer
+
+class TestShardKeyScreener (unittest.TestCase) :
+
+    def setUp(self):
+        col_info = catalog.Collection()
+        col_info['name'] = "col"
+        col_info['doc_count'] = 1000
+        col_info['interesting'] = ["a", "b", "c", "d"]
+        for f_name, cardinality in [("a", 1000), ("b", 2), ("c", 1000), ("d", 1000)]:
+            f = catalog.Collection.fieldFactory(f_name, "int")
+            f['cardinality'] = cardinality
+            f['selectivity'] = cardinality / 1000.0
+            col_info['fields'][f_name] = f
+        self.collections = {"col": col_info}
+
+        rng = random.Random(0)
+        ops = [ ]
+        for i in xrange(1000):
+            # 'c' is spread exactly like 'a' but the queries never use it
+            doc = {"a": i, "b": i % 2, "c": i + 1000, "d": rng.randint(0, 999)}
+            ops.append({"collection": "col", "type": constants.OP_TYPE_INSERT, "predicates": { },
+                        "query_content": [doc]})
+            if i % 2 == 0:
+                ops.append({"collection": "col", "type": constants.OP_TYPE_QUERY,
+                            "predicates": {"a": constants.PRED_TYPE_EQUALITY},
+                            "query_content": [{"#query": {"a": i / 2}}]})
+            ops.append({"collection": "col", "type": constants.OP_TYPE_QUERY,
+                        "predicates": {"b": constants.PRED_TYPE_EQUALITY, "d": constants.PRED_TYPE_RANGE},
+                        "query_content": [{"#query": {"b": i % 2, "d": {"#gt": 10}}}]})
+        ## FOR
+        self.workload = [ {"operations": ops} ]
+    ## DEF
+
+    def testMetrics(self):
+        screener = ShardKeyScreener(self.collections, self.workload, 4)
+        a = screener.computeMetrics("col", "a")
+        self.assertAlmostEqual(1.0, a['docSkew'])
+        self.assertAlmostEqual(1500 / 2500.0, a['targeted'])
+        self.assertAlmostEqual((1000 + 500 + 1000 * 4) / 2500.0, a['messages'])
+        # Two values for four nodes
+        b = screener.computeMetrics("col", "b")
+        self.assertAlmostEqual(2.0, b['docSkew'])
+        self.assertAlmostEqual(2000 / 2500.0, b['targeted'])
+        self.assertAlmostEqual((1000 + 500 * 4 + 1000) / 2500.0, b['messages'])
+        # 'd' is only used in range predicates that touch every node
+        d = screener.computeMetrics("col", "d")
+        self.assertAlmostEqual((1000 + 1500 * 4) / 2500.0, d['messages'])
+
+        # The plain Python counts are the same as NumPy's
+        python = ShardKeyScreener(self.collections, self.workload, 4, useNumpy=False)
+        for key in ["a", "b", "c", "d"]:
+            self.assertEqual(screener.computeMetrics("col", key), python.computeMetrics("col", key))
+    ## DEF
+
+    def testScreen(self):
+        screener = ShardKeyScreener(self.collections, self.workload, 4)
+        kept, dropped = screener.screen("col", ["a", "b", "c", "d"])
+        # 'b' sends the fewest messages, but it only uses half of the nodes
+        self.assertEqual(["a", "b"], kept)
+        self.assertEqual([("c", "a"), ("d", "a")], [x[:2] for x in dropped])
+
+        # We cannot drop anything without a workload for the collection
+        screener = ShardKeyScreener(self.collections, [ ], 4)
+        self.assertEqual((["a", "b", "c", "d"], [ ]), screener.screen("col", ["a", "b", "c", "d"]))
+    ## DEF
+
+    def testDesignCandidates(self):
+        config = RawConfigParser()
+        configutil.setDefaultValues(config)
+        config.set(configutil.SECT_CLUSTER, "nodes", 4)
+        designer = Designer(config, None, None)
+        dc = designer.generateDesignCandidates(self.collections, shardKeyWorkload=self.workload)
+        # 'b' is not selective enough to even be screened
+        self.assertEqual(["a"], dc.shardKeys["col"])
+        self.assertEqual(["c", "d"], [x[0] for x in designer.shardKeyScreening["col"]])
+        # The dropped keys are still index candidates
+        self.assertIn(("c",), dc.indexKeys["col"])
+
+        dc = designer.generateDesignCandidates(self.collections)
+        self.assertEqual(["a", "c", "d"], dc.shardKeys["col"])
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
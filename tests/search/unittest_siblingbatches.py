@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import threading
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+from search import bbsearch
+from search import designcandidates
+from search import design
+from search.evaluator import PopulationEvaluator
+
+class DummyChannel:
+    def __init__(self):
+        self.messages = [ ]
+    def send(self, msg):
+        self.messages.append(msg)
+
+class DummyCostModel:
+
+    def overallCost(self, design):
+        self.evaluations += 1
+        return shardKeyCost(design)
+
+    def __init__(self):
+        self.evaluations = 0
+        self.design_memo = { }
+        self.design_memo_size = 1000
+
+def shardKeyCost(design):
+    """Only sharding on 'key2' is free. The relaxed collections do not cost anything"""
+    cost = 0.0
+    for col_name in design.getCollections():
+        if design.isRelaxed(col_name):
+            continue
+        if design.getShardKeys(col_name) != ("key2",):
+            cost += 1.0
+        cost += 0.1 * len(design.getIndexes(col_name))
+    return cost
+
+class TestSiblingBatches (unittest.TestCase) :
+
+    def setUp(self):
+        self.initialDesign = design.Design()
+        self.dc = designcandidates.DesignCandidates()
+        for col_name in ["col1", "col2", "col3"]:
+            self.initialDesign.addCollection(col_name)
+            self.initialDesign.reset(col_name)
+            self.dc.addCollection(col_name, [("key1",)], ["key1", "key2", "key3"], [])
+        ## FOR
+    ## DEF
+
+    def solve(self, cm, evaluator, batchSize):
+        bb = bbsearch.BBSearch(self.dc, cm, self.initialDesign, 100.0, 1000000000, DummyChannel(), threading.Lock())
+        bb.collectionOrder = ["col1", "col2", "col3"]
+        bb.evaluator = evaluator
+        bb.batchSize = batchSize
+        bb.solve()
+        return bb
+    ## DEF
+
+    def testSameResult(self):
+        serial = self.solve(DummyCostModel(), None, 0)
+        self.assertEqual(0, serial.batches)
+
+        for processes in [1, 2]:
+            cm = DummyCostModel()
+            evaluator = PopulationEvaluator(cm, processes)
+            try:
+                batched = self.solve(cm, evaluator, 4)
+            finally:
+                evaluator.close()
+            self.assertEqual("solved", batched.status)
+            self.assertEqual(serial.bestCost, batched.bestCost)
+            self.assertEqual(0.0, batched.bestCost)
+            self.assertGreater(batched.batches, 0)
+            if processes > 1:
+                # The pool processes computed everything
+                self.assertGreater(batched.poolEvaluations, 0)
+                self.assertEqual(0, cm.evaluations)
+            else:
+                self.assertEqual(0, batched.poolEvaluations)
+                self.assertGreater(cm.evaluations, 0)
+            # Exploring the cheapest siblings first prunes the rest of them
+            self.assertLessEqual(batched.totalNodes, serial.totalNodes)
+        ## FOR
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
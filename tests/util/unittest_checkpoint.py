@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import shutil
+import tempfile
+import unittest
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+from util import checkpoint
+from search import design
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "search.checkpoint")
+    ## DEF
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+    ## DEF
+
+    def testRoundTrip(self):
+        d = design.Design()
+        d.addCollection("col1")
+        d.addShardKey("col1", ["key1"])
+        d.addIndex("col1", ["key1", "key2"])
+        workers = {0: {"relax_ratio": 0.25, "rounds": 3}}
+
+        checkpoint.writeCheckpoint(self.path, 0.5, d, workers, 12.0)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        data = checkpoint.loadCheckpoint(self.path)
+        self.assertEqual(0.5, data["best_cost"])
+        self.assertEqual(12.0, data["elapsed"])
+        self.assertEqual(workers, data["workers"])
+        self.assertEqual([ ], data["best_design"].getDelta(d))
+        self.assertEqual(d.getKey(), data["best_design"].getKey())
+    ## DEF
+
+    def testMemo(self):
+        d0 = design.Design()
+        d0.addCollection("col1")
+        d1 = d0.copy()
+        d1.addShardKey("col1", ["key1"])
+        self.assertEqual({ }, checkpoint.loadMemo(self.path, 0))
+
+        # Every checkpoint only sends the entries that are new
+        memo = {d0.getKey(): 0.5}
+        sent = set()
+        self.assertEqual(memo, checkpoint.getNewMemoEntries(memo, sent))
+        self.assertEqual({ }, checkpoint.getNewMemoEntries(memo, sent))
+        memo[d1.getKey()] = 0.25
+        self.assertEqual({d1.getKey(): 0.25}, checkpoint.getNewMemoEntries(memo, sent))
+
+        checkpoint.appendMemo(self.path, 0, {d0.getKey(): 0.5})
+        checkpoint.appendMemo(self.path, 0, {d1.getKey(): 0.25})
+        checkpoint.appendMemo(self.path, 1, {d1.getKey(): 0.75})
+        self.assertEqual(memo, checkpoint.loadMemo(self.path, 0))
+        self.assertEqual({d1.getKey(): 0.75}, checkpoint.loadMemo(self.path, 1))
+
+        # A memo that we were in the middle of writing when we crashed
+        with open(checkpoint.getMemoPath(self.path, 0), "ab") as fd:
+            fd.write(pickle.dumps({d1.getKey(): 1.0}, -1)[:10])
+        self.assertEqual(memo, checkpoint.loadMemo(self.path, 0))
+
+        checkpoint.removeMemos(self.path)
+        self.assertEqual([ ], os.listdir(self.tempdir))
+    ## DEF
+
+    def testVersion(self):
+        with open(self.path, "wb") as fd:
+            pickle.dump({"version": checkpoint.CHECKPOINT_VERSION + 1}, fd)
+        self.assertRaises(Exception, checkpoint.loadCheckpoint, self.path)
+    ## DEF
+
+    def testDesignKey(self):
+        d0 = design.Design()
+        d0.addCollection("col1")
+        d0.addCollection("col2")
+        d0.addShardKey("col1", ["key1"])
+        d1 = d0.copy()
+        self.assertEqual(d0.getKey(), d1.getKey())
+        self.assertEqual(hash(d0.getKey()), hash(d1.getKey()))
+
+        d1.addIndex("col2", ["key1"])
+        self.assertNotEqual(d0.getKey(), d1.getKey())
+        d1.reset("col2")
+        self.assertNotEqual(d0.getKey(), d1.getKey())
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
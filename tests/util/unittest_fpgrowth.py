@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import random
+import itertools
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+from util.histogram import Histogram
+from util.fpgrowth import FPGrowth
+
+class TestFPGrowth(unittest.TestCase):
+    
+    def setUp(self):
+        rng = random.Random(0)
+        fields = ["f%d" % i for i in xrange(8)]
+        self.transactions = [ ]
+        for i in xrange(300):
+            # Make the first fields much more popular than the others
+            items = [f for j, f in enumerate(fields) if rng.random() < 0.8 / (j+1)]
+            self.transactions.append(tuple(sorted(items)))
+        ## FOR
+    ## DEF
+    
+    def getCombinations(self, min_count, max_size):
+        """Add every combination of the items like InitialDesigner used to"""
+        h = Histogram()
+        for items in self.transactions:
+            for i in xrange(1, min(len(items), max_size)+1):
+                map(h.put, itertools.combinations(items, i))
+        ## FOR
+        return dict([(k, cnt) for k, cnt in h.iteritems() if cnt >= min_count])
+    ## DEF
+    
+    def testAllItemsets(self):
+        miner = FPGrowth()
+        map(miner.add, self.transactions)
+        itemsets = miner.mine()
+        self.assertEqual(self.getCombinations(1, 8), dict(itemsets))
+        self.assertEqual(sorted(self.getCombinations(1, 8).itervalues())[-1], itemsets.getMaxCount())
+    ## DEF
+    
+    def testMinSupport(self):
+        for min_support, max_size in [(0.05, 8), (0.1, 2), (30, 3)]:
+            miner = FPGrowth(min_support, max_size)
+            map(miner.add, self.transactions)
+            min_count = min_support if min_support >= 1 else int(round(min_support * len(self.transactions)))
+            self.assertEqual(min_count, miner.getMinCount())
+            expected = self.getCombinations(min_count, max_size)
+            itemsets = miner.mine()
+            self.assertEqual(expected, dict(itemsets))
+            
+            h = Histogram(expected)
+            self.assertEqual(sorted(h.getMaxCountKeys()), sorted(itemsets.getMaxCountKeys()))
+        ## FOR
+    ## DEF
+    
+    def testDistinctTransactions(self):
+        miner = FPGrowth()
+        for i in xrange(1000):
+            miner.add(["b", "a"])
+            miner.add(["a", "b", "a"])
+        miner.add([ ])
+        # Duplicate transactions are only stored once
+        self.assertEqual(1, len(miner.transactions))
+        self.assertEqual(2001, miner.num_transactions)
+        self.assertEqual({("a",): 2000, ("b",): 2000, ("a", "b"): 2000}, dict(miner.mine()))
+    ## DEF
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
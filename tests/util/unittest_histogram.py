@@ -9,7 +9,7 @@ from pprint import pprint, pformat
 
 basedir = os.path.realpath(os.path.dirname(__file__))
 sys.path.append(os.path.join(basedir, "../../src"))
-from util.histogram import Histogram
+from util.histogram import Histogram, HeapHistogram
 
 class TestHistogram(unittest.TestCase):
     
@@ -46,6 +46,31 @@ class TestHistogram(unittest.TestCase):
         self.assertEquals(sorted(h.getMinCountKeys()), sorted(clone.getMinCountKeys()))
     ## DEF
     
+    def testHeapHistogram(self):
+        rng = random.Random(0)
+        h = Histogram()
+        heap_h = HeapHistogram()
+        for i in xrange(0, 5000):
+            key = rng.randint(0, 50)
+            if rng.random() < 0.1 and key in h:
+                del h[key]
+                del heap_h[key]
+            else:
+                delta = rng.randint(-2, 5)
+                h.put(key, delta)
+                heap_h.put(key, delta)
+            self.assertEquals(sorted(h.getMaxCountKeys()), sorted(heap_h.getMaxCountKeys()))
+            self.assertEquals(h.max_cnt, heap_h.max_cnt)
+        ## FOR
+        # The stale entries do not pile up
+        self.assertLessEqual(len(heap_h.heap), 2 * len(heap_h) + 64)
+        
+        import pickle
+        clone = pickle.loads(pickle.dumps(heap_h, -1))
+        self.assertEquals(dict(heap_h), dict(clone))
+        self.assertEquals(sorted(heap_h.getMaxCountKeys()), sorted(clone.getMaxCountKeys()))
+    ## DEF
+    
 ## CLASS
 
 if __name__ == '__main__':
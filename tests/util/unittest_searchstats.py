@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+import json
+import pickle
+import unittest
+
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+from util.searchstats import SearchStats
+
+class TestSearchStats(unittest.TestCase):
+
+    def testCounters(self):
+        stats = SearchStats()
+        stats.incr("evaluations")
+        stats.incr("evaluations", 9)
+        self.assertEqual(10, stats.get("evaluations"))
+        self.assertEqual(0, stats.get("nothing"))
+
+        d = stats.toDICT(elapsed=2.0)
+        self.assertEqual(5.0, d["evaluations_per_sec"])
+    ## DEF
+
+    def testHitRatesAndTimeSplit(self):
+        stats = SearchStats()
+        stats.incr("lru_hits", 3)
+        stats.incr("lru_misses", 1)
+        stats.addTime("disk", 3.0)
+        stats.addTime("network", 1.0)
+        stats.addTime("bbsearch", 100.0)
+
+        d = stats.toDICT()
+        self.assertEqual(0.75, d["hit_rates"]["lru"])
+        self.assertIsNone(d["hit_rates"]["op_nodeIds"])
+        self.assertEqual(0.75, d["time_split"]["disk"])
+        self.assertEqual(0.25, d["time_split"]["network"])
+        self.assertEqual(0.0, d["time_split"]["skew"])
+        self.assertNotIn("bbsearch", d["time_split"])
+    ## DEF
+
+    def testMerge(self):
+        s0 = SearchStats()
+        s0.incr("evaluations", 5)
+        s0.addTime("disk", 1.5)
+        s1 = SearchStats()
+        s1.incr("evaluations", 7)
+        s1.incr("lns_rounds")
+        s0.setGauge("time_to_near_best", 4.0)
+        s1.setGauge("time_to_near_best", 2.5)
+
+        # Workers send us the dict version through the channel
+        total = SearchStats()
+        total.merge(s0).merge(pickle.loads(pickle.dumps(s1.toDICT(), -1)))
+        self.assertEqual(12, total.get("evaluations"))
+        self.assertEqual(1, total.get("lns_rounds"))
+        self.assertEqual(1.5, total.timers["disk"])
+        self.assertEqual(4.0, total.gauges["time_to_near_best"])
+
+        d = json.loads(total.toJSON())
+        self.assertEqual(12, d["counters"]["evaluations"])
+    ## DEF
+
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os, sys
+basedir = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(os.path.join(basedir, "../../src"))
+
+import tempfile
+import unittest
+from ConfigParser import RawConfigParser
+
+from util import constants
+from util import configutil
+from workload import snapshot
+from search.designer import Designer
+
+class ObjectIdLike(object):
+    def __str__(self):
+        return "4f8a2b3c"
+
+class TestSnapshot (unittest.TestCase):
+
+    def setUp(self):
+        self.collections = {
+            "ABC": {
+                "_id":       ObjectIdLike(),
+                "name":      "ABC",
+                "doc_count": 100,
+                "fields": {
+                    "a": {"type": "int", "fields": { }, "selectivity": 0.5},
+                    "b": {"type": "dict", "fields": {
+                        "c": {"type": "str", "fields": { }, "selectivity": 1.0},
+                    }},
+                },
+            },
+        }
+        self.workload = [ {
+            "session_id": 1,
+            "start_time": 1.5,
+            "operations": [ {
+                "collection":    u"ABC",
+                "type":          constants.OP_TYPE_QUERY,
+                "query_id":      1234L,
+                "query_content": [ {constants.REPLACE_KEY_DOLLAR_PREFIX + "query": {"a": 2}} ],
+                "predicates":    {"a": constants.PRED_TYPE_EQUALITY},
+            } ],
+        } ]
+        fd, self.path = tempfile.mkstemp(suffix=".snapshot")
+        os.close(fd)
+    ## DEF
+
+    def tearDown(self):
+        os.remove(self.path)
+    ## DEF
+
+    def testRoundTrip(self):
+        snapshot.exportSnapshot(self.path, self.collections, self.workload)
+        collections, workload = snapshot.loadSnapshot(self.path)
+
+        self.assertEqual(1, len(workload))
+        sess = workload[0]
+        self.assertEqual(1, sess["session_id"])
+        self.assertEqual(1.5, sess["start_time"])
+        self.assertIsNone(sess["end_time"])
+
+        # The compiled operations have all of the fields, even if they were
+        # missing in the original, and the ASCII strings are interned
+        op = sess["operations"][0]
+        self.assertEqual(sorted(snapshot.OP_FIELDS), sorted(op.keys()))
+        for key, value in self.workload[0]["operations"][0].iteritems():
+            self.assertEqual(value, op[key])
+        self.assertIsNone(op["query_fields"])
+        self.assertIsInstance(op["collection"], str)
+        self.assertIs(intern("ABC"), op["collection"])
+
+        self.assertEqual(["ABC"], collections.keys())
+        col_info = collections["ABC"]
+        self.assertIsInstance(col_info, snapshot.SnapshotCollection)
+        self.assertEqual("4f8a2b3c", col_info["_id"])
+        self.assertEqual(100, col_info["doc_count"])
+        self.assertEqual(0.5, col_info.getField("a")["selectivity"])
+        self.assertEqual("str", col_info.getField("b.c")["type"])
+        self.assertIsNone(col_info.getField("xyz"))
+    ## DEF
+
+    def testChunksAndLimits(self):
+        workload = [ ]
+        for i in xrange(25):
+            sess = dict(self.workload[0])
+            sess["session_id"] = i
+            workload.append(sess)
+        snapshot.exportSnapshot(self.path, self.collections, workload, chunk_size=10)
+
+        collections, loaded = snapshot.loadSnapshot(self.path)
+        self.assertEqual(range(25), [sess["session_id"] for sess in loaded])
+
+        collections, loaded = snapshot.loadSnapshot(self.path, sess_limit=12)
+        self.assertEqual(12, len(loaded))
+        collections, loaded = snapshot.loadSnapshot(self.path, op_limit=3)
+        self.assertEqual(3, len(loaded))
+    ## DEF
+
+    def testStream(self):
+        workload = [ ]
+        for i in xrange(25):
+            sess = dict(self.workload[0])
+            sess["session_id"] = i
+            sess["start_time"] = float(i)
+            sess["end_time"] = i + 0.5
+            workload.append(sess)
+        snapshot.exportSnapshot(self.path, self.collections, workload, chunk_size=10)
+        collections, loaded = snapshot.loadSnapshot(self.path)
+
+        # Enough memory for every chunk, so they are only decoded once
+        stream = snapshot.SnapshotStream(self.path, 1024 * 1024)
+        self.assertEqual(25, len(stream))
+        self.assertEqual(25, stream.num_ops)
+        self.assertEqual(0.0, stream.start_time)
+        self.assertEqual(24.5, stream.end_time)
+        self.assertEqual(["ABC"], stream.collections.keys())
+        self.assertEqual(loaded, list(stream))
+        self.assertEqual(loaded, list(stream))
+        self.assertEqual(3, stream.decoded)
+        stream.close()
+
+        # No memory at all, so every pass has to decode them again
+        stream = snapshot.SnapshotStream(self.path, 0)
+        self.assertEqual(loaded, list(stream))
+        self.assertEqual(loaded, list(stream))
+        self.assertEqual(6, stream.decoded)
+        self.assertEqual(0, len(stream.cache))
+        stream.close()
+    ## DEF
+
+    def testSharedSnapshot(self):
+        test = self
+        class MetadataDesigner(Designer):
+            def loadCollections(self):
+                return test.collections
+            def loadWorkload(self, collections):
+                return test.workload
+        ## CLASS
+        config = RawConfigParser()
+        configutil.setDefaultValues(config)
+        designer = MetadataDesigner(config, None, None)
+        path = designer.exportSharedSnapshot(os.path.dirname(self.path))
+        try:
+            self.assertEqual(os.path.dirname(self.path), os.path.dirname(path))
+            collections, loaded = snapshot.loadSnapshot(path)
+            self.assertEqual(["ABC"], collections.keys())
+            self.assertEqual(1, len(loaded))
+        finally:
+            os.remove(path)
+    ## DEF
+
+## CLASS
+
+if __name__ == '__main__':
+    unittest.main()
+## MAIN